@@ -2,6 +2,7 @@
 Base validator with common validation logic for document files.
 """
 
+import copy
 import re
 from pathlib import Path
 
@@ -120,6 +121,47 @@ class BaseSchemaValidator:
         if not self.xml_files:
             print(f"Warning: No XML files found in {self.unpacked_dir}")
 
+        # Parsed trees shared by every check: path -> (mtime_ns, tree, error)
+        self._tree_cache = {}
+        # Compiled XSD schemas: schema path -> lxml.etree.XMLSchema
+        self._schema_cache = {}
+
+    def _parse(self, xml_file):
+        """Return the parsed tree for xml_file, parsing it once per modification.
+
+        The tree is shared between checks and must not be modified; checks
+        that remove or rewrite elements use _parse_copy instead. A file that
+        is not well-formed raises the same XMLSyntaxError on every call
+        without being parsed again.
+        """
+        path = Path(xml_file).resolve()
+        mtime = path.stat().st_mtime_ns
+        entry = self._tree_cache.get(path)
+        if entry is None or entry[0] != mtime:
+            try:
+                entry = (mtime, lxml.etree.parse(str(path)), None)
+            except lxml.etree.XMLSyntaxError as e:
+                entry = (mtime, None, e)
+            self._tree_cache[path] = entry
+        if entry[2] is not None:
+            raise entry[2]
+        return entry[1]
+
+    def _parse_copy(self, xml_file):
+        """Return a private copy of the parsed tree that a check may modify."""
+        return copy.deepcopy(self._parse(xml_file))
+
+    def _load_schema(self, schema_path):
+        """Return the compiled XSD schema at schema_path, compiling it once."""
+        if schema_path not in self._schema_cache:
+            with open(schema_path, "rb") as xsd_file:
+                parser = lxml.etree.XMLParser()
+                xsd_doc = lxml.etree.parse(
+                    xsd_file, parser=parser, base_url=str(schema_path)
+                )
+            self._schema_cache[schema_path] = lxml.etree.XMLSchema(xsd_doc)
+        return self._schema_cache[schema_path]
+
     def validate(self):
         """Run all validation checks and return True if all pass."""
         raise NotImplementedError("Subclasses must implement the validate method")
@@ -131,7 +173,7 @@ class BaseSchemaValidator:
         for xml_file in self.xml_files:
             try:
                 # Try to parse the XML file
-                lxml.etree.parse(str(xml_file))
+                self._parse(xml_file)
             except lxml.etree.XMLSyntaxError as e:
                 errors.append(
                     f"  {xml_file.relative_to(self.unpacked_dir)}: "
@@ -159,7 +201,7 @@ class BaseSchemaValidator:
 
         for xml_file in self.xml_files:
             try:
-                root = lxml.etree.parse(str(xml_file)).getroot()
+                root = self._parse(xml_file).getroot()
                 declared = set(root.nsmap.keys()) - {None}  # Exclude default namespace
 
                 for attr_val in [
@@ -190,7 +232,8 @@ class BaseSchemaValidator:
 
         for xml_file in self.xml_files:
             try:
-                root = lxml.etree.parse(str(xml_file)).getroot()
+                # A copy, since mc:AlternateContent is removed below
+                root = self._parse_copy(xml_file).getroot()
                 file_ids = {}  # Track IDs that must be unique within this file
 
                 # Remove all mc:AlternateContent elements from the tree
@@ -310,7 +353,7 @@ class BaseSchemaValidator:
         for rels_file in rels_files:
             try:
                 # Parse relationships file
-                rels_root = lxml.etree.parse(str(rels_file)).getroot()
+                rels_root = self._parse(rels_file).getroot()
 
                 # Get the directory where this .rels file is located
                 rels_dir = rels_file.parent
@@ -390,8 +433,6 @@ class BaseSchemaValidator:
         Validate that all r:id attributes in XML files reference existing IDs
         in their corresponding .rels files, and optionally validate relationship types.
         """
-        import lxml.etree
-
         errors = []
 
         # Process each XML file that might contain r:id references
@@ -411,7 +452,7 @@ class BaseSchemaValidator:
 
             try:
                 # Parse the .rels file to get valid relationship IDs and their types
-                rels_root = lxml.etree.parse(str(rels_file)).getroot()
+                rels_root = self._parse(rels_file).getroot()
                 rid_to_type = {}
 
                 for rel in rels_root.findall(
@@ -434,7 +475,7 @@ class BaseSchemaValidator:
                         rid_to_type[rid] = type_name
 
                 # Parse the XML file to find all r:id references
-                xml_root = lxml.etree.parse(str(xml_file)).getroot()
+                xml_root = self._parse(xml_file).getroot()
 
                 # Find all elements with r:id attributes
                 for elem in xml_root.iter():
@@ -531,7 +572,7 @@ class BaseSchemaValidator:
 
         try:
             # Parse and get all declared parts and extensions
-            root = lxml.etree.parse(str(content_types_file)).getroot()
+            root = self._parse(content_types_file).getroot()
             declared_parts = set()
             declared_extensions = set()
 
@@ -593,7 +634,7 @@ class BaseSchemaValidator:
                     continue
 
                 try:
-                    root_tag = lxml.etree.parse(str(xml_file)).getroot().tag
+                    root_tag = self._parse(xml_file).getroot().tag
                     root_name = root_tag.split("}")[-1] if "}" in root_tag else root_tag
 
                     if root_name in declarable_roots and path_str not in declared_parts:
@@ -765,8 +806,7 @@ class BaseSchemaValidator:
     def _clean_ignorable_namespaces(self, xml_doc):
         """Remove attributes and elements not in allowed namespaces."""
         # Create a clean copy
-        xml_string = lxml.etree.tostring(xml_doc, encoding="unicode")
-        xml_copy = lxml.etree.fromstring(xml_string)
+        xml_copy = copy.deepcopy(xml_doc).getroot()
 
         # Remove attributes not in allowed namespaces
         for elem in xml_copy.iter():
@@ -831,16 +871,16 @@ class BaseSchemaValidator:
 
         try:
             # Load schema
-            with open(schema_path, "rb") as xsd_file:
-                parser = lxml.etree.XMLParser()
-                xsd_doc = lxml.etree.parse(
-                    xsd_file, parser=parser, base_url=str(schema_path)
-                )
-                schema = lxml.etree.XMLSchema(xsd_doc)
+            schema = self._load_schema(schema_path)
 
-            # Load and preprocess XML
-            with open(xml_file, "r") as f:
-                xml_doc = lxml.etree.parse(f)
+            # Load and preprocess XML. Files from the unpacked document come
+            # from the shared cache; the template-tag pass below copies the
+            # tree before anything is modified.
+            if base_path == self.unpacked_dir:
+                xml_doc = self._parse(xml_file)
+            else:
+                with open(xml_file, "r") as f:
+                    xml_doc = lxml.etree.parse(f)
 
             xml_doc, _ = self._remove_template_tags_from_text_nodes(xml_doc)
             xml_doc = self._preprocess_for_mc_ignorable(xml_doc)
@@ -917,8 +957,7 @@ class BaseSchemaValidator:
         template_pattern = re.compile(r"\{\{[^}]*\}\}")
 
         # Create a copy of the document to avoid modifying the original
-        xml_string = lxml.etree.tostring(xml_doc, encoding="unicode")
-        xml_copy = lxml.etree.fromstring(xml_string)
+        xml_copy = copy.deepcopy(xml_doc).getroot()
 
         def process_text_content(text, content_type):
             if not text:
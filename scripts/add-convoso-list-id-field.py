@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Add convosoListId field to Lead Source and backfill from Convoso lists.
-Uses the Twenty metadata GraphQL API and workspace REST API.
+Uses the Twenty metadata GraphQL API and the workspace GraphQL API: Lead
+Sources are read with full cursor pagination and updated in aliased batches
+(one request per --batch-size records), all over one keep-alive session.
 
 Usage:
   python3 scripts/add-convoso-list-id-field.py --url https://staging-crm.omniaagent.com --token <your-api-token>
@@ -13,7 +15,9 @@ To get your API token:
 import argparse
 import json
 import sys
-import urllib.request
+
+from omnia_backfill.bulk import DEFAULT_BATCH_SIZE, update_many
+from omnia_backfill.crm import CrmClient
 
 # Convoso list_id -> name mapping (from /v1/lists/search API)
 CONVOSO_LISTS = {
@@ -49,31 +53,20 @@ CONVOSO_LISTS = {
 NAME_TO_LIST_ID = {v: k for k, v in CONVOSO_LISTS.items()}
 
 
-def api_request(url, token, data=None, method="GET"):
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-    body = json.dumps(data).encode() if data else None
-    req = urllib.request.Request(url, data=body, headers=headers, method=method)
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode()
-        print(f"HTTP {e.code}: {error_body}")
-        raise
-
-
-def graphql_request(base_url, token, query, variables=None):
-    url = f"{base_url}/metadata"
+def graphql_request(client, base_url, query, variables=None):
     data = {"query": query}
     if variables:
         data["variables"] = variables
-    return api_request(url, token, data, method="POST")
+    # Metadata calls share the workspace client's keep-alive session
+    resp = client.session.post(f"{base_url}/metadata", json=data, timeout=client.timeout)
+    try:
+        return resp.json()
+    except ValueError:
+        print(f"HTTP {resp.status_code}: {resp.text}")
+        raise
 
 
-def get_lead_source_object_id(base_url, token):
+def get_lead_source_object_id(client, base_url):
     """Find the objectMetadataId for Lead Source."""
     query = """
     query {
@@ -96,7 +89,7 @@ def get_lead_source_object_id(base_url, token):
       }
     }
     """
-    result = graphql_request(base_url, token, query)
+    result = graphql_request(client, base_url, query)
     edges = result.get("data", {}).get("objects", {}).get("edges", [])
     if not edges:
         print("ERROR: Lead Source object not found")
@@ -110,7 +103,7 @@ def get_lead_source_object_id(base_url, token):
     return node["id"], fields
 
 
-def create_field(base_url, token, object_metadata_id):
+def create_field(client, base_url, object_metadata_id):
     """Create the convosoListId field on Lead Source."""
     mutation = """
     mutation CreateOneField($input: CreateOneFieldMetadataInput!) {
@@ -136,7 +129,7 @@ def create_field(base_url, token, object_metadata_id):
             }
         }
     }
-    result = graphql_request(base_url, token, mutation, variables)
+    result = graphql_request(client, base_url, mutation, variables)
     if "errors" in result:
         print(f"GraphQL errors: {json.dumps(result['errors'], indent=2)}")
         sys.exit(1)
@@ -145,19 +138,9 @@ def create_field(base_url, token, object_metadata_id):
     return field["id"]
 
 
-def get_lead_sources(base_url, token):
-    """Fetch all Lead Source records via the workspace REST API."""
-    url = f"{base_url}/api/objects/leadSources?limit=100"
-    result = api_request(url, token)
-    records = result.get("data", {}).get("leadSources", [])
-    return records
-
-
-def update_lead_source(base_url, token, record_id, convoso_list_id):
-    """Update a Lead Source with its convosoListId."""
-    url = f"{base_url}/api/objects/leadSources/{record_id}"
-    data = {"convosoListId": convoso_list_id}
-    api_request(url, token, data, method="PATCH")
+def get_lead_sources(client):
+    """Fetch all Lead Source records, every page."""
+    return list(client.paginate("leadSources", "LeadSource", "id name convosoListId"))
 
 
 def main():
@@ -170,6 +153,12 @@ def main():
         help="Base URL (e.g. https://staging-crm.omniaagent.com)",
     )
     parser.add_argument("--token", required=True, help="API token (Bearer)")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Lead Sources per update request (default: {DEFAULT_BATCH_SIZE})",
+    )
     parser.add_argument(
         "--skip-create-field",
         action="store_true",
@@ -178,11 +167,11 @@ def main():
     args = parser.parse_args()
 
     base_url = args.url.rstrip("/")
-    token = args.token
+    client = CrmClient(f"{base_url}/graphql", args.token)
 
     # Step 1: Find Lead Source object and check if field exists
     print("Finding Lead Source object metadata...")
-    object_id, existing_fields = get_lead_source_object_id(base_url, token)
+    object_id, existing_fields = get_lead_source_object_id(client, base_url)
     print(f"  objectMetadataId: {object_id}")
     print(f"  Existing fields: {', '.join(sorted(existing_fields.keys()))}")
 
@@ -193,15 +182,15 @@ def main():
         print("  Skipping field creation (--skip-create-field)")
     else:
         print("Creating convosoListId field...")
-        create_field(base_url, token, object_id)
+        create_field(client, base_url, object_id)
 
     # Step 3: Fetch all Lead Sources
     print("Fetching Lead Source records...")
-    lead_sources = get_lead_sources(base_url, token)
+    lead_sources = get_lead_sources(client)
     print(f"  Found {len(lead_sources)} Lead Sources")
 
     # Step 4: Backfill by matching name
-    updated = 0
+    updates = []
     skipped = 0
     not_matched = []
 
@@ -217,12 +206,18 @@ def main():
         convoso_list_id = NAME_TO_LIST_ID.get(name)
         if convoso_list_id:
             print(f"  Updating '{name}' -> convosoListId={convoso_list_id}")
-            update_lead_source(base_url, token, record_id, convoso_list_id)
-            updated += 1
+            updates.append((record_id, {"convosoListId": convoso_list_id}))
         else:
             not_matched.append(name)
 
-    print(f"\nDone! Updated: {updated}, Skipped (already set): {skipped}")
+    updated, failures = update_many(
+        client, "LeadSource", updates, batch_size=args.batch_size
+    )
+    for record_id, data, errors in failures:
+        print(f"  FAILED {record_id} -> {data['convosoListId']}: {errors}")
+
+    print(f"\nDone! Updated: {updated}, Skipped (already set): {skipped}, "
+          f"Failed: {len(failures)}")
     if not_matched:
         print(f"Not matched ({len(not_matched)} Lead Sources without a Convoso list):")
         for name in not_matched:
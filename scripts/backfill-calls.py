@@ -26,27 +26,40 @@ Usage:
     --token <api-token> \
     --start 2025-06-13 --end 2026-02-19 --resume
 
-  # Dry run (print plan without executing)
+  # Dry run (print plan and a measured ETA without executing)
   python3 scripts/backfill-calls.py \
     --url https://staging-crm.omniaagent.com \
     --token <api-token> \
-    --start 2025-06-13 --end 2026-02-19 --dry-run
+    --start 2025-06-13 --end 2026-02-19 --dry-run --window 8
+
+  # Record the metadata traffic for replay-ingestion-server.py
+  python3 scripts/backfill-calls.py ... --capture /tmp/calls-capture.jsonl
 """
 
 import argparse
 import json
 import signal
+import statistics
 import sys
 import time
 import urllib.request
 from datetime import datetime, timedelta, timezone
 
+from omnia_backfill.ingestion import (
+    log_duration_seconds,
+    select_backfill_log,
+    strip_date_overrides,
+)
+from omnia_backfill.planner import Plan
+from omnia_backfill.traffic import Recorder
+
 DEFAULT_PIPELINE_NAME = "Convoso Call Ingestion"
 PROGRESS_FILE = "backfill-progress.json"
 POLL_INTERVAL_SECONDS = 5
 DAY_TIMEOUT_SECONDS = 600
 LOG_LOOKBACK_LIMIT = 50
-LOG_MATCH_SKEW_SECONDS = 15
+
+recorder = None  # Recorder when --capture is given
 
 
 def meta_gql(base_url, token, query, variables=None):
@@ -60,9 +73,13 @@ def meta_gql(base_url, token, query, variables=None):
         "Content-Type": "application/json",
         "User-Agent": "TwentyCRM-Script/1.0",
     }, method="POST")
+    started = time.time()
     try:
         with urllib.request.urlopen(req) as resp:
-            return json.loads(resp.read().decode())
+            result = json.loads(resp.read().decode())
+            if recorder is not None:
+                recorder.record(started, query, variables, result)
+            return result
     except urllib.error.HTTPError as e:
         error_body = e.read().decode()
         print(f"HTTP {e.code}: {error_body[:500]}")
@@ -218,25 +235,6 @@ def clear_date_overrides(base_url, token, pipeline_id, original_config):
     return update_pipeline_config(base_url, token, pipeline_id, original_config)
 
 
-def strip_date_overrides(config):
-    cleaned = json.loads(json.dumps(config))
-    date_range_params = cleaned.get("dateRangeParams")
-
-    if not isinstance(date_range_params, dict):
-        return cleaned, False
-
-    removed = False
-    for key in ("startTimeOverride", "endTimeOverride"):
-        if key in date_range_params:
-            del date_range_params[key]
-            removed = True
-
-    if not date_range_params:
-        cleaned.pop("dateRangeParams", None)
-
-    return cleaned, removed
-
-
 def list_ingestion_logs(base_url, token, pipeline_id, limit=LOG_LOOKBACK_LIMIT):
     data = require_gql_data(meta_gql(base_url, token, """
     {
@@ -276,44 +274,6 @@ def trigger_pull(base_url, token, pipeline_id):
     return log
 
 
-def parse_timestamp(value):
-    if not value:
-        return None
-
-    normalized = value.replace("Z", "+00:00")
-    try:
-        return datetime.fromisoformat(normalized)
-    except ValueError:
-        return None
-
-
-def select_backfill_log(logs, known_log_ids, watch_started_at):
-    threshold = watch_started_at - timedelta(seconds=LOG_MATCH_SKEW_SECONDS)
-    new_logs = []
-
-    for log in logs:
-        if log.get("triggerType") != "pull":
-            continue
-
-        started_at = parse_timestamp(log.get("startedAt"))
-        is_new_id = log.get("id") not in known_log_ids
-        is_recent = started_at is not None and started_at >= threshold
-
-        if is_new_id or is_recent:
-            new_logs.append(log)
-
-    # The placeholder log created by the GraphQL mutation stays pending.
-    # Prefer the worker-owned log that actually transitions to running/completed.
-    actionable_logs = [
-        log for log in new_logs
-        if log.get("status") in ("running", "completed", "failed", "partial")
-    ]
-    if actionable_logs:
-        return actionable_logs[0]
-
-    return None
-
-
 def poll_completion(
     base_url,
     token,
@@ -321,13 +281,14 @@ def poll_completion(
     known_log_ids,
     watch_started_at,
     timeout_seconds=DAY_TIMEOUT_SECONDS,
+    poll_seconds=POLL_INTERVAL_SECONDS,
 ):
     """Poll for the worker-owned pull log created after the trigger."""
     start = time.time()
     tracked_log_id = None
 
     while time.time() - start < timeout_seconds:
-        time.sleep(POLL_INTERVAL_SECONDS)
+        time.sleep(poll_seconds)
         try:
             logs = list_ingestion_logs(base_url, token, pipeline_id)
         except SystemExit:
@@ -370,6 +331,73 @@ def poll_completion(
     return None
 
 
+def plan_backfill(base_url, token, pipeline_id, day_count, progress, window_hours):
+    """Estimate the run from recent pull logs and measured metadata API latency.
+
+    Per-day pull time is fitted as `overhead + seconds_per_record * records`
+    over recent completed pulls. Calls per day come from the progress file
+    when earlier days were already backfilled, otherwise from the scheduled
+    pulls scaled by their lookback window.
+    """
+    plan = Plan(f"backfill-calls.py, {day_count} days")
+    meta = plan.sample("metadata API request")
+    logs = []
+    for _ in range(3):
+        logs = meta.time(list_ingestion_logs, base_url, token, pipeline_id)
+
+    pulls = []
+    for log in logs:
+        seconds = log_duration_seconds(log)
+        if log.get("triggerType") == "pull" and log.get("status") in ("completed", "partial") \
+                and seconds is not None:
+            pulls.append((log.get("totalRecordsReceived") or 0, seconds))
+
+    if not pulls:
+        plan.note("no completed pull logs to measure; using 1.5-2 min/day")
+        plan.add_duration("pull jobs (unmeasured)", day_count * 105)
+        plan.report(window_hours)
+        return
+
+    received = [r for r, _ in pulls]
+    durations = [d for _, d in pulls]
+    if len(set(received)) > 1:
+        per_record, overhead = statistics.linear_regression(received, durations)
+        overhead = max(overhead, 0.0)
+        per_record = max(per_record, 0.0)
+    else:
+        overhead, per_record = statistics.fmean(durations), 0.0
+
+    if progress and progress.get("pipelineId") == pipeline_id \
+            and progress.get("completedDays") and progress.get("totalRecordsProcessed"):
+        per_day = progress["totalRecordsProcessed"] / len(progress["completedDays"])
+        source = f"{len(progress['completedDays'])} completed backfill days"
+    else:
+        config = get_pipeline_config(base_url, token, pipeline_id)
+        lookback = (config.get("dateRangeParams") or {}).get("lookbackMinutes") or 1440
+        per_day = statistics.fmean(received) * 1440 / lookback
+        source = f"{len(pulls)} recent pulls x {1440 / lookback:g} ({lookback} min lookback)"
+
+    day_seconds = overhead + per_record * per_day
+    # Completion is only noticed on the next poll after the job finishes.
+    polls_per_day = int(day_seconds // POLL_INTERVAL_SECONDS) + 1
+    plan.note(
+        f"pull time ~ {overhead:.0f}s + {per_record * 1000:.1f}ms/record "
+        f"(fit over {len(pulls)} recent pulls)"
+    )
+    plan.note(f"~{per_day:,.0f} calls/day (from {source})")
+    plan.note("days run one at a time: each day rewrites the pipeline's date overrides")
+
+    # Per day: set overrides, snapshot known logs, trigger, then poll.
+    plan.add("config/trigger requests", day_count * 3, meta)
+    plan.add("poll requests", day_count * polls_per_day, meta)
+    plan.add_duration(
+        "pull jobs (poll-rounded)",
+        day_count * polls_per_day * POLL_INTERVAL_SECONDS,
+    )
+    plan.note(f"~{day_count * per_day:,.0f} calls to ingest in total")
+    plan.report(window_hours)
+
+
 def load_progress():
     try:
         with open(PROGRESS_FILE, "r") as f:
@@ -406,11 +434,20 @@ def main():
         ),
     )
     parser.add_argument("--resume", action="store_true", help="Resume from last completed day")
-    parser.add_argument("--dry-run", action="store_true", help="Print plan without executing")
+    parser.add_argument("--dry-run", action="store_true", help="Print plan and measured ETA without executing")
+    parser.add_argument("--window", type=float,
+                        help="With --dry-run, report whether the run fits in this many hours")
     parser.add_argument("--timeout", type=int, default=DAY_TIMEOUT_SECONDS,
                         help=f"Timeout per day in seconds (default: {DAY_TIMEOUT_SECONDS})")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS,
+                        help=f"Seconds between log polls (default: {POLL_INTERVAL_SECONDS})")
+    parser.add_argument("--capture", help="Record metadata API exchanges to this JSONL file")
     args = parser.parse_args()
 
+    global recorder
+    if args.capture:
+        recorder = Recorder(args.capture)
+
     base_url = args.url.rstrip("/")
     token = args.token
     pipeline = resolve_pipeline(base_url, token, args.pipeline_id)
@@ -464,7 +501,8 @@ def main():
         for i, day in enumerate(days_to_process):
             day_num = all_days.index(day) + 1
             print(f"  [{day_num}/{total_days}] {day.isoformat()}")
-        print(f"\nEstimated time: {len(days_to_process) * 1.5:.0f} - {len(days_to_process) * 2:.0f} minutes")
+        plan_backfill(base_url, token, pipeline_id, len(days_to_process),
+                      progress or load_progress(), args.window)
         return
 
     # Initialize progress tracking
@@ -538,6 +576,7 @@ def main():
                 known_log_ids,
                 watch_started_at,
                 timeout_seconds=args.timeout,
+                poll_seconds=args.poll_interval,
             )
 
             if result and result["status"] in ("completed", "partial"):
@@ -597,6 +636,8 @@ def main():
     if remaining > 0:
         print(f"  Remaining: {remaining} days (use --resume to continue)")
     print(f"  Progress file: {PROGRESS_FILE}")
+    if args.capture:
+        print(f"  Captured metadata traffic: {args.capture}")
     print(f"{'='*60}")
 
 
@@ -28,7 +28,12 @@
 #     [--parallelism 4] \
 #     [--url https://crm.omniaagent.com] \
 #     [--pipeline-id <uuid>] \
-#     [--chunk-timeout 1800]
+#     [--chunk-timeout 1800] \
+#     [--poll-interval 5] \
+#     [--capture /tmp/calls-capture.jsonl]
+#
+# --capture appends every metadata request/response as JSONL for
+# scripts/replay-ingestion-server.py (see scripts/omnia_backfill/traffic.py).
 
 set -uo pipefail
 
@@ -42,11 +47,12 @@ CHUNK_HOURS=6
 PARALLELISM=4
 CHUNK_TIMEOUT=1800   # client-side cap per batch
 POLL_INTERVAL=5
+CAPTURE=""
 LOG_DIR="/tmp/backfill-logs"
 PROGRESS_DIR="/tmp/backfill-progress"
 
 usage() {
-  sed -n 's/^# //p' "$0" | head -32
+  sed -n 's/^# //p' "$0" | head -31
   exit 1
 }
 
@@ -60,6 +66,8 @@ while [ "$#" -gt 0 ]; do
     --chunk-timeout) CHUNK_TIMEOUT="$2"; shift 2 ;;
     --url)           URL="$2"; shift 2 ;;
     --pipeline-id)   PIPELINE_ID="$2"; shift 2 ;;
+    --poll-interval) POLL_INTERVAL="$2"; shift 2 ;;
+    --capture)       CAPTURE="$2"; shift 2 ;;
     -h|--help)       usage ;;
     *)               echo "Unknown arg: $1" >&2; usage ;;
   esac
@@ -96,12 +104,19 @@ gql() {
 
   local response=""
   local attempt=0
+  local started
   while [ "$attempt" -lt 3 ]; do
+    started=$(date -u +%s)
     response=$(curl -sS --max-time 30 -X POST "$URL/metadata" \
       -H "Authorization: Bearer $TOKEN" \
       -H "Content-Type: application/json" \
       -d "$body" 2>/dev/null)
     if echo "$response" | jq -e '.' >/dev/null 2>&1; then
+      if [ -n "$CAPTURE" ]; then
+        jq -nc --argjson at "$started" --arg q "$query" --argjson v "$variables" \
+          --argjson r "$response" \
+          '{at: $at, elapsed: null, query: $q, variables: $v, response: $r}' >> "$CAPTURE"
+      fi
       echo "$response"
       return 0
     fi
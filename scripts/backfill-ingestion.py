@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Backfill several pull pipelines side by side through the ingestion pipeline.
+
+Generalizes backfill-calls.py: each --job names a pull pipeline (id or exact
+name), a date range, a chunk policy and a priority. Windows from all jobs
+share one --budget of concurrent pulls; one pipeline never runs two windows
+at once, since each window rewrites its date overrides. See
+omnia_backfill/orchestrator.py for the scheduling and chunk policies.
+
+Progress for every pipeline goes to one SQLite file (--progress-db); rerunning
+the same command resumes, skipping windows already completed.
+
+Job spec (comma-separated key=value, or a JSON list of the same keys in
+--jobs-file):
+  pipeline=<id|name>   required
+  start=YYYY-MM-DD     required (or YYYY-MM-DDTHH:MM)
+  end=YYYY-MM-DD       exclusive, defaults to today
+  chunk=day            day, <n>d, <n>h, <n>m, or auto:<records per pull>
+  priority=0           higher runs first when slots are contended
+
+Usage:
+  # Calls and policies together, calls first when both are waiting
+  python3 scripts/backfill-ingestion.py \
+    --url https://staging-crm.omniaagent.com \
+    --token <api-token> \
+    --job "pipeline=Convoso Call Ingestion,start=2025-06-13,end=2026-02-19,priority=1" \
+    --job "pipeline=Old CRM Policy Ingestion,start=2025-01-01,chunk=auto:5000" \
+    --budget 3
+
+  # Dry run (print windows and a measured ETA without executing)
+  python3 scripts/backfill-ingestion.py \
+    --url https://staging-crm.omniaagent.com \
+    --token <api-token> \
+    --jobs-file backfill-jobs.json --dry-run --window 8
+
+  # Record the metadata traffic for replay-ingestion-server.py
+  python3 scripts/backfill-ingestion.py ... --capture /tmp/ingestion-capture.jsonl
+"""
+
+import argparse
+import json
+import signal
+import statistics
+import sys
+from datetime import datetime
+
+from omnia_backfill.ingestion import IngestionClient, log_duration_seconds
+from omnia_backfill.orchestrator import (
+    DEFAULT_BUDGET,
+    DEFAULT_PROGRESS_DB,
+    POLL_INTERVAL_SECONDS,
+    WINDOW_TIMEOUT_SECONDS,
+    BackfillJob,
+    Orchestrator,
+    ProgressDb,
+)
+from omnia_backfill.planner import Plan
+from omnia_backfill.traffic import Recorder
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+JOB_KEYS = {"pipeline", "start", "end", "chunk", "priority"}
+UNMEASURED_WINDOW_SECONDS = 105  # backfill-calls.py's 1.5-2 min/day guess
+
+
+def parse_job_spec(spec):
+    fields = {}
+    for part in spec.split(","):
+        key, sep, value = part.partition("=")
+        key = key.strip()
+        if not sep or key not in JOB_KEYS:
+            raise ValueError(f"bad job spec part {part!r}; keys are {', '.join(sorted(JOB_KEYS))}")
+        fields[key] = value.strip()
+    return fields
+
+
+def parse_date(value):
+    for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"bad date {value!r}; use YYYY-MM-DD or YYYY-MM-DDTHH:MM")
+
+
+def resolve_pipeline(pipelines, ref):
+    matches = [p for p in pipelines if p["id"] == ref] or [p for p in pipelines if p["name"] == ref]
+    if len(matches) != 1:
+        problem = "is ambiguous" if matches else "was not found"
+        print(f"Pipeline {ref!r} {problem}. Pull pipelines:")
+        for p in pipelines:
+            if p.get("mode") == "pull":
+                status = "enabled" if p.get("isEnabled") else "disabled"
+                print(f"    {p['id']} | {p['name']} -> {p['targetObjectNameSingular']} | {status}")
+        sys.exit(1)
+    if matches[0].get("mode") != "pull":
+        print(f"Pipeline {matches[0]['name']!r} is a {matches[0].get('mode')} pipeline; "
+              "only pull pipelines can be backfilled by window")
+        sys.exit(1)
+    return matches[0]
+
+
+def build_jobs(client, specs):
+    pipelines = client.list_pipelines()
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    jobs = []
+    for fields in specs:
+        if "pipeline" not in fields or "start" not in fields:
+            print(f"Job {fields} needs at least pipeline and start")
+            sys.exit(1)
+        job = BackfillJob(
+            resolve_pipeline(pipelines, fields["pipeline"]),
+            parse_date(fields["start"]),
+            parse_date(fields["end"]) if fields.get("end") else today,
+            fields.get("chunk") or "day",
+            int(fields.get("priority") or 0),
+        )
+        if any(other.pipeline_id == job.pipeline_id for other in jobs):
+            print(f"Pipeline {job.name!r} appears in more than one job; give it one date range")
+            sys.exit(1)
+        jobs.append(job)
+    return jobs
+
+
+def plan_jobs(client, jobs, budget, window_hours):
+    """Estimate the run from each pipeline's recent pull durations.
+
+    Per-pipeline wall time is its windows times its mean pull time (rounded
+    up by half a poll interval). Pipelines run in parallel up to the budget,
+    so the ETA is the larger of the slowest pipeline alone and the total
+    work spread over the budget.
+    """
+    plan = Plan(f"backfill-ingestion.py, {len(jobs)} pipelines, budget {budget}")
+    meta = plan.sample("metadata API request")
+    serial = []
+    windows_total = 0
+    for job in jobs:
+        logs = meta.time(client.ingestion_logs, job.pipeline_id)
+        pulls = [
+            (log.get("totalRecordsReceived") or 0, seconds)
+            for log in logs
+            if log.get("triggerType") == "pull" and log.get("status") in ("completed", "partial")
+            and (seconds := log_duration_seconds(log)) is not None
+        ]
+        windows = job.remaining_windows()
+        windows_total += windows
+        if pulls:
+            per_window = statistics.fmean(s for _, s in pulls) + POLL_INTERVAL_SECONDS / 2
+            received = statistics.fmean(r for r, _ in pulls)
+            plan.note(f"{job.name}: {windows} windows, ~{per_window:.0f}s/pull "
+                      f"(~{received:,.0f} records) over {len(pulls)} recent pulls")
+        else:
+            per_window = UNMEASURED_WINDOW_SECONDS
+            plan.note(f"{job.name}: {windows} windows, no completed pulls to measure; "
+                      f"using {per_window}s/pull")
+        serial.append(windows * per_window)
+
+    wall = max(max(serial, default=0), sum(serial) / budget)
+    plan.add("config/trigger requests", windows_total * 3, meta, budget)
+    plan.add_duration(f"pull windows ({budget} pipelines at a time)", wall)
+    plan.report(window_hours)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill several pull pipelines via ingestion")
+    parser.add_argument("--url", required=True, help="Base URL (e.g. https://staging-crm.omniaagent.com)")
+    parser.add_argument("--token", required=True, help="API token")
+    parser.add_argument("--job", action="append", default=[],
+                        help="pipeline=<id|name>,start=...,end=...,chunk=...,priority=... (repeatable)")
+    parser.add_argument("--jobs-file", help="JSON list of job objects with the same keys")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET,
+                        help=f"Concurrent pulls across all pipelines (default: {DEFAULT_BUDGET})")
+    parser.add_argument("--progress-db", default=DEFAULT_PROGRESS_DB,
+                        help=f"Shared progress database (default: {DEFAULT_PROGRESS_DB})")
+    parser.add_argument("--timeout", type=int, default=WINDOW_TIMEOUT_SECONDS,
+                        help=f"Timeout per window in seconds (default: {WINDOW_TIMEOUT_SECONDS})")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS,
+                        help=f"Seconds between log polls (default: {POLL_INTERVAL_SECONDS})")
+    parser.add_argument("--capture", help="Record metadata API exchanges to this JSONL file")
+    parser.add_argument("--dry-run", action="store_true", help="Print plan and measured ETA without executing")
+    parser.add_argument("--window", type=float,
+                        help="With --dry-run, report whether the run fits in this many hours")
+    args = parser.parse_args()
+
+    specs = [parse_job_spec(spec) for spec in args.job]
+    if args.jobs_file:
+        with open(args.jobs_file) as f:
+            specs += [{k: str(v) for k, v in job.items()} for job in json.load(f)]
+    if not specs:
+        print("Error: give at least one --job or a --jobs-file")
+        sys.exit(1)
+
+    recorder = Recorder(args.capture) if args.capture else None
+    client = IngestionClient(args.url, args.token, recorder=recorder)
+    jobs = build_jobs(client, specs)
+    progress = ProgressDb(args.progress_db)
+    orchestrator = Orchestrator(client, jobs, progress, budget=args.budget,
+                                timeout_seconds=args.timeout, poll_seconds=args.poll_interval)
+
+    print("=" * 60)
+    print(f"INGESTION BACKFILL ({len(jobs)} pipelines, {orchestrator.budget} concurrent pulls)")
+    print("=" * 60)
+    for job in sorted(jobs, key=lambda j: -j.priority):
+        print(f"  {job.name} ({job.pipeline_id})")
+        print(f"    {job.start:%Y-%m-%d %H:%M} -> {job.end:%Y-%m-%d %H:%M}, priority {job.priority}, "
+              f"{job.remaining_windows()} windows to run, "
+              f"{len([c for c in job.covered if job.start <= c[0] < job.end])} already done")
+    print(f"  Progress DB: {args.progress_db}")
+
+    if args.dry_run:
+        plan_jobs(client, jobs, orchestrator.budget, args.window)
+        progress.close()
+        return
+
+    def handle_signal(sig, frame):
+        orchestrator.stop.set()
+        print("\n\nInterrupted! Waiting for running pulls, then restoring configs...")
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    print()
+    orchestrator.run()
+
+    print(f"\n{'=' * 60}")
+    print("BACKFILL SUMMARY")
+    incomplete = False
+    for job in jobs:
+        totals = progress.totals(job.pipeline_id)
+        left = job.remaining_windows()
+        incomplete |= left > 0
+        state = f"stopped: {job.stopped}" if job.stopped else ("done" if not left else f"{left} windows left")
+        print(f"  {job.name}: {state}")
+        print(f"    windows this run: {job.windows_done}, worker time {job.busy_seconds / 60:.1f} min")
+        print(f"    all runs: {totals['windows']} windows, {totals['received']:,} received, "
+              f"{totals['created']:,} created, {totals['updated']:,} updated, "
+              f"{totals['failed']:,} failed")
+    if incomplete:
+        print("  Rerun the same command to resume.")
+    print(f"{'=' * 60}")
+    progress.close()
+    if recorder is not None:
+        recorder.close()
+        print(f"Captured metadata traffic: {args.capture}")
+
+
+if __name__ == "__main__":
+    main()
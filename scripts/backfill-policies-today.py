@@ -13,10 +13,16 @@ import sys
 import time
 import requests
 
+from omnia_backfill.agents import AgentIndex
+from omnia_backfill.crm import CrmClient
+from omnia_backfill.old_crm import fetch_page
+from omnia_backfill.resilience import graphql_post
+from omnia_backfill.shared import cached, http_session
+from omnia_backfill.transform import build_policy_inputs, normalize_phone
+
 sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
 
 # === CONFIG ===
-OLD_CRM_BASE = "https://omnia.geogrowth.com/api/orgadmin"
 NEW_CRM_GQL = "https://crm.omniaagent.com/graphql"
 NEW_CRM_TOKEN = open("/tmp/twenty-token.txt").read().strip()
 
@@ -27,31 +33,13 @@ NEW_HEADERS = {
 
 DELAY = 0.02
 
-POLICY_STATUS_NAME_MAP = {
-    "submitted": "SUBMITTED",
-    "pending": "PENDING",
-    "declined": "DECLINED",
-    "canceled": "CANCELED",
-    "incomplete": "INCOMPLETE",
-    "active / approved": "ACTIVE_APPROVED",
-    "active/approved": "ACTIVE_APPROVED",
-    "active / placed": "ACTIVE_PLACED",
-    "active/placed": "ACTIVE_PLACED",
-    "active - approved": "ACTIVE_APPROVED",
-    "active - placed": "ACTIVE_PLACED",
-    "active": "ACTIVE",
-    "payment error - canceled": "PAYMENT_ERROR_CANCELED",
-    "payment error - active/approved": "PAYMENT_ERROR_ACTIVE_APPROVED",
-    "payment error - active/placed": "PAYMENT_ERROR_ACTIVE_PLACED",
-    "payment error - active approved": "PAYMENT_ERROR_ACTIVE_APPROVED",
-    "payment error - active placed": "PAYMENT_ERROR_ACTIVE_PLACED",
-}
-
 # Caches
 phone_cache = {}
-carrier_cache = {}
+carrier_cache = {}  # name -> id, from the shared carrier list (see load_reference_names)
 product_cache = {}
-agent_cache = {}
+carriers = []  # shared {id, name} rows; created carriers are appended for later jobs
+products = []
+agent_index = None
 
 stats = {"created": 0, "skipped": 0, "failed": 0, "no_person": 0}
 dry_run = False
@@ -61,21 +49,9 @@ def gql(query, variables=None):
     payload = {"query": query}
     if variables:
         payload["variables"] = variables
-    resp = requests.post(NEW_CRM_GQL, headers=NEW_HEADERS, json=payload, timeout=30)
+    data, errors = graphql_post(http_session(), NEW_CRM_GQL, payload, headers=NEW_HEADERS)
     time.sleep(DELAY)
-    data = resp.json()
-    if "errors" in data:
-        return None, data["errors"]
-    return data.get("data"), None
-
-
-def normalize_phone(phone_str):
-    if not phone_str:
-        return None
-    digits = "".join(c for c in str(phone_str) if c.isdigit())
-    if len(digits) == 11 and digits.startswith("1"):
-        digits = digits[1:]
-    return digits if digits else None
+    return data, errors
 
 
 def find_person_by_phone(phone_digits):
@@ -175,19 +151,6 @@ def find_or_create_carrier(name):
     if name in carrier_cache:
         return carrier_cache[name]
 
-    data, _ = gql("""
-        query($filter: CarrierFilterInput) {
-            carriers(filter: $filter, first: 1) {
-                edges { node { id } }
-            }
-        }
-    """, {"filter": {"name": {"eq": name}}})
-
-    if data and data["carriers"]["edges"]:
-        cid = data["carriers"]["edges"][0]["node"]["id"]
-        carrier_cache[name] = cid
-        return cid
-
     if dry_run:
         carrier_cache[name] = "dry-run-carrier"
         return "dry-run-carrier"
@@ -201,6 +164,7 @@ def find_or_create_carrier(name):
     if data:
         cid = data["createCarrier"]["id"]
         carrier_cache[name] = cid
+        carriers.append({"id": cid, "name": name})
         return cid
 
     carrier_cache[name] = None
@@ -211,19 +175,6 @@ def find_or_create_product(name):
     if name in product_cache:
         return product_cache[name]
 
-    data, _ = gql("""
-        query($filter: ProductFilterInput) {
-            products(filter: $filter, first: 1) {
-                edges { node { id } }
-            }
-        }
-    """, {"filter": {"name": {"eq": name}}})
-
-    if data and data["products"]["edges"]:
-        pid = data["products"]["edges"][0]["node"]["id"]
-        product_cache[name] = pid
-        return pid
-
     if dry_run:
         product_cache[name] = "dry-run-product"
         return "dry-run-product"
@@ -237,6 +188,7 @@ def find_or_create_product(name):
     if data:
         pid = data["createProduct"]["id"]
         product_cache[name] = pid
+        products.append({"id": pid, "name": name})
         return pid
 
     product_cache[name] = None
@@ -244,24 +196,35 @@ def find_or_create_product(name):
 
 
 def find_agent_by_name(name):
-    if name in agent_cache:
-        return agent_cache[name]
+    return agent_index.resolve(name)
 
-    data, _ = gql("""
-        query($filter: AgentProfileFilterInput) {
-            agentProfiles(filter: $filter, first: 1) {
-                edges { node { id } }
-            }
-        }
-    """, {"filter": {"name": {"like": f"%{name}%"}}})
 
-    if data and data["agentProfiles"]["edges"]:
-        aid = data["agentProfiles"]["edges"][0]["node"]["id"]
-        agent_cache[name] = aid
-        return aid
+def load_agent_index():
+    """Load every agent profile once; member names are matched in process."""
+    global agent_index
+    agent_index = cached(
+        (NEW_CRM_GQL, "agents"),
+        lambda: AgentIndex.from_client(CrmClient(NEW_CRM_GQL, NEW_CRM_TOKEN)),
+    )
+    print(f"  Loaded {len(agent_index)} agent profiles")
 
-    agent_cache[name] = None
-    return None
+
+def load_reference_names():
+    """Index every carrier and product by name, instead of one query per name.
+
+    The lists are shared with later jobs in the same process (omnia-backfill.py
+    run-plan), including the carriers and products this run creates.
+    """
+    global carriers, products
+    client = CrmClient(NEW_CRM_GQL, NEW_CRM_TOKEN)
+    carriers = cached((NEW_CRM_GQL, "carriers"),
+                      lambda: list(client.paginate("carriers", "Carrier", "id name")))
+    products = cached((NEW_CRM_GQL, "products"),
+                      lambda: list(client.paginate("products", "Product", "id name")))
+    for rows, cache in ((carriers, carrier_cache), (products, product_cache)):
+        for row in rows:
+            cache.setdefault(row["name"], row["id"])
+    print(f"  Loaded {len(carriers)} carriers, {len(products)} products")
 
 
 def find_policy_by_application_id(app_id):
@@ -287,21 +250,12 @@ def fetch_todays_policies(target_date):
     total_pages = 1
 
     while page <= total_pages:
-        resp = requests.get(
-            f"{OLD_CRM_BASE}/lead-report-api",
-            params={"page": page, "per_page": 10},
-            headers={"Accept": "application/json"},
-            timeout=15,
-        )
-        if not resp.ok:
-            print(f"  API error on page {page}: {resp.status_code}")
+        try:
+            policies, total_pages, _ = fetch_page(page)
+        except requests.RequestException as e:
+            print(f"  API error on page {page} after retries: {e}")
             break
 
-        data = resp.json()
-        response = data.get("response", {})
-        policies = response.get("data", [])
-        total_pages = response.get("total_page", 1)
-
         for p in policies:
             rd = (p.get("reg_date") or "")[:10]
             if rd == target_date:
@@ -323,75 +277,13 @@ def fetch_todays_policies(target_date):
 
 
 def build_policy_input(policy, person_id):
-    policy_number = policy.get("policy_number") or ""
-    product_name = policy.get("product_name") or ""
-    carrier_name = policy.get("carrier_name") or ""
-
-    # Build display name: "Carrier - Product" (best effort from old CRM data)
-    if carrier_name and product_name:
-        display_name = f"{carrier_name} - {product_name}"
-    elif carrier_name:
-        display_name = f"{carrier_name} - Unknown"
-    elif product_name:
-        display_name = f"Unknown - {product_name}"
-    else:
-        display_name = "Policy"
-
-    inp = {
-        "name": display_name,
-        "policyNumber": policy_number,
-        "leadId": person_id,
-        "oldCrmPolicyId": str(policy["policy_id"]),
-    }
-
-    premium_str = policy.get("total_premium")
-    if premium_str:
-        try:
-            premium = float(premium_str)
-            if premium > 0:
-                inp["premium"] = {
-                    "amountMicros": round(premium * 1_000_000),
-                    "currencyCode": "USD",
-                }
-        except ValueError:
-            pass
-
-    status_name = policy.get("status_name")
-    if status_name:
-        status = POLICY_STATUS_NAME_MAP.get(status_name.lower())
-        if status:
-            inp["status"] = status
-
-    eff = policy.get("effective_date")
-    if eff and eff != "0000-00-00":
-        inp["effectiveDate"] = eff
-
-    exp = policy.get("expires_date")
-    if exp and exp != "0000-00-00":
-        inp["expirationDate"] = exp
-
-    if carrier_name:
-        cid = find_or_create_carrier(carrier_name)
-        if cid:
-            inp["carrierId"] = cid
-
-    if product_name:
-        pid = find_or_create_product(product_name)
-        if pid:
-            inp["productId"] = pid
-
-    agent_name = policy.get("member_name")
-    if agent_name:
-        aid = find_agent_by_name(agent_name)
-        if aid:
-            inp["agentId"] = aid
-
-    # Pass reg_date as-is (EST) — no timezone conversion
-    reg_date = policy.get("reg_date")
-    if reg_date and reg_date != "0000-00-00":
-        inp["submittedDate"] = reg_date
-
-    return inp
+    return build_policy_inputs(
+        [policy],
+        [person_id],
+        resolve_carrier=find_or_create_carrier,
+        resolve_product=find_or_create_product,
+        resolve_agent=find_agent_by_name,
+    )[0]
 
 
 def main():
@@ -419,6 +311,8 @@ def main():
     if not policies:
         print("No policies found. Exiting.")
         return
+    load_agent_index()
+    load_reference_names()
 
     # Process each policy
     for i, policy in enumerate(policies, 1):
@@ -487,6 +381,8 @@ def main():
     print(f"  Skipped:    {stats['skipped']} (already exists by applicationId)")
     print(f"  No person:  {stats['no_person']} (lead not found in CRM)")
     print(f"  Failed:     {stats['failed']}")
+    for line in agent_index.report():
+        print(f"  {line}")
     print("=" * 60)
 
 
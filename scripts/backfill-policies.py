@@ -6,6 +6,22 @@ Usage:
   python3 scripts/backfill-policies.py               # Full backfill
   python3 scripts/backfill-policies.py --sample 50    # Test with 50 policies
   python3 scripts/backfill-policies.py --page 30      # Resume from page 30
+  python3 scripts/backfill-policies.py --snapshot /tmp/crm-snapshot-production.sqlite  # Dedup from local snapshot
+  python3 scripts/backfill-policies.py --shards 4     # 4 worker processes, split by policy_id hash
+  python3 scripts/backfill-policies.py --shards 4 --shard-by pages  # Contiguous page blocks instead
+  python3 scripts/backfill-policies.py --shard 2/4    # Run one shard by hand (0-based)
+  python3 scripts/backfill-policies.py --plan --shards 4 --window 8   # Measured ETA, no writes
+
+Shards share a journal (default /tmp/backfill-policies-shards.jsonl, --journal to
+override) that claims policy ids before creation and records finished pages, so
+re-running the same command resumes each shard. Delete the journal to start over.
+Hash sharding (the default) has every shard read every page, so a row that new
+policies push onto another page is still seen by its shard; page blocks read
+each page once but can miss rows that shift across a block boundary mid-run.
+
+Every failed create is appended to a dead-letter file (default
+/tmp/backfill-policies-dead-letters.jsonl, --dead-letter to override); resend
+just those with scripts/replay-dead-letters.py.
 """
 
 import json
@@ -13,8 +29,20 @@ import sys
 import time
 import requests
 
+from omnia_backfill.agents import AgentIndex
+from omnia_backfill.crm import CrmClient
+from omnia_backfill.deadletter import DeadLetter, default_path as default_dead_letter_path
+from omnia_backfill.old_crm import fetch_page
+from omnia_backfill.planner import Plan, sample_old_crm
+from omnia_backfill.resilience import graphql_post
+from omnia_backfill.scan import parallel_scan
+from omnia_backfill.shard import (
+    default_journal_path, in_shard, launch, open_journal, parse_shard, shard_pages,
+)
+from omnia_backfill.snapshot import Snapshot
+from omnia_backfill.transform import build_policy_inputs, normalize_phones
+
 # === CONFIG ===
-OLD_CRM_BASE = "https://omnia.geogrowth.com/api/orgadmin"
 NEW_CRM_GQL = "https://crm.omniaagent.com/graphql"
 NEW_CRM_TOKEN = open("/tmp/twenty-token.txt").read().strip()
 
@@ -23,34 +51,16 @@ NEW_HEADERS = {
     "Content-Type": "application/json",
 }
 
-PER_PAGE = 10  # API ignores per_page param, always returns 10
 DELAY = 0.02  # seconds between CRM writes
-
-POLICY_STATUS_NAME_MAP = {
-    "submitted": "SUBMITTED",
-    "pending": "PENDING",
-    "declined": "DECLINED",
-    "canceled": "CANCELED",
-    "incomplete": "INCOMPLETE",
-    "active / approved": "ACTIVE_APPROVED",
-    "active/approved": "ACTIVE_APPROVED",
-    "active / placed": "ACTIVE_PLACED",
-    "active/placed": "ACTIVE_PLACED",
-    "active - approved": "ACTIVE_APPROVED",
-    "active - placed": "ACTIVE_PLACED",
-    "active": "ACTIVE",
-    "payment error - canceled": "PAYMENT_ERROR_CANCELED",
-    "payment error - active/approved": "PAYMENT_ERROR_ACTIVE_APPROVED",
-    "payment error - active/placed": "PAYMENT_ERROR_ACTIVE_PLACED",
-    "payment error - active approved": "PAYMENT_ERROR_ACTIVE_APPROVED",
-    "payment error - active placed": "PAYMENT_ERROR_ACTIVE_PLACED",
-}
+PLAN_PAGES = 5  # old-CRM pages timed by --plan
+PRELOAD_PAGE_SIZE = 500
+SCAN_WORKERS = 4  # parallel createdAt ranges for the existing-policy preload
 
 # Caches
 phone_cache = {}       # phone_digits -> person_id
 carrier_cache = {}     # carrier_name -> carrier_id
 product_cache = {}     # product_name -> product_id
-agent_cache = {}       # agent_name -> agent_id
+agent_index = None     # AgentIndex over all agent profiles, see load_agent_index
 lead_source_cache = {} # source_name -> lead_source_id
 synced_policies = set()  # old policy IDs already in CRM
 
@@ -62,12 +72,9 @@ def gql(query, variables=None):
     payload = {"query": query}
     if variables:
         payload["variables"] = variables
-    resp = requests.post(NEW_CRM_GQL, headers=NEW_HEADERS, json=payload, timeout=30)
+    data, errors = graphql_post(requests, NEW_CRM_GQL, payload, headers=NEW_HEADERS)
     time.sleep(DELAY)
-    data = resp.json()
-    if "errors" in data:
-        return None, data["errors"]
-    return data.get("data"), None
+    return data, errors
 
 
 def find_person_by_phone(phone_digits):
@@ -158,24 +165,7 @@ def find_or_create_product(name):
 
 
 def find_agent_by_name(name):
-    if name in agent_cache:
-        return agent_cache[name]
-
-    data, _ = gql("""
-        query($filter: AgentProfileFilterInput) {
-            agentProfiles(filter: $filter, first: 1) {
-                edges { node { id } }
-            }
-        }
-    """, {"filter": {"name": {"like": f"%{name}%"}}})
-
-    if data and data["agentProfiles"]["edges"]:
-        aid = data["agentProfiles"]["edges"][0]["node"]["id"]
-        agent_cache[name] = aid
-        return aid
-
-    agent_cache[name] = None
-    return None
+    return agent_index.resolve(name)
 
 
 def find_or_create_lead_source(name):
@@ -225,165 +215,230 @@ def find_policy_by_old_id(old_id):
     return None
 
 
-def load_existing_policy_ids():
+def load_existing_policy_ids(snapshot_path=None):
     """Pre-load all oldCrmPolicyId values already in the CRM for fast dedup."""
-    print("Loading existing policies from CRM...")
-    cursor = None
+    if snapshot_path:
+        print(f"Loading existing policies from snapshot {snapshot_path}...")
+        snapshot = Snapshot(snapshot_path)
+        snapshot.ensure_fresh(CrmClient(NEW_CRM_GQL, NEW_CRM_TOKEN), "policies")
+        rows = snapshot.query(
+            "SELECT oldCrmPolicyId FROM policies WHERE oldCrmPolicyId IS NOT NULL AND oldCrmPolicyId != ''"
+        )
+        snapshot.close()
+        synced_policies.update(row["oldCrmPolicyId"] for row in rows)
+        print(f"  Found {len(rows)} existing policies with oldCrmPolicyId")
+        return
+
+    print(f"Loading existing policies from CRM ({SCAN_WORKERS} parallel ranges)...")
     count = 0
-    while True:
-        after = f', after: "{cursor}"' if cursor else ""
-        data, err = gql(f"""
-            query {{
-                policies(first: 500{after}) {{
-                    pageInfo {{ hasNextPage endCursor }}
-                    edges {{ node {{ oldCrmPolicyId }} }}
-                }}
-            }}
-        """)
-        if not data:
-            break
-        result = data["policies"]
-        for edge in result["edges"]:
-            oid = edge["node"].get("oldCrmPolicyId")
-            if oid:
-                synced_policies.add(oid)
-                count += 1
-        if not result["pageInfo"]["hasNextPage"]:
-            break
-        cursor = result["pageInfo"]["endCursor"]
+    for node in parallel_scan(
+        CrmClient(NEW_CRM_GQL, NEW_CRM_TOKEN),
+        "policies",
+        "Policy",
+        "id oldCrmPolicyId",
+        filter={"oldCrmPolicyId": {"is": "NOT_NULL"}},
+        workers=SCAN_WORKERS,
+    ):
+        if node.get("oldCrmPolicyId"):
+            synced_policies.add(node["oldCrmPolicyId"])
+            count += 1
     print(f"  Found {count} existing policies with oldCrmPolicyId")
 
 
-def normalize_phone(phone_str):
-    if not phone_str:
-        return None
-    digits = "".join(c for c in phone_str if c.isdigit())
-    if len(digits) == 11 and digits.startswith("1"):
-        digits = digits[1:]
-    return digits if digits else None
-
+def load_agent_index(snapshot_path=None):
+    """Load every agent profile once; member names are matched in process."""
+    global agent_index
+    client = CrmClient(NEW_CRM_GQL, NEW_CRM_TOKEN)
+    if snapshot_path:
+        snapshot = Snapshot(snapshot_path)
+        snapshot.ensure_fresh(client, "agentProfiles")
+        agent_index = AgentIndex.from_snapshot(snapshot)
+        snapshot.close()
+    else:
+        agent_index = AgentIndex.from_client(client)
+    print(f"  Loaded {len(agent_index)} agent profiles")
 
-def build_policy_input(policy, person_id):
-    policy_number = policy.get("policy_number") or ""
-    product_name = policy.get("product_name") or ""
-    carrier_name = policy.get("carrier_name") or ""
 
-    # Build display name: "Carrier - Product" (best effort from old CRM data)
-    if carrier_name and product_name:
-        display_name = f"{carrier_name} - {product_name}"
-    elif carrier_name:
-        display_name = f"{carrier_name} - Unknown"
-    elif product_name:
-        display_name = f"Unknown - {product_name}"
-    else:
-        display_name = "Policy"
+def plan_backfill(shards, shard_by, window_hours):
+    """Time a few real reads and predict requests, bytes and wall time."""
+    plan = Plan("backfill-policies.py" + (f" with {shards} shards" if shards > 1 else ""))
+    page_sample, total_pages, total, rows = sample_old_crm(plan, pages=PLAN_PAGES)
 
-    inp = {
-        "name": display_name,
-        "policyNumber": policy_number,
-        "leadId": person_id,
-        "oldCrmPolicyId": str(policy["policy_id"]),
-    }
+    preload = plan.sample("existing-policy preload page")
+    data, err = preload.time(gql, f"""
+        query {{
+            policies(first: {PRELOAD_PAGE_SIZE}) {{
+                totalCount
+                edges {{ node {{ oldCrmPolicyId }} }}
+            }}
+        }}
+    """)
+    if not data:
+        print(f"Error sampling policies: {err}")
+        sys.exit(1)
+    existing = data["policies"]["totalCount"]
+
+    lookup = plan.sample("policy lookup by oldCrmPolicyId")
+    person_lookup = plan.sample("person lookup by phone")
+    rows = [r for r in rows if r.get("policy_id")]
+    new_rows = [
+        r for r in rows if not lookup.time(find_policy_by_old_id, str(r["policy_id"]))
+    ]
+    phones = normalize_phones([r.get("phone") for r in new_rows])
+    with_person = sum(
+        1 for phone in phones if phone and person_lookup.time(find_person_by_phone, phone)
+    )
+    new_frac = len(new_rows) / len(rows) if rows else 0.0
+    person_frac = with_person / len(new_rows) if new_rows else 0.0
+    plan.note(
+        f"CRM: {existing:,} policies; sample {len(rows)} rows -> "
+        f"{new_frac:.0%} not in CRM, {person_frac:.0%} of those have a person"
+    )
+    plan.note("creates are costed at the lookup latency (plan mode writes nothing)")
+
+    # Every shard preloads the existing ids, then walks its own pages (or, by
+    # hash, every page).
+    new_total = total * new_frac
+    plan.add("preload existing policies",
+             shards * -(-existing // PRELOAD_PAGE_SIZE), preload, shards * SCAN_WORKERS)
+    page_reads = total_pages * (shards if shard_by == "hash" else 1)
+    plan.add("old CRM pages", page_reads, page_sample, shards)
+    plan.add("person lookups", new_total, person_lookup, shards)
+    plan.add("policy creates", new_total * person_frac, lookup, shards)
+    plan.report(window_hours)
+
+
+def take_option(args, name):
+    """Remove `name <value>` from args. Returns (value or None, args)."""
+    if name not in args:
+        return None, args
+    idx = args.index(name)
+    return args[idx + 1], args[:idx] + args[idx + 2:]
+
+
+def fetch_policy_page(page):
+    """Fetch one old-CRM page (with retries); (None, 0, 0) if it still fails."""
+    try:
+        return fetch_page(page)
+    except requests.RequestException as e:
+        print(f"API error on page {page} after retries: {e}")
+        return None, 0, 0
+
+
+def run_shards(count, args, journal_path):
+    print("=" * 60)
+    print(f"POLICY BACKFILL: launching {count} shards (journal {journal_path})")
+    print("=" * 60)
+    merged, finished, failed = launch(__file__, count, args, journal_path)
 
-    premium_str = policy.get("total_premium")
-    if premium_str:
-        try:
-            premium = float(premium_str)
-            if premium > 0:
-                inp["premium"] = {
-                    "amountMicros": round(premium * 1_000_000),
-                    "currencyCode": "USD",
-                }
-        except ValueError:
-            pass
-
-    status_name = policy.get("status_name")
-    if status_name:
-        status = POLICY_STATUS_NAME_MAP.get(status_name.lower())
-        if status:
-            inp["status"] = status
-
-    eff = policy.get("effective_date")
-    if eff and eff != "0000-00-00":
-        inp["effectiveDate"] = eff
-
-    exp = policy.get("expires_date")
-    if exp and exp != "0000-00-00":
-        inp["expirationDate"] = exp
-
-    if carrier_name:
-        cid = find_or_create_carrier(carrier_name)
-        if cid:
-            inp["carrierId"] = cid
-
-    if product_name:
-        pid = find_or_create_product(product_name)
-        if pid:
-            inp["productId"] = pid
-
-    agent_name = policy.get("member_name")
-    if agent_name:
-        aid = find_agent_by_name(agent_name)
-        if aid:
-            inp["agentId"] = aid
-
-    reg_date = policy.get("reg_date")
-    if reg_date and reg_date != "0000-00-00":
-        inp["submittedDate"] = reg_date
-
-    return inp
+    print("\n" + "=" * 60)
+    print("SHARDED BACKFILL COMPLETE")
+    print("=" * 60)
+    print(f"  Shards finished: {len(finished)}/{count}")
+    if failed:
+        print(f"  Shards exited with errors: {failed} (re-run to resume them)")
+    print(f"  Created:   {merged.get('created', 0)}")
+    print(f"  Skipped:   {merged.get('skipped', 0)} (already in CRM or claimed by another shard)")
+    print(f"  No person: {merged.get('no_person', 0)} (phone not found)")
+    print(f"  Failed:    {merged.get('failed', 0)}")
+    print("=" * 60)
+    if failed:
+        sys.exit(1)
 
 
 def main():
-    start_page = 1
-    sample_limit = 0
-
     args = sys.argv[1:]
-    if "--sample" in args:
-        idx = args.index("--sample")
-        sample_limit = int(args[idx + 1])
-        args = args[:idx] + args[idx + 2:]
-    if "--page" in args:
-        idx = args.index("--page")
-        start_page = int(args[idx + 1])
-        args = args[:idx] + args[idx + 2:]
+    sample, args = take_option(args, "--sample")
+    page_arg, args = take_option(args, "--page")
+    snapshot_path, args = take_option(args, "--snapshot")
+    shard_arg, args = take_option(args, "--shard")
+    shard_by, args = take_option(args, "--shard-by")
+    journal_path, args = take_option(args, "--journal")
+    shards, args = take_option(args, "--shards")
+    window, args = take_option(args, "--window")
+    dead_letter_path, args = take_option(args, "--dead-letter")
+
+    shard_by = shard_by or "hash"
+    if shard_by not in ("pages", "hash"):
+        print(f"--shard-by must be 'pages' or 'hash', got {shard_by!r}")
+        sys.exit(1)
+
+    if "--plan" in args:
+        plan_backfill(int(shards or 1), shard_by, float(window) if window else None)
+        return
+
+    sample_limit = int(sample) if sample else 0
+    start_page = int(page_arg) if page_arg else 1
+    journal_path = journal_path or default_journal_path("backfill-policies")
+
+    if shards:
+        passthrough = sys.argv[1:]
+        _, passthrough = take_option(passthrough, "--shards")
+        _, passthrough = take_option(passthrough, "--journal")
+        run_shards(int(shards), passthrough, journal_path)
+        return
+
+    shard_index, shard_count = parse_shard(shard_arg) if shard_arg else (None, None)
+    journal = open_journal(journal_path) if shard_arg else None
+    dead_letters = DeadLetter(dead_letter_path or default_dead_letter_path("backfill-policies"))
 
     print("=" * 60)
     print("POLICY BACKFILL: lead-report-api -> CRM")
     print("=" * 60)
+    if shard_arg:
+        print(f"Shard {shard_index}/{shard_count} by {shard_by}, journal {journal_path}")
     if sample_limit:
         print(f"Sample mode: {sample_limit} policies")
     if start_page > 1:
         print(f"Resuming from page {start_page}")
 
-    # Pre-load existing policies for fast dedup
-    load_existing_policy_ids()
+    # Pre-load existing policies for fast dedup, and agents for name matching
+    load_existing_policy_ids(snapshot_path)
+    load_agent_index(snapshot_path)
+
+    first_policies, total_pages, total = fetch_policy_page(start_page)
+    if first_policies is None:
+        return
+    pages = range(start_page, total_pages + 1)
+    if shard_arg and shard_by == "pages":
+        pages = shard_pages(start_page, total_pages, shard_index, shard_count)
+        print(f"  Pages {pages.start}-{pages.stop - 1} of {total_pages}")
+    done_pages = journal.finished_pages(shard_index) if journal else set()
+    if done_pages:
+        print(f"  {len(done_pages)} pages already finished by this shard, skipping them")
 
-    # Fetch and process all pages
-    page = start_page
     total_processed = 0
-
-    while True:
-        resp = requests.get(
-            f"{OLD_CRM_BASE}/lead-report-api",
-            params={"page": page, "per_page": PER_PAGE},
-            headers={"Accept": "application/json"},
-        )
-        if not resp.ok:
-            print(f"API error on page {page}: {resp.status_code}")
-            break
-
-        data = resp.json()
-        response = data.get("response", {})
-        policies = response.get("data", [])
-        total_pages = response.get("total_page", 1)
-        total = response.get("total", 0)
+    failed_pages = []
+
+    for page in pages:
+        if page in done_pages:
+            continue
+        if page == start_page:
+            policies = first_policies
+        else:
+            policies, _, page_total = fetch_policy_page(page)
+            if policies is None:
+                # Keep crawling; the page is reported at the end (and a
+                # sharded run retries it on resume since it is not journaled).
+                failed_pages.append(page)
+                continue
+            total = page_total
 
         if not policies:
             print(f"No data on page {page}, stopping.")
             break
-
-        for policy in policies:
+        if shard_arg and shard_by == "hash":
+            policies = [
+                p for p in policies
+                if in_shard(p.get("policy_id", ""), shard_index, shard_count)
+            ]
+
+        # Dedup and person lookup first, so relation lookups and input
+        # building only run for rows that will actually be created.
+        eligible = []
+        person_ids = []
+        phones = normalize_phones([p.get("phone") for p in policies])
+        for policy, phone in zip(policies, phones):
             old_id = str(policy.get("policy_id", ""))
             if not old_id:
                 continue
@@ -396,31 +451,73 @@ def main():
                 continue
 
             # Find person by phone
-            phone = normalize_phone(policy.get("phone"))
             person_id = find_person_by_phone(phone) if phone else None
             if not person_id:
                 stats["no_person"] += 1
                 continue
 
-            # Build and create
-            inp = build_policy_input(policy, person_id)
-            result, err = gql("""
-                mutation($input: PolicyCreateInput!) {
-                    createPolicy(data: $input) { id }
-                }
-            """, {"input": inp})
-
-            if result:
-                synced_policies.add(old_id)
-                stats["created"] += 1
-            else:
-                stats["failed"] += 1
-                if stats["failed"] <= 20:
-                    err_msg = err[0]["message"] if err else "unknown"
-                    print(f"  FAIL {old_id}: {err_msg[:150]}")
-
-            if sample_limit and stats["created"] + stats["failed"] >= sample_limit:
-                break
+            eligible.append(policy)
+            person_ids.append(person_id)
+
+        if sample_limit:
+            remaining = sample_limit - (stats["created"] + stats["failed"])
+            eligible = eligible[:remaining]
+            person_ids = person_ids[:remaining]
+
+        if journal and eligible:
+            # Another shard may have seen the same row (pages shift as new
+            # policies arrive); only the shard that claims it creates it.
+            claimed = set(journal.claim(
+                shard_index, [str(p["policy_id"]) for p in eligible], page
+            ))
+            kept = [
+                (policy, pid) for policy, pid in zip(eligible, person_ids)
+                if str(policy["policy_id"]) in claimed
+            ]
+            stats["skipped"] += len(eligible) - len(kept)
+            eligible = [policy for policy, _ in kept]
+            person_ids = [pid for _, pid in kept]
+
+        # Claims not created by the end of the page (failed, or cut short by
+        # an error or Ctrl-C) go back to the journal for the next run.
+        unfinished = {str(policy["policy_id"]) for policy in eligible}
+        try:
+            # Build the whole page of inputs at once, then create
+            inputs = build_policy_inputs(
+                eligible,
+                person_ids,
+                resolve_carrier=find_or_create_carrier,
+                resolve_product=find_or_create_product,
+                resolve_agent=find_agent_by_name,
+            )
+            for inp in inputs:
+                old_id = inp["oldCrmPolicyId"]
+                if old_id in synced_policies:  # repeated within this page
+                    stats["skipped"] += 1
+                    unfinished.discard(old_id)
+                    continue
+                result, err = gql("""
+                    mutation($input: PolicyCreateInput!) {
+                        createPolicy(data: $input) { id }
+                    }
+                """, {"input": inp})
+
+                if result:
+                    synced_policies.add(old_id)
+                    unfinished.discard(old_id)
+                    stats["created"] += 1
+                else:
+                    stats["failed"] += 1
+                    dead_letters.add("createPolicy", inp, err, page=page, shard=shard_index)
+                    if stats["failed"] <= 20:
+                        err_msg = err[0]["message"] if err else "unknown"
+                        print(f"  FAIL {old_id}: {err_msg[:150]}")
+        finally:
+            if journal:
+                journal.release(shard_index, unfinished)
+
+        if journal:
+            journal.page_done(shard_index, page)
 
         print(
             f"  Page {page}/{total_pages} ({total} total) | "
@@ -431,9 +528,9 @@ def main():
 
         if sample_limit and stats["created"] + stats["failed"] >= sample_limit:
             break
-        if page >= total_pages:
-            break
-        page += 1
+
+    if journal:
+        journal.finish(shard_index, stats)
 
     print("\n" + "=" * 60)
     print("BACKFILL COMPLETE")
@@ -442,6 +539,13 @@ def main():
     print(f"  Skipped:   {stats['skipped']} (already in CRM)")
     print(f"  No person: {stats['no_person']} (phone not found)")
     print(f"  Failed:    {stats['failed']}")
+    print(f"  {dead_letters.summary()}")
+    for line in agent_index.report():
+        print(f"  {line}")
+    if failed_pages:
+        print(f"  Pages that failed after retries: {failed_pages}")
+        print(f"  Re-run with --page {failed_pages[0]} (existing policies are skipped), "
+              "or re-run the same --shard to resume.")
     print("=" * 60)
 
 
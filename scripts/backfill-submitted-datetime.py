@@ -9,18 +9,37 @@ time) from the lead-report-api and updates each matching policy.
 Usage:
   python3 scripts/backfill-submitted-datetime.py --dry-run   # Preview changes
   python3 scripts/backfill-submitted-datetime.py              # Apply changes
+  python3 scripts/backfill-submitted-datetime.py --snapshot /tmp/crm-snapshot-production.sqlite
+  python3 scripts/backfill-submitted-datetime.py --plan --window 8   # Measured ETA, no writes
+  python3 scripts/backfill-submitted-datetime.py --workers 16 --rate 40   # More write throughput
+
+Updates run on --workers threads (default 8, at most the shared connection
+pool's 32) sharing one --rate budget of CRM writes per second (default 20).
+Only a few updates per worker are queued at a time, so memory stays flat
+however many policies need fixing.
+
+Failed updates are appended to /tmp/backfill-submitted-datetime-dead-letters.jsonl
+(--dead-letter to override); resend them with scripts/replay-dead-letters.py.
 """
 
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
-from zoneinfo import ZoneInfo
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import islice
 
 import requests
 
+from omnia_backfill.crm import CrmClient
+from omnia_backfill.deadletter import DeadLetter, default_path as default_dead_letter_path
+from omnia_backfill.old_crm import fetch_page
+from omnia_backfill.planner import Plan, sample_old_crm
+from omnia_backfill.resilience import Endpoint, RateLimiter, graphql_post
+from omnia_backfill.scan import parallel_scan
+from omnia_backfill.shared import POOL_SIZE, http_session
+from omnia_backfill.snapshot import Snapshot
+from omnia_backfill.transform import eastern_to_utc_iso, eastern_to_utc_isos
+
 # === CONFIG ===
-OLD_CRM_BASE = "https://omnia.geogrowth.com/api/orgadmin"
 NEW_CRM_GQL = "https://crm.omniaagent.com/graphql"
 NEW_CRM_TOKEN = open("/tmp/twenty-token.txt").read().strip()
 
@@ -29,77 +48,70 @@ NEW_HEADERS = {
     "Content-Type": "application/json",
 }
 
-DELAY = 0.05  # seconds between CRM writes
+DELAY = 0.05  # seconds after each CRM read
 FETCH_WORKERS = 5  # parallel page fetchers
-UPDATE_WORKERS = 3  # parallel update workers
+UPDATE_WORKERS = 8  # parallel update workers (--workers)
+UPDATE_RATE = 20.0  # CRM writes per second across all update workers (--rate)
+IN_FLIGHT_PER_WORKER = 2  # updates queued per worker, so none idles between tasks
+SCAN_WORKERS = 4  # parallel createdAt ranges for the CRM policy scan
+PLAN_PAGES = 5  # old-CRM pages timed by --plan
 
 
-def eastern_to_utc_iso(reg_date_str):
-    """Convert 'YYYY-MM-DD HH:MM:SS' Eastern -> UTC ISO string."""
-    trimmed = reg_date_str.strip()
-    if len(trimmed) <= 10:
-        trimmed += " 00:00:00"
-    naive = datetime.strptime(trimmed[:19], "%Y-%m-%d %H:%M:%S")
-    eastern = naive.replace(tzinfo=ZoneInfo("America/New_York"))
-    utc = eastern.astimezone(ZoneInfo("UTC"))
-    return utc.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-
-def gql(query, variables=None, retries=3):
+def gql(query, variables=None):
     payload = {"query": query}
     if variables:
         payload["variables"] = variables
-    for attempt in range(retries):
-        try:
-            resp = requests.post(NEW_CRM_GQL, headers=NEW_HEADERS, json=payload, timeout=30)
-            time.sleep(DELAY)
-            data = resp.json()
-            if "errors" in data:
-                return None, data["errors"]
-            return data.get("data"), None
-        except (requests.exceptions.RequestException, ValueError):
-            if attempt < retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                return None, [{"message": "request failed after retries"}]
-
-
-def fetch_old_crm_page(page, retries=3):
-    """Fetch one page from the old CRM lead-report-api."""
-    for attempt in range(retries):
-        try:
-            resp = requests.get(
-                f"{OLD_CRM_BASE}/lead-report-api",
-                params={"page": page, "per_page": 10},
-                headers={"Accept": "application/json"},
-                timeout=60,
-            )
-            if not resp.ok:
-                return [], 0
-            data = resp.json()
-            response = data.get("response", {})
-            policies = response.get("data", [])
-            total_pages = response.get("total_page", 1)
-            return policies, total_pages
-        except requests.exceptions.RequestException:
-            if attempt < retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                return [], 0
+    data, errors = graphql_post(http_session(), NEW_CRM_GQL, payload, headers=NEW_HEADERS)
+    time.sleep(DELAY)
+    return data, errors
 
 
-def build_reg_date_lookup():
-    """Fetch all pages from old CRM and build {policy_id: reg_date} lookup."""
-    print("Fetching page 1 to get total page count...")
-    policies, total_pages = fetch_old_crm_page(1)
-    lookup = {}
+# One query text for every update (id as a variable), so it persists once under APQ.
+UPDATE_POLICY = """
+    mutation($id: UUID!, $input: PolicyUpdateInput!) {
+        updatePolicy(id: $id, data: $input) { id }
+    }
+"""
+
+
+def option(name, default, cast=str):
+    if name in sys.argv:
+        return cast(sys.argv[sys.argv.index(name) + 1])
+    return default
+
 
+def fetch_old_crm_page(page):
+    """Fetch one page from the old CRM lead-report-api.
+
+    Returns (policies, total_pages), or (None, 0) when the page still fails
+    after the old-CRM retry policy, so callers can tell it from an empty page.
+    """
+    try:
+        policies, total_pages, _ = fetch_page(page)
+        return policies, total_pages
+    except requests.RequestException as e:
+        print(f"    Page {page} failed after retries: {e}")
+        return None, 0
+
+
+def add_reg_dates(lookup, policies):
     for p in policies:
         pid = str(p.get("policy_id", ""))
         reg = p.get("reg_date", "")
         if pid and reg and reg != "0000-00-00":
             lookup[pid] = reg
 
+
+def build_reg_date_lookup():
+    """Fetch all pages from old CRM and build {policy_id: reg_date} lookup."""
+    print("Fetching page 1 to get total page count...")
+    policies, total_pages = fetch_old_crm_page(1)
+    if policies is None:
+        print("Cannot read page 1 of the old CRM; aborting.")
+        sys.exit(1)
+    lookup = {}
+    add_reg_dates(lookup, policies)
+
     print(f"  Total pages: {total_pages}")
 
     if total_pages <= 1:
@@ -109,59 +121,130 @@ def build_reg_date_lookup():
     remaining = list(range(2, total_pages + 1))
     print(f"  Fetching pages 2-{total_pages} with {FETCH_WORKERS} workers...")
 
+    failed_pages = []
     with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
         futures = {executor.submit(fetch_old_crm_page, pg): pg for pg in remaining}
         done = 0
         for future in as_completed(futures):
             done += 1
             page_policies, _ = future.result()
-            for p in page_policies:
-                pid = str(p.get("policy_id", ""))
-                reg = p.get("reg_date", "")
-                if pid and reg and reg != "0000-00-00":
-                    lookup[pid] = reg
+            if page_policies is None:
+                failed_pages.append(futures[future])
+            else:
+                add_reg_dates(lookup, page_policies)
             if done % 100 == 0:
                 print(f"    {done}/{len(remaining)} pages fetched...")
 
+    # One more pass for pages that failed, once the burst is over.
+    for pg in sorted(failed_pages):
+        page_policies, _ = fetch_old_crm_page(pg)
+        if page_policies is not None:
+            add_reg_dates(lookup, page_policies)
+            failed_pages.remove(pg)
+    if failed_pages:
+        print(f"  WARNING: {len(failed_pages)} pages could not be read: {sorted(failed_pages)}")
+        print("  Policies on those pages count as 'no match' and are left unchanged.")
+
     print(f"  Built lookup with {len(lookup)} policies")
     return lookup
 
 
-def fetch_crm_policies_with_old_id():
+def fetch_crm_policies_with_old_id(snapshot_path=None):
     """Fetch all CRM policies that have an oldCrmPolicyId set."""
-    print("Fetching CRM policies with oldCrmPolicyId...")
-    results = []
-    cursor = None
-
-    while True:
-        after = f', after: "{cursor}"' if cursor else ""
-        data, err = gql(f"""
-            query {{
-                policies(
-                    filter: {{ oldCrmPolicyId: {{ is: NOT_NULL }} }}
-                    first: 500{after}
-                ) {{
-                    pageInfo {{ hasNextPage endCursor }}
-                    edges {{ node {{ id oldCrmPolicyId submittedDate }} }}
-                }}
-            }}
-        """)
-        if not data:
-            print(f"  Error fetching policies: {err}")
-            break
-        result = data["policies"]
-        for edge in result["edges"]:
-            results.append(edge["node"])
-        if not result["pageInfo"]["hasNextPage"]:
-            break
-        cursor = result["pageInfo"]["endCursor"]
+    if snapshot_path:
+        print(f"Reading CRM policies with oldCrmPolicyId from snapshot {snapshot_path}...")
+        snapshot = Snapshot(snapshot_path)
+        snapshot.ensure_fresh(CrmClient(NEW_CRM_GQL, NEW_CRM_TOKEN), "policies")
+        results = snapshot.query(
+            "SELECT id, oldCrmPolicyId, submittedDate FROM policies WHERE oldCrmPolicyId IS NOT NULL"
+        )
+        snapshot.close()
+        print(f"  Found {len(results)} policies with oldCrmPolicyId")
+        return results
+
+    print(f"Fetching CRM policies with oldCrmPolicyId ({SCAN_WORKERS} parallel ranges)...")
+    results = list(parallel_scan(
+        CrmClient(NEW_CRM_GQL, NEW_CRM_TOKEN),
+        "policies",
+        "Policy",
+        "id oldCrmPolicyId submittedDate",
+        filter={"oldCrmPolicyId": {"is": "NOT_NULL"}},
+        workers=SCAN_WORKERS,
+    ))
 
     print(f"  Found {len(results)} policies with oldCrmPolicyId")
     return results
 
 
+def plan_backfill(window_hours, workers, rate):
+    """Time a few real reads and predict requests, bytes and wall time."""
+    plan = Plan("backfill-submitted-datetime.py")
+    page_sample, total_pages, _, rows = sample_old_crm(plan, pages=PLAN_PAGES)
+
+    scan = plan.sample("CRM policy page (500)")
+    data, err = scan.time(gql, """
+        query {
+            policies(filter: { oldCrmPolicyId: { is: NOT_NULL } }, first: 500) {
+                totalCount
+                edges { node { id } }
+            }
+        }
+    """)
+    if not data:
+        print(f"Error sampling policies: {err}")
+        sys.exit(1)
+    with_old_id = data["policies"]["totalCount"]
+
+    # How many sampled policies would actually change?
+    lookup = plan.sample("policy lookup by oldCrmPolicyId")
+    matched = 0
+    stale = 0
+    for row in rows:
+        reg = row.get("reg_date")
+        if not row.get("policy_id") or not reg or reg == "0000-00-00":
+            continue
+        data, _ = lookup.time(gql, """
+            query($filter: PolicyFilterInput) {
+                policies(filter: $filter, first: 1) { edges { node { submittedDate } } }
+            }
+        """, {"filter": {"oldCrmPolicyId": {"eq": str(row["policy_id"])}}})
+        edges = data["policies"]["edges"] if data else []
+        if not edges:
+            continue
+        matched += 1
+        existing = edges[0]["node"].get("submittedDate") or ""
+        if not existing.startswith(eastern_to_utc_iso(reg)[:19]):
+            stale += 1
+    stale_frac = stale / matched if matched else 0.0
+    plan.note(
+        f"CRM: {with_old_id:,} policies with oldCrmPolicyId; {stale}/{matched} "
+        f"sampled matches need an update ({stale_frac:.0%})"
+    )
+    plan.note("updates are costed at the lookup latency (plan mode writes nothing)")
+
+    plan.add("old CRM pages", total_pages, page_sample, FETCH_WORKERS)
+    plan.add("CRM policy scan", -(-with_old_id // 500), scan, SCAN_WORKERS)
+    updates = with_old_id * stale_frac
+    plan.add_duration(
+        f"policy updates ({workers} workers, {rate:g}/s cap)",
+        max(updates * lookup.mean / workers, updates / rate),
+        updates,
+    )
+    plan.report(window_hours)
+
+
 def main():
+    workers = min(max(1, option("--workers", UPDATE_WORKERS, int)), POOL_SIZE)
+    rate = option("--rate", UPDATE_RATE, float)
+    if "--plan" in sys.argv:
+        plan_backfill(option("--window", None, float), workers, rate)
+        return
+
     dry_run = "--dry-run" in sys.argv
+    snapshot_path = option("--snapshot", None)
+    dead_letters = DeadLetter(
+        option("--dead-letter", default_dead_letter_path("backfill-submitted-datetime"))
+    )
 
     print("=" * 60)
     print("BACKFILL: submittedDate DATE_TIME from old CRM reg_date")
@@ -173,23 +256,22 @@ def main():
     reg_date_lookup = build_reg_date_lookup()
 
     # Step 2: Fetch CRM policies with old CRM IDs
-    crm_policies = fetch_crm_policies_with_old_id()
+    crm_policies = fetch_crm_policies_with_old_id(snapshot_path)
 
     # Step 3: Build update tasks
     tasks = []
     skipped_no_match = 0
     skipped_same = 0
 
-    for policy in crm_policies:
-        old_id = policy["oldCrmPolicyId"]
-        reg_date = reg_date_lookup.get(old_id)
+    reg_dates = [reg_date_lookup.get(p["oldCrmPolicyId"]) for p in crm_policies]
+    utc_isos = eastern_to_utc_isos(reg_dates)
 
-        if not reg_date:
+    for policy, utc_iso in zip(crm_policies, utc_isos):
+        old_id = policy["oldCrmPolicyId"]
+        if not utc_iso:
             skipped_no_match += 1
             continue
 
-        utc_iso = eastern_to_utc_iso(reg_date)
-
         existing = policy.get("submittedDate", "")
         if existing and existing.startswith(utc_iso[:19]):
             skipped_same += 1
@@ -199,36 +281,55 @@ def main():
 
     print(f"  {len(tasks)} policies to update, {skipped_same} already correct, {skipped_no_match} no match")
 
-    # Step 4: Execute updates in parallel
+    # Step 4: Execute updates in parallel, a bounded window of them at a time
     updated = 0
     failed = 0
+    writes = Endpoint("crm-writes", timeout=(5, 30), attempts=4, base_delay=0.5,
+                      limiter=RateLimiter(rate))
 
     def do_update(task):
         pid, old_id, utc_iso = task
         if dry_run:
             return True, pid, old_id, utc_iso, None
-        data, err = gql("""
-            mutation($input: PolicyUpdateInput!) {
-                updatePolicy(id: "%s", data: $input) { id }
-            }
-        """ % pid, {"input": {"submittedDate": utc_iso}})
+        data, err = graphql_post(http_session(), NEW_CRM_GQL, {
+            "query": UPDATE_POLICY,
+            "variables": {"id": pid, "input": {"submittedDate": utc_iso}},
+        }, headers=NEW_HEADERS, endpoint=writes)
         return data is not None, pid, old_id, utc_iso, err
 
-    with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as executor:
-        futures = {executor.submit(do_update, t): t for t in tasks}
-        for future in as_completed(futures):
-            ok, pid, old_id, utc_iso, err = future.result()
-            if ok:
-                updated += 1
-                if dry_run:
-                    print(f"  [DRY RUN] Policy {pid} (old={old_id}): -> {utc_iso}")
-            else:
-                failed += 1
-                if failed <= 20:
-                    err_msg = err[0]["message"] if err else "unknown"
-                    print(f"  FAIL {pid}: {err_msg[:150]}")
-            if (updated + failed) % 500 == 0:
-                print(f"  Progress: {updated} updated, {failed} failed / {len(tasks)} total...")
+    if tasks and not dry_run:
+        print(f"  Updating with {workers} workers, at most {rate:g} writes/s...")
+    started = time.monotonic()
+    pending = iter(tasks)
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for task in islice(pending, workers * IN_FLIGHT_PER_WORKER - len(in_flight)):
+                in_flight.add(executor.submit(do_update, task))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                ok, pid, old_id, utc_iso, err = future.result()
+                if ok:
+                    updated += 1
+                    if dry_run:
+                        print(f"  [DRY RUN] Policy {pid} (old={old_id}): -> {utc_iso}")
+                else:
+                    failed += 1
+                    dead_letters.add(
+                        "updatePolicy",
+                        {"id": pid, "data": {"submittedDate": utc_iso}},
+                        err,
+                        oldCrmPolicyId=old_id,
+                    )
+                    if failed <= 20:
+                        err_msg = err[0]["message"] if err else "unknown"
+                        print(f"  FAIL {pid}: {err_msg[:150]}")
+                if (updated + failed) % 500 == 0:
+                    per_second = (updated + failed) / max(time.monotonic() - started, 1e-9)
+                    print(f"  Progress: {updated} updated, {failed} failed / {len(tasks)} total "
+                          f"({per_second:.1f}/s)...")
 
     print("\n" + "=" * 60)
     print("BACKFILL COMPLETE" + (" (DRY RUN)" if dry_run else ""))
@@ -237,6 +338,7 @@ def main():
     print(f"  No match:       {skipped_no_match} (old CRM ID not in lookup)")
     print(f"  Already correct: {skipped_same}")
     print(f"  Failed:         {failed}")
+    print(f"  {dead_letters.summary()}")
     print("=" * 60)
 
 
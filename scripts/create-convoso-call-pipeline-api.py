@@ -11,6 +11,8 @@ import json
 import sys
 import urllib.request
 
+import omnia_backfill  # noqa: F401 (starts OMNIA_PROFILE profiling when set)
+
 
 def graphql_request(base_url, token, query, variables=None):
     url = f"{base_url}/metadata"
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Find near-duplicate leads (people) and write merge plans grouped by keeper.
+
+Replaces the hand search behind dedup-leads-by-near-match.sql: phones off by
+1-2 digits, truncated phones, similar email local parts, same name. Reads
+people and policy counts from the local CRM snapshot (delta-refreshed first)
+and only scores pairs that share a blocking key, so it scales to millions of
+people. Nothing is written to the CRM; review the plans, then run the SQL.
+
+Usage:
+  python3 scripts/find-duplicate-leads.py                            # Summary + JSON plans
+  python3 scripts/find-duplicate-leads.py --sql /tmp/dedup-leads.sql # Also write merge SQL
+  python3 scripts/find-duplicate-leads.py --target staging --min-score 0.9
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+
+from omnia_backfill.crm import TARGETS, CrmClient
+from omnia_backfill.dedup import find_duplicates, person_from_row
+from omnia_backfill.snapshot import Snapshot, default_path
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+DEFAULT_OUT = "/tmp/duplicate-leads-plan.json"
+DEFAULT_SCHEMA = "workspace_oyoiha4z71ppw867jthfb36d"
+
+FILL_COLUMNS = {
+    "first": "nameFirstName",
+    "last": "nameLastName",
+    "phone": "phonesPrimaryPhoneNumber",
+    "email": "emailsPrimaryEmail",
+}
+# (table, column) references re-pointed from the duplicate to the keeper;
+# the same set dedup-leads-by-phone.sql re-points
+PERSON_FKS = [
+    ("_policy", "leadId"),
+    ("_call", "leadId"),
+    ("_familyMember", "leadId"),
+    ("opportunity", "pointOfContactId"),
+    ("favorite", "personId"),
+    ("attachment", "targetPersonId"),
+    ("noteTarget", "targetPersonId"),
+    ("taskTarget", "targetPersonId"),
+    ("timelineActivity", "targetPersonId"),
+    ("calendarEventParticipant", "personId"),
+    ("messageParticipant", "personId"),
+]
+
+
+def describe(person):
+    parts = [f"phone {person['phone'] or '-'}"]
+    if person["email"]:
+        parts.append(f"email {person['email']}")
+    parts.append(f"{person['policies']} polic{'y' if person['policies'] == 1 else 'ies'}")
+    return f"{person['id'][:8]} ({', '.join(parts)})"
+
+
+def reason_kind(reason):
+    """'phone 2 edits' -> 'phone edits', 'name 91% similar' -> 'name similar'."""
+    return re.sub(r"edit$", "edits", re.sub(r" \d+%?", "", reason))
+
+
+def sql_quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def write_sql(plans, path, schema):
+    lines = [
+        "-- " + "=" * 77,
+        "-- Dedup Leads (generated by find-duplicate-leads.py)",
+        "-- " + "=" * 77,
+        f"-- {len(plans)} keepers, {sum(len(p['duplicates']) for p in plans)} duplicates.",
+        "-- For each: fill missing fields on keeper, re-point FKs, soft-delete the duplicate.",
+        "-- " + "=" * 77,
+        "",
+        f"SET search_path TO {schema};",
+        "",
+        "BEGIN;",
+    ]
+    for n, plan in enumerate(plans, 1):
+        keeper = plan["keeper"]
+        lines += [
+            "",
+            "-- " + "═" * 77,
+            f"-- {n}. {keeper['first']} {keeper['last']}".rstrip(),
+            f"--    KEEP: {describe(keeper)}",
+        ]
+        for dup in plan["duplicates"]:
+            lines.append(f"--    DUPE: {describe(dup['person'])} [{', '.join(dup['reasons'])}]")
+        lines.append("-- " + "═" * 77)
+        keeper_id = sql_quote(keeper["id"])
+        for field, value in plan["fill"].items():
+            column = FILL_COLUMNS[field]
+            lines.append(
+                f'UPDATE person SET "{column}" = {sql_quote(value)}, "updatedAt" = NOW()\n'
+                f'  WHERE id = {keeper_id} AND ("{column}" IS NULL OR "{column}" = \'\') '
+                f'AND "deletedAt" IS NULL;'
+            )
+        for dup in plan["duplicates"]:
+            dup_id = sql_quote(dup["person"]["id"])
+            for table, column in PERSON_FKS:
+                lines.append(
+                    f'UPDATE "{table}" SET "{column}" = {keeper_id}, "updatedAt" = NOW()\n'
+                    f'  WHERE "{column}" = {dup_id} AND "deletedAt" IS NULL;'
+                )
+            lines.append(
+                f'UPDATE person SET "deletedAt" = NOW(), "updatedAt" = NOW()\n'
+                f'  WHERE id = {dup_id} AND "deletedAt" IS NULL;'
+            )
+    lines += ["", "COMMIT;", ""]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate leads")
+    parser.add_argument("--target", default="production", choices=sorted(TARGETS))
+    parser.add_argument("--snapshot", help="Snapshot path (default: /tmp/crm-snapshot-<target>.sqlite)")
+    parser.add_argument("--min-score", type=float, default=0.0,
+                        help="Ignore matches scoring below this (0-1)")
+    parser.add_argument("--out", default=DEFAULT_OUT, help=f"Merge plans JSON (default: {DEFAULT_OUT})")
+    parser.add_argument("--sql", help="Also write merge SQL to this path")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="Workspace schema for --sql")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"FIND DUPLICATE LEADS ({args.target})")
+    print("=" * 60)
+
+    client = CrmClient.for_target(args.target)
+    snapshot = Snapshot(args.snapshot or default_path(args.target))
+    snapshot.ensure_fresh(client, "people")
+    snapshot.ensure_fresh(client, "policies")
+    policy_counts = Counter(
+        r["leadId"] for r in snapshot.query("SELECT leadId FROM policies WHERE leadId IS NOT NULL")
+    )
+    people = [person_from_row(r, policy_counts[r["id"]]) for r in snapshot.rows("people")]
+    snapshot.close()
+
+    started = time.time()
+    plans, stats = find_duplicates(people, args.min_score)
+
+    print(f"  People:          {stats['people']}")
+    print(f"  Blocks:          {stats['blocks']}")
+    print(f"  Candidate pairs: {stats['candidatePairs']} "
+          f"(all-pairs would be {stats['people'] * (stats['people'] - 1) // 2})")
+    print(f"  Matched pairs:   {stats['matchedPairs']} ({time.time() - started:.1f}s)")
+    for key, size in stats["skippedBlocks"]:
+        print(f"  WARNING: skipped oversize block {key} ({size} people)")
+
+    duplicates = [d for p in plans for d in p["duplicates"]]
+    reasons = Counter(reason_kind(r) for d in duplicates for r in d["reasons"])
+    print(f"\n  Merge plans: {len(plans)} keepers, {len(duplicates)} duplicates")
+    for reason, count in reasons.most_common():
+        print(f"    {reason}: {count}")
+    for plan in plans[:10]:
+        keeper = plan["keeper"]
+        print(f"\n  KEEP {keeper['first']} {keeper['last']} {describe(keeper)}")
+        for dup in plan["duplicates"]:
+            print(f"    <- {describe(dup['person'])} score {dup['score']} "
+                  f"[{', '.join(dup['reasons'])}]")
+        if plan["fill"]:
+            print(f"    fill: {plan['fill']}")
+    if len(plans) > 10:
+        print(f"\n  ... and {len(plans) - 10} more in {args.out}")
+
+    with open(args.out, "w") as f:
+        json.dump({"target": args.target, "stats": stats, "plans": plans}, f, indent=2)
+    print(f"\n  Plans written to {args.out}")
+    if args.sql:
+        write_sql(plans, args.sql, args.schema)
+        print(f"  SQL written to {args.sql} (review before running)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+One entry point for the backfill and seed scripts, and for chaining them.
+
+`omnia-backfill.py <command> [args]` runs one script in this process with
+its usual arguments. `run-plan` runs several, one after another, in the
+same process, so later jobs start warm instead of paying for their own
+startup:
+  - one HTTP connection pool for every CRM and old-CRM request
+    (omnia_backfill/shared.py)
+  - reference data loaded once per CRM: agent index, carriers, products,
+    including records an earlier job created
+  - the old-CRM mirror: lead-report-api pages an earlier job read are not
+    fetched again (omnia_backfill/old_crm.py)
+Each job still gets fresh script state (stats, flags, per-run caches).
+
+Without job arguments run-plan runs the nightly routine: today's policies,
+then the submittedDate fix, then the production commission seed. A job
+that exits non-zero stops the plan unless --keep-going is given.
+
+Usage:
+  python3 scripts/omnia-backfill.py policies-today --date 2026-02-17 --dry-run
+  python3 scripts/omnia-backfill.py seed-commissions --target staging --dry-run
+
+  # Nightly routine in one process
+  python3 scripts/omnia-backfill.py run-plan
+  python3 scripts/omnia-backfill.py run-plan --dry-run     # --dry-run for every job
+
+  # Custom plan: one quoted job per argument, or one per line in a file
+  python3 scripts/omnia-backfill.py run-plan \
+    "policies-today --date 2026-02-17" "seed-commissions --target staging,production"
+  python3 scripts/omnia-backfill.py run-plan --plan-file nightly.txt --keep-going
+"""
+
+import ast
+import importlib.util
+import os
+import shlex
+import signal
+import sys
+import time
+import traceback
+
+from omnia_backfill import shared
+from omnia_backfill.old_crm import MIRROR
+from omnia_backfill.planner import format_duration
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = {
+    "policies-today": "backfill-policies-today.py",
+    "policies": "backfill-policies.py",
+    "submitted-datetime": "backfill-submitted-datetime.py",
+    "seed-commissions": "seed-carrier-product-commissions.py",
+    "reconcile-policies": "reconcile-policies.py",
+    "push-old-crm-policies": "push-old-crm-policies.py",
+    "replay-dead-letters": "replay-dead-letters.py",
+    "snapshot": "snapshot-crm-objects.py",
+    "find-duplicate-leads": "find-duplicate-leads.py",
+    "calls": "backfill-calls.py",
+    "ingestion": "backfill-ingestion.py",
+    "convoso-list-id": "add-convoso-list-id-field.py",
+    "create-call-pipeline": "create-convoso-call-pipeline-api.py",
+}
+
+NIGHTLY_PLAN = [
+    "policies-today",
+    "submitted-datetime",
+    "seed-commissions --target production",
+]
+
+
+def summary_line(script):
+    """First line of a script's docstring, read without importing it."""
+    with open(os.path.join(SCRIPTS_DIR, script)) as f:
+        doc = ast.get_docstring(ast.parse(f.read())) or ""
+    return doc.strip().splitlines()[0] if doc.strip() else ""
+
+
+def usage():
+    print(__doc__.strip())
+    print("\nCommands:")
+    for name, script in COMMANDS.items():
+        print(f"  {name:<22} {summary_line(script)}")
+    print(f"  {'run-plan':<22} Run several commands in one process, sharing warm state")
+    sys.exit(1)
+
+
+def run_job(name, args):
+    """Load the command's script fresh and call its main(). Returns the exit code."""
+    path = os.path.join(SCRIPTS_DIR, COMMANDS[name])
+    spec = importlib.util.spec_from_file_location(f"omnia_job_{name.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    argv = sys.argv
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    sys.argv = [path, *args]
+    try:
+        spec.loader.exec_module(module)
+        module.main()
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.argv = argv
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+
+
+def parse_plan(args):
+    """run-plan arguments -> ([(command, args)], keep_going)."""
+    keep_going = "--keep-going" in args
+    dry_run = "--dry-run" in args
+    args = [a for a in args if a not in ("--keep-going", "--dry-run")]
+    lines = []
+    if "--plan-file" in args:
+        idx = args.index("--plan-file")
+        with open(args[idx + 1]) as f:
+            lines += [line.split("#", 1)[0] for line in f]
+        args = args[:idx] + args[idx + 2:]
+    lines += args
+    lines = [line for line in lines if line.strip()] or NIGHTLY_PLAN
+
+    jobs = []
+    for line in lines:
+        name, *job_args = shlex.split(line)
+        if name not in COMMANDS:
+            print(f"Unknown command in plan: {name!r}. Commands: {', '.join(COMMANDS)}")
+            sys.exit(1)
+        if dry_run and "--dry-run" not in job_args:
+            job_args.append("--dry-run")
+        jobs.append((name, job_args))
+    return jobs, keep_going
+
+
+def run_plan(args):
+    jobs, keep_going = parse_plan(args)
+    MIRROR.enabled = True
+
+    print("=" * 60)
+    print(f"RUN PLAN ({len(jobs)} jobs in one process)")
+    for i, (name, job_args) in enumerate(jobs, 1):
+        print(f"  {i}. {shlex.join([name, *job_args])}")
+    print("=" * 60)
+
+    results = []
+    for i, (name, job_args) in enumerate(jobs, 1):
+        print(f"\n>>> [{i}/{len(jobs)}] {shlex.join([name, *job_args])}\n")
+        started = time.monotonic()
+        try:
+            code = run_job(name, job_args)
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        results.append((name, job_args, code, time.monotonic() - started))
+        if code and not keep_going:
+            break
+
+    print(f"\n{'=' * 60}")
+    print("RUN PLAN SUMMARY")
+    for name, job_args, code, seconds in results:
+        status = "ok" if not code else f"exit {code}"
+        print(f"  {shlex.join([name, *job_args])}: {status} ({format_duration(seconds)})")
+    for name, _ in jobs[len(results):]:
+        print(f"  {name}: not run")
+    print(f"  Old-CRM mirror: {len(MIRROR.pages):,} pages held, {MIRROR.hits:,} reads served from it")
+    for key, count in sorted(shared.stats.items()):
+        print(f"  Reference data {key}: {count}")
+    print(f"{'=' * 60}")
+    if any(code for _, _, code, _ in results) or len(results) < len(jobs):
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+        usage()
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "run-plan":
+        run_plan(args)
+    elif command in COMMANDS:
+        sys.exit(run_job(command, args))
+    else:
+        print(f"Unknown command: {command!r}")
+        usage()
+
+
+if __name__ == "__main__":
+    main()
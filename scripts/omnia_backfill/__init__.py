@@ -0,0 +1,13 @@
+"""
+Shared helpers for the Omnia CRM backfill and seed scripts in scripts/.
+
+The top-level scripts put scripts/ on sys.path when run as
+`python3 scripts/<name>.py`, so they can `import omnia_backfill` directly.
+"""
+
+import os
+
+if os.environ.get("OMNIA_PROFILE"):
+    from omnia_backfill import profiling
+
+    profiling.start()
@@ -0,0 +1,135 @@
+"""
+In-process agent-name matching against a one-time load of agentProfiles.
+
+Replaces the per-name `agentProfiles(filter: {name: {like: "%name%"}},
+first: 1)` lookup, which is an unindexed wildcard scan on the server and
+returns an arbitrary row when several agents match.
+
+Names are normalized (case, punctuation, whitespace) and indexed by token
+and by trigram. A lookup scores only the agents sharing a token or trigram
+with the query:
+  1.0               normalized names are equal
+  0.8 + 0.2 * J     every query token is one of the agent's tokens (what the
+                    old `like` query matched), J = token Jaccard
+  trigram Jaccard   otherwise, for spelling differences
+The best agent scoring at least MIN_SCORE wins, unless another agent scores
+within AMBIGUITY_MARGIN of it; then the name resolves to None and is
+reported as ambiguous instead of picking one.
+"""
+
+import re
+from collections import defaultdict
+
+MIN_SCORE = 0.6
+AMBIGUITY_MARGIN = 0.05
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name):
+    return " ".join(_NON_WORD.sub(" ", (name or "").lower()).split())
+
+
+def trigrams(normalized):
+    grams = set()
+    for token in normalized.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class AgentIndex:
+    def __init__(self, profiles):
+        """`profiles` is an iterable of {"id", "name"} dicts."""
+        self.agents = []
+        self.by_token = defaultdict(set)
+        self.by_trigram = defaultdict(set)
+        for profile in profiles:
+            normalized = normalize_name(profile.get("name"))
+            if not normalized:
+                continue
+            i = len(self.agents)
+            tokens = set(normalized.split())
+            grams = trigrams(normalized)
+            self.agents.append((profile["id"], profile["name"], normalized, tokens, grams))
+            for token in tokens:
+                self.by_token[token].add(i)
+            for gram in grams:
+                self.by_trigram[gram].add(i)
+        self.cache = {}
+        self.ambiguous = {}  # query name -> [(score, agent name), ...]
+        self.unmatched = set()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot.rows("agentProfiles"))
+
+    @classmethod
+    def from_client(cls, client):
+        return cls(client.paginate("agentProfiles", "AgentProfile", "id name"))
+
+    def __len__(self):
+        return len(self.agents)
+
+    def candidates(self, name):
+        """All agents scoring at least MIN_SCORE, best first, ties by name then id."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        tokens = set(normalized.split())
+        grams = trigrams(normalized)
+        pool = set()
+        for token in tokens:
+            pool |= self.by_token.get(token, set())
+        for gram in grams:
+            pool |= self.by_trigram.get(gram, set())
+
+        scored = []
+        for i in pool:
+            agent_id, agent_name, agent_norm, agent_tokens, agent_grams = self.agents[i]
+            if agent_norm == normalized:
+                score = 1.0
+            elif tokens <= agent_tokens:
+                score = 0.8 + 0.2 * _jaccard(tokens, agent_tokens)
+            else:
+                score = _jaccard(grams, agent_grams)
+            if score >= MIN_SCORE:
+                scored.append((round(score, 4), agent_name, agent_id))
+        scored.sort(key=lambda s: (-s[0], s[1], s[2]))
+        return scored
+
+    def resolve(self, name):
+        """Agent id for an old-CRM member_name, or None if unmatched/ambiguous."""
+        if name in self.cache:
+            return self.cache[name]
+        scored = self.candidates(name)
+        agent_id = None
+        if not scored:
+            self.unmatched.add(name)
+        elif len(scored) > 1 and scored[0][0] - scored[1][0] < AMBIGUITY_MARGIN:
+            self.ambiguous[name] = [
+                (score, agent_name) for score, agent_name, _ in scored
+                if scored[0][0] - score < AMBIGUITY_MARGIN
+            ]
+        else:
+            agent_id = scored[0][2]
+        self.cache[name] = agent_id
+        return agent_id
+
+    def report(self, limit=20):
+        """Summary lines for names that did not resolve to exactly one agent."""
+        lines = []
+        if self.ambiguous:
+            lines.append(f"Ambiguous agent names (left unlinked): {len(self.ambiguous)}")
+            for name in sorted(self.ambiguous)[:limit]:
+                matches = ", ".join(f"{n} ({s:.2f})" for s, n in self.ambiguous[name])
+                lines.append(f"  {name!r}: {matches}")
+        if self.unmatched:
+            names = sorted(self.unmatched)
+            more = f" ... +{len(names) - limit}" if len(names) > limit else ""
+            lines.append(f"Unmatched agent names: {len(names)}: {names[:limit]}{more}")
+        return lines
@@ -0,0 +1,88 @@
+"""
+Automatic persisted queries (APQ) for the CRM GraphQL endpoint.
+
+Instead of the full query text, a request carries
+
+    {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "<hash>"}},
+     "variables": {...}}
+
+and the server looks the text up by hash. The first time a process uses a
+query against an endpoint it sends the text together with the hash, which
+registers it; after that only the hash goes out. If the server has evicted
+the hash (PERSISTED_QUERY_NOT_FOUND) the text is sent again. An endpoint that
+does not support APQ is remembered and gets plain requests from then on.
+
+Registered hashes are cached per endpoint URL for the life of the process.
+"""
+
+import hashlib
+import threading
+from functools import lru_cache
+
+NOT_FOUND_MARKERS = ("persisted_query_not_found", "persistedquerynotfound")
+UNSUPPORTED_MARKERS = (
+    "persisted_query_not_supported", "persistedquerynotsupported",
+    "must provide query", "missing query", "query string",
+)
+
+
+@lru_cache(maxsize=None)
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def _apq_error(body):
+    """'not_found', 'unsupported' or None for a response body."""
+    if body.get("data") is not None:
+        return None
+    for error in body.get("errors") or []:
+        text = f"{error.get('message', '')} {(error.get('extensions') or {}).get('code', '')}".lower()
+        if any(marker in text for marker in NOT_FOUND_MARKERS):
+            return "not_found"
+        if any(marker in text for marker in UNSUPPORTED_MARKERS):
+            return "unsupported"
+    return None
+
+
+class PersistedQueries:
+    def __init__(self):
+        self.registered = {}  # endpoint url -> set of hashes
+        self.unsupported = set()
+        self.lock = threading.Lock()
+
+    def post(self, send, url, payload):
+        """Run `payload` ({"query", "variables"}) through the APQ exchange.
+
+        `send(body)` posts one JSON body and returns the decoded response.
+        """
+        if url in self.unsupported:
+            return send(payload)
+        digest = query_hash(payload["query"])
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": digest}}
+        with self.lock:
+            known = digest in self.registered.get(url, ())
+
+        if known:
+            short = {k: v for k, v in payload.items() if k != "query"}
+            body = send({**short, "extensions": extensions})
+            error = _apq_error(body)
+            if error is None:
+                return body
+            if error == "unsupported":
+                return self._disable(send, url, payload)
+
+        body = send({**payload, "extensions": extensions})
+        if _apq_error(body) == "unsupported":
+            return self._disable(send, url, payload)
+        with self.lock:
+            self.registered.setdefault(url, set()).add(digest)
+        return body
+
+    def _disable(self, send, url, payload):
+        with self.lock:
+            self.unsupported.add(url)
+        print(f"  {url} does not support persisted queries; sending full query text")
+        return send(payload)
+
+
+PERSISTED_QUERIES = PersistedQueries()
@@ -0,0 +1,77 @@
+"""
+Bulk update writer: many per-record updates in one GraphQL request.
+
+Twenty's plural `update{Plural}` mutation sets the same data on every
+matched row, so per-record values (a different submittedDate per policy)
+are sent as aliased single-record mutations in one document instead:
+
+    mutation($id0: UUID!, $d0: PolicyUpdateInput!, $id1: UUID!, $d1: PolicyUpdateInput!) {
+        u0: updatePolicy(id: $id0, data: $d0) { id }
+        u1: updatePolicy(id: $id1, data: $d1) { id }
+    }
+
+Ids travel as variables, so the document depends only on the type and
+batch size and its persisted-query hash is reused across batches.
+
+A failing alias does not roll back the others; its error carries the alias
+in `path`, so results are reported per record.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_WORKERS = 4
+
+
+def update_batch(client, type_name, updates):
+    """Send one batch of (id, data) updates.
+
+    Returns a list of (id, errors) for the records that failed.
+    """
+    params = ", ".join(
+        f"$id{i}: UUID!, $d{i}: {type_name}UpdateInput!" for i in range(len(updates))
+    )
+    fields = "\n".join(
+        f"u{i}: update{type_name}(id: $id{i}, data: $d{i}) {{ id }}" for i in range(len(updates))
+    )
+    variables = {}
+    for i, (record_id, data) in enumerate(updates):
+        variables[f"id{i}"] = record_id
+        variables[f"d{i}"] = data
+    data, errors = client.gql_partial(f"mutation({params}) {{\n{fields}\n}}", variables)
+
+    errors_by_alias = {}
+    for error in errors:
+        path = error.get("path") or []
+        errors_by_alias.setdefault(path[0] if path else None, []).append(error)
+
+    failures = []
+    for i, (record_id, _) in enumerate(updates):
+        if not data.get(f"u{i}"):
+            failures.append((record_id, errors_by_alias.get(f"u{i}") or errors or None))
+    return failures
+
+
+def update_many(client, type_name, updates, batch_size=DEFAULT_BATCH_SIZE,
+                workers=DEFAULT_WORKERS, on_batch=None):
+    """Write all (id, data) updates in concurrent aliased batches.
+
+    Returns (updated_count, [(id, data, errors)] for failures). `on_batch` is
+    called with (batches_done, batch_count) for progress output.
+    """
+    by_id = dict(updates)
+    batches = [updates[i:i + batch_size] for i in range(0, len(updates), batch_size)]
+    updated = 0
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(update_batch, client, type_name, b): b for b in batches}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                batch_failures = future.result()
+            except Exception as e:  # transport failure for the whole batch
+                batch_failures = [(record_id, e) for record_id, _ in futures[future]]
+            updated += len(futures[future]) - len(batch_failures)
+            failures.extend((rid, by_id[rid], err) for rid, err in batch_failures)
+            if on_batch:
+                on_batch(done, len(batches))
+    return updated, failures
@@ -0,0 +1,252 @@
+"""
+Workspace GraphQL client for the new CRM.
+
+Returns `(data, errors)` tuples like the per-script `gql()` helpers (transport
+failures and non-JSON responses included, as in resilience.graphql_post), and
+adds cursor pagination so callers do not have to hand-roll the pageInfo loop.
+
+Request bodies over COMPRESS_MIN_BYTES are sent gzip-compressed (resent plain
+only when the server rejects the encoding) and responses are accepted
+gzip/deflate-compressed. Page sizes adapt to server latency
+(omnia_backfill/paging.py). When ijson is installed, paginate parses
+each page as it streams in and yields nodes one at a time instead of holding
+the whole decoded page; without it, pages are parsed with resp.json().
+gql/gql_partial go out as automatic persisted queries (omnia_backfill/apq.py);
+paginate's streamed pages always carry the full query text.
+"""
+
+import gzip
+import json
+import re
+import time
+
+import requests
+
+from omnia_backfill.apq import PERSISTED_QUERIES
+from omnia_backfill.paging import PageSizer, is_complexity_error
+from omnia_backfill.resilience import CRM
+from omnia_backfill.shared import mount
+
+try:
+    import ijson
+except ImportError:  # optional; paginate falls back to resp.json()
+    ijson = None
+
+COMPRESS_MIN_BYTES = 1024  # smaller bodies are not worth compressing
+# A 400 whose body matches this blames the gzip body (unsupported encoding,
+# or gzip bytes parsed as JSON), not the GraphQL document
+ENCODING_ERROR = re.compile(
+    r"encod|gzip|compress|inflate|invalid json|not valid json|unexpected token|in json at position",
+    re.IGNORECASE,
+)
+
+
+class QueryError(RuntimeError):
+    def __init__(self, plural, errors):
+        super().__init__(f"Error fetching {plural}: {errors}")
+        self.errors = errors
+
+
+TARGETS = {
+    "staging": "https://staging-crm.omniaagent.com/graphql",
+    "production": "https://crm.omniaagent.com/graphql",
+}
+
+TOKEN_FILES = {
+    "staging": "/tmp/twenty-token-staging.txt",
+    "production": "/tmp/twenty-token.txt",
+}
+
+
+def read_token(target_name):
+    with open(TOKEN_FILES[target_name]) as f:
+        return f.read().strip()
+
+
+class CrmClient:
+    def __init__(self, url, token, delay=0.0, timeout=30, compress=True, endpoint=CRM):
+        self.url = url
+        self.endpoint = endpoint
+        self.delay = delay
+        self.timeout = timeout
+        self.compress = compress
+        self.session = mount(requests.Session())  # shared connection pool, own headers
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+        })
+
+    @classmethod
+    def for_target(cls, target_name, **kwargs):
+        return cls(TARGETS[target_name], read_token(target_name), **kwargs)
+
+    def _send(self, payload, idempotent=True, stream=False):
+        body = json.dumps(payload).encode()
+        compressed = self.compress and len(body) >= COMPRESS_MIN_BYTES
+
+        def send(data, headers):
+            return self.endpoint.request(
+                self.session, "POST", self.url, data=data, headers=headers,
+                timeout=self.timeout, idempotent=idempotent, stream=stream,
+            )
+
+        if compressed:
+            resp = send(gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"})
+            if self._rejected_encoding(resp):
+                # Rejected before execution, so resending a mutation is safe.
+                resp.close()
+                plain = send(body, None)
+                if plain.status_code != resp.status_code:
+                    print("  Server does not accept compressed requests; sending them uncompressed")
+                    self.compress = False
+                resp = plain
+        else:
+            resp = send(body, None)
+        if self.delay:
+            time.sleep(self.delay)
+        return resp
+
+    @staticmethod
+    def _rejected_encoding(resp):
+        """True when the server refused the gzip body rather than the query."""
+        if resp.status_code == 415:
+            return True
+        return resp.status_code == 400 and bool(ENCODING_ERROR.search(resp.text[:500]))
+
+    def _post(self, query, variables):
+        payload = {"query": query}
+        if variables:
+            payload["variables"] = variables
+        # Hash-only bodies carry no query text, so decide idempotency here
+        idempotent = not query.lstrip().startswith("mutation")
+
+        def send(body):
+            # Same failure shape as resilience.graphql_post: errors, not raises
+            try:
+                resp = self._send(body, idempotent)
+            except requests.exceptions.RequestException as e:
+                return {"errors": [{
+                    "message": f"{type(e).__name__}: {e}",
+                    "extensions": {"code": "TIMEOUT"},
+                }]}
+            try:
+                return resp.json()
+            except ValueError:
+                return {"errors": [{
+                    "message": f"HTTP {resp.status_code}: {resp.text[:200]}",
+                    "extensions": {"code": "INTERNAL_SERVER_ERROR" if resp.status_code >= 500 else None},
+                }]}
+
+        return PERSISTED_QUERIES.post(send, self.url, payload)
+
+    def gql(self, query, variables=None):
+        data = self._post(query, variables)
+        if "errors" in data:
+            return None, data["errors"]
+        return data.get("data"), None
+
+    def gql_partial(self, query, variables=None):
+        """Like gql, but keep the data of fields that succeeded next to the errors.
+
+        For documents with several aliased mutations, where one failing alias
+        should not hide the others. Returns (data or {}, errors or []).
+        """
+        data = self._post(query, variables)
+        return data.get("data") or {}, data.get("errors") or []
+
+    def paginate(self, plural, type_name, selection, filter=None,
+                 order_by=None, first=None):
+        """Yield every node of `plural` matching `filter`, one page at a time.
+
+        `type_name` is the PascalCase singular name used for the generated
+        input types (e.g. "Policy" for policies). Raises RuntimeError on a
+        GraphQL error instead of silently returning a truncated result.
+
+        Without `first` the page size is tuned per page (see paging.py); with
+        it the size is fixed except for halving on query-complexity errors.
+        """
+        query = f"""
+            query($filter: {type_name}FilterInput,
+                  $orderBy: [{type_name}OrderByInput],
+                  $first: Int, $after: String) {{
+                {plural}(filter: $filter, orderBy: $orderBy,
+                         first: $first, after: $after) {{
+                    pageInfo {{ hasNextPage endCursor }}
+                    edges {{ node {{ {selection} }} }}
+                }}
+            }}
+        """
+        sizer = PageSizer() if first is None else PageSizer(initial=first, maximum=first)
+        variables = {}
+        if filter:
+            variables["filter"] = filter
+        if order_by:
+            variables["orderBy"] = order_by
+
+        while True:
+            variables["first"] = sizer.size
+            page_info = {}
+            timing = {}
+            rows = 0
+            try:
+                for node in self._page_nodes(query, variables, plural, page_info, timing):
+                    rows += 1
+                    yield node
+            except QueryError as e:
+                if rows or not is_complexity_error(e.errors) or not sizer.shrink():
+                    raise
+                print(f"  {plural}: query too complex at {variables['first']} rows/page, "
+                      f"retrying with {sizer.size}")
+                continue
+            if first is None:
+                sizer.observe(variables["first"], rows, timing["seconds"],
+                              timing.get("bytes"), bool(page_info.get("hasNextPage")))
+            if not page_info.get("hasNextPage"):
+                return
+            variables["after"] = page_info["endCursor"]
+
+    def _page_nodes(self, query, variables, plural, page_info, timing):
+        """Yield the nodes of one page and fill `page_info` once it is read.
+
+        `timing` gets the server latency (until response headers) and, when
+        known, the response size on the wire.
+        """
+        resp = self._send({"query": query, "variables": variables}, stream=ijson is not None)
+        timing["seconds"] = resp.elapsed.total_seconds()
+        if resp.headers.get("Content-Length", "").isdigit():
+            timing["bytes"] = int(resp.headers["Content-Length"])
+        if ijson is None or resp.status_code != 200:
+            try:
+                body = resp.json()
+            except ValueError:
+                raise QueryError(plural, [{"message": f"HTTP {resp.status_code}: {resp.text[:200]}"}])
+            if "errors" in body:
+                raise QueryError(plural, body["errors"])
+            result = body["data"][plural]
+            page_info.update(result["pageInfo"])
+            for edge in result["edges"]:
+                yield edge["node"]
+            return
+
+        node_prefix = f"data.{plural}.edges.item.node"
+        info_prefix = f"data.{plural}.pageInfo."
+        resp.raw.decode_content = True
+        builder = errors = None
+        with resp:
+            for prefix, event, value in ijson.parse(resp.raw, use_float=True):
+                if builder is not None:
+                    if prefix == node_prefix and event == "end_map":
+                        yield builder.value
+                        builder = None
+                    elif prefix == "errors" and event == "end_array":
+                        errors, builder = builder.value, None
+                    else:
+                        builder.event(event, value)
+                elif prefix in (node_prefix, "errors") and event in ("start_map", "start_array"):
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                elif prefix.startswith(info_prefix):
+                    page_info[prefix[len(info_prefix):]] = value
+        if errors:
+            raise QueryError(plural, errors)
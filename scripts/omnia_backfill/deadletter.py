@@ -0,0 +1,109 @@
+"""
+Dead-letter file for backfill writes that failed.
+
+Every failed create/update is appended to a JSONL file with the exact input
+that was sent and an error class, so a run can be repaired by replaying just
+those lines (scripts/replay-dead-letters.py) instead of re-running the whole
+backfill. Appends are guarded by an fcntl lock, so threads and shard
+processes can share one file.
+
+Error classes:
+  transient  - timeouts, rate limits, 5xx/network failures; worth retrying
+  duplicate  - the record already exists (a unique constraint fired)
+  invalid    - the server rejected the input; retrying will not help
+  unknown    - anything else
+"""
+
+import fcntl
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+TRANSIENT_CODES = {"TIMEOUT", "INTERNAL_SERVER_ERROR"}
+INVALID_CODES = {
+    "BAD_USER_INPUT", "GRAPHQL_VALIDATION_FAILED", "GRAPHQL_PARSE_FAILED",
+    "NOT_FOUND", "FORBIDDEN", "METADATA_VALIDATION_FAILED",
+}
+TRANSIENT_MARKERS = (
+    "timeout", "timed out", "request failed after retries", "too many requests",
+    "limit reached", "econnreset", "connection", "502", "503", "504",
+)
+DUPLICATE_MARKERS = ("duplicate", "already exists", "unique constraint")
+
+
+def default_path(name):
+    return f"/tmp/{name}-dead-letters.jsonl"
+
+
+def classify_error(errors):
+    """Error class for a GraphQL `errors` list, an exception, or a message."""
+    if isinstance(errors, BaseException):
+        message, codes = f"{type(errors).__name__}: {errors}", set()
+    elif isinstance(errors, list):
+        message = " ".join(str(e.get("message", "")) for e in errors)
+        codes = {(e.get("extensions") or {}).get("code") for e in errors}
+    else:
+        message, codes = str(errors or ""), set()
+
+    lowered = message.lower()
+    if "CONFLICT" in codes or any(m in lowered for m in DUPLICATE_MARKERS):
+        return "duplicate"
+    if codes & TRANSIENT_CODES or any(m in lowered for m in TRANSIENT_MARKERS):
+        return "transient"
+    if codes & INVALID_CODES:
+        return "invalid"
+    return "unknown"
+
+
+def error_message(errors):
+    if isinstance(errors, BaseException):
+        return f"{type(errors).__name__}: {errors}"
+    if isinstance(errors, list):
+        return "; ".join(str(e.get("message", "")) for e in errors)[:500]
+    return str(errors or "unknown")[:500]
+
+
+class DeadLetter:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.by_class = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind, payload, errors, attempts=1, **context):
+        """Record one failed write. `payload` is what replay will resend."""
+        error_class = classify_error(errors)
+        entry = {
+            "kind": kind,
+            "payload": payload,
+            "errorClass": error_class,
+            "error": error_message(errors),
+            "attempts": attempts,
+            "failedAt": datetime.now(timezone.utc).isoformat(),
+            **context,
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(line)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            self.count += 1
+            self.by_class[error_class] = self.by_class.get(error_class, 0) + 1
+        return error_class
+
+    def summary(self):
+        if not self.count:
+            return "no dead letters"
+        classes = ", ".join(f"{k}={v}" for k, v in sorted(self.by_class.items()))
+        return f"{self.count} dead letters ({classes}) -> {self.path}"
+
+
+def read_entries(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,296 @@
+"""
+Fuzzy near-duplicate detection for CRM people (leads).
+
+Comparing every pair is quadratic, so people are first grouped into blocks
+that a real duplicate almost always shares with its keeper:
+  - phone prefix (area code + exchange): typos in the last digits, truncation
+  - soundex of first + last name plus the last PHONE_SUFFIX digits: typos
+    in the area code or exchange (a name alone makes huge blocks for common
+    names, so it is paired with the part of the phone the prefix misses)
+  - email local part without digits: jeremiegrant31 vs jeremiegrant3
+Only pairs inside a block are scored. Blocks larger than MAX_BLOCK_SIZE are
+split by area code; any still too large are skipped and reported.
+
+A pair matches when the names are similar and a phone or email is (near)
+equal, or when a phone/email is identical and one side has no name. Matches
+are joined into clusters and each cluster becomes one merge plan with a
+keeper chosen the way dedup-leads-by-phone.sql does: most policies, then most
+complete, then most recently updated.
+"""
+
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from omnia_backfill.transform import normalize_phone
+
+PHONE_PREFIX = 6
+PHONE_SUFFIX = 4
+MIN_TRUNCATED_PHONE = 6
+MAX_PHONE_EDITS = 2
+MAX_EMAIL_EDITS = 2
+MIN_EMAIL_LOCAL = 6
+MIN_NAME_SIMILARITY = 0.85
+MAX_BLOCK_SIZE = 200
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+_NON_LETTERS = re.compile(r"[^a-z]")
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+
+@lru_cache(maxsize=None)
+def soundex(word):
+    """American soundex: first letter plus three digits, '' for no letters."""
+    letters = _NON_LETTERS.sub("", (word or "").lower())
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    last = _SOUNDEX_CODES.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+
+def edit_distance(a, b, limit=None):
+    """Optimal string alignment distance (adjacent transpositions cost 1).
+
+    With `limit`, only a band of width 2 * limit + 1 around the diagonal is
+    computed and anything above the limit comes back as limit + 1.
+    """
+    if a == b:
+        return 0
+    if limit is None:
+        limit = max(len(a), len(b))
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    prev2 = None
+    prev = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        cur = [over] * (len(b) + 1)
+        if i <= limit:
+            cur[0] = i
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, prev2[j - 2] + 1)
+            cur[j] = min(value, over)
+        if min(cur[lo - 1:hi + 1]) > limit:
+            return over
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return 1 - edit_distance(a, b) / max(len(a), len(b))
+
+
+def person_from_row(row, policy_count=0):
+    """Normalized view of a snapshot `people` row."""
+    first = (row.get("nameFirstName") or "").strip()
+    last = (row.get("nameLastName") or "").strip()
+    email = (row.get("emailsPrimaryEmail") or "").strip().lower()
+    local = email.split("@")[0] if "@" in email else ""
+    return {
+        "id": row["id"],
+        "updatedAt": row.get("updatedAt") or "",
+        "first": first,
+        "last": last,
+        "name": _NON_LETTERS.sub("", f"{first}{last}".lower()),
+        "phone": normalize_phone(row.get("phonesPrimaryPhoneNumber")) or "",
+        "email": email,
+        "emailLocal": _NON_ALNUM.sub("", local),
+        "policies": policy_count,
+    }
+
+
+def blocking_keys(person):
+    keys = []
+    if len(person["phone"]) >= PHONE_PREFIX:
+        keys.append("phone:" + person["phone"][:PHONE_PREFIX])
+    if person["first"] and person["last"] and len(person["phone"]) >= PHONE_PREFIX:
+        keys.append(
+            f"name:{soundex(person['first'])}{soundex(person['last'])}"
+            f"/{person['phone'][-PHONE_SUFFIX:]}"
+        )
+    stem = person["emailLocal"].rstrip("0123456789")
+    if len(stem) >= MIN_EMAIL_LOCAL - 2:
+        keys.append("email:" + stem)
+    return keys
+
+
+def build_blocks(people):
+    """Blocking key -> member indexes. Returns (blocks, skipped oversize keys)."""
+    blocks = defaultdict(list)
+    for i, person in enumerate(people):
+        for key in blocking_keys(person):
+            blocks[key].append(i)
+
+    result = {}
+    skipped = []
+    for key, members in blocks.items():
+        if len(members) < 2:
+            continue
+        if len(members) <= MAX_BLOCK_SIZE:
+            result[key] = members
+            continue
+        split = defaultdict(list)
+        for i in members:
+            split[f"{key}/{people[i]['phone'][:3]}"].append(i)
+        for sub_key, sub in split.items():
+            if len(sub) > MAX_BLOCK_SIZE:
+                skipped.append((sub_key, len(sub)))
+            elif len(sub) > 1:
+                result[sub_key] = sub
+    return result, skipped
+
+
+def candidate_pairs(blocks):
+    pairs = set()
+    for members in blocks.values():
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                pairs.add((i, j) if i < j else (j, i))
+    return pairs
+
+
+def _phone_evidence(a, b):
+    if not a or not b:
+        return None
+    if a == b:
+        return "same phone", 1.0
+    short, long_ = sorted((a, b), key=len)
+    if len(short) >= MIN_TRUNCATED_PHONE and long_.startswith(short):
+        return "truncated phone", len(short) / len(long_)
+    edits = edit_distance(a, b, MAX_PHONE_EDITS)
+    if edits <= MAX_PHONE_EDITS and len(a) == len(b):
+        return f"phone {edits} edit{'s' if edits > 1 else ''}", 1 - edits / len(a)
+    return None
+
+
+def _email_evidence(a, b):
+    if a["email"] and a["email"] == b["email"]:
+        return "same email", 1.0
+    la, lb = a["emailLocal"], b["emailLocal"]
+    if min(len(la), len(lb)) < MIN_EMAIL_LOCAL:
+        return None
+    edits = edit_distance(la, lb, MAX_EMAIL_EDITS)
+    if edits <= MAX_EMAIL_EDITS:
+        return f"email {edits} edit{'s' if edits > 1 else ''}", 1 - edits / max(len(la), len(lb))
+    return None
+
+
+def score_pair(a, b):
+    """Return (score, reasons) when a and b look like the same person, else None."""
+    evidence = [e for e in (_phone_evidence(a["phone"], b["phone"]), _email_evidence(a, b)) if e]
+    if not evidence:
+        return None
+    name_sim = similarity(a["name"], b["name"])
+    exact = any(sim == 1.0 for _, sim in evidence)
+    if name_sim < MIN_NAME_SIMILARITY and not (exact and (not a["name"] or not b["name"])):
+        return None
+    contact = max(sim for _, sim in evidence)
+    reasons = [reason for reason, _ in evidence]
+    if a["name"] and b["name"]:
+        reasons.insert(0, "same name" if name_sim == 1.0 else f"name {name_sim:.0%} similar")
+    return round((name_sim + contact) / 2 if a["name"] and b["name"] else contact, 3), reasons
+
+
+def _completeness(person):
+    return sum(1 for f in ("first", "last", "phone", "email") if person[f])
+
+
+def choose_keeper(cluster):
+    return max(cluster, key=lambda p: (p["policies"], _completeness(p), p["updatedAt"]))
+
+
+def _clusters(count, matches):
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in matches:
+        parent[find(i)] = find(j)
+    groups = defaultdict(list)
+    for i in {x for pair in matches for x in pair}:
+        groups[find(i)].append(i)
+    return list(groups.values())
+
+
+def find_duplicates(people, min_score=0.0):
+    """Detect near-duplicate people.
+
+    `people` are dicts from person_from_row. Returns (plans, stats) where each
+    plan is {"keeper": person, "duplicates": [{"person", "matchedTo", "score",
+    "reasons"}], "fill": {field: value}} and `fill` lists fields the keeper
+    lacks that a duplicate has. Pairs scoring below `min_score` are dropped
+    before clustering, so they never join a plan or donate to its fill.
+    """
+    blocks, skipped = build_blocks(people)
+    pairs = candidate_pairs(blocks)
+    matches = {}
+    for i, j in pairs:
+        scored = score_pair(people[i], people[j])
+        if scored and scored[0] >= min_score:
+            matches[(i, j)] = scored
+
+    neighbours = defaultdict(list)
+    for (i, j), scored in matches.items():
+        neighbours[i].append((j, scored))
+        neighbours[j].append((i, scored))
+
+    plans = []
+    for members in _clusters(len(people), matches):
+        cluster = [people[i] for i in members]
+        keeper = choose_keeper(cluster)
+        duplicates = []
+        for i in members:
+            person = people[i]
+            if person is keeper:
+                continue
+            other, (score, reasons) = max(neighbours[i], key=lambda n: n[1][0])
+            duplicates.append({
+                "person": person,
+                "matchedTo": people[other]["id"],
+                "score": score,
+                "reasons": reasons,
+            })
+        duplicates.sort(key=lambda d: -d["score"])
+        fill = {}
+        for field in ("first", "last", "phone", "email"):
+            if not keeper[field]:
+                donor = next((d["person"][field] for d in duplicates if d["person"][field]), None)
+                if donor:
+                    fill[field] = donor
+        plans.append({"keeper": keeper, "duplicates": duplicates, "fill": fill})
+
+    plans.sort(key=lambda p: (-len(p["duplicates"]), p["keeper"]["last"], p["keeper"]["first"]))
+    stats = {
+        "people": len(people),
+        "blocks": len(blocks),
+        "skippedBlocks": skipped,
+        "candidatePairs": len(pairs),
+        "matchedPairs": len(matches),
+    }
+    return plans, stats
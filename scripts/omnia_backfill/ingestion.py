@@ -0,0 +1,333 @@
+"""
+Ingestion pipeline helpers: metadata API queries and push-mode webhook posts.
+
+Push pipelines accept a JSON array of raw source records at
+`POST {base}/ingestion/{pipelineId}` and run the same preprocessor, field
+mappings, relation matching and dedup as a pull run, in a background job.
+Each POST returns a `logId` whose ingestion log records the outcome.
+
+Metadata requests go through the CRM resilience policy and webhook POSTs
+through a per-client push endpoint whose rate limiter keeps them under the
+webhook's per-pipeline limit (omnia_backfill/resilience.py).
+"""
+
+import json
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from omnia_backfill.crm import TARGETS, read_token
+from omnia_backfill.resilience import CRM, Endpoint, RateLimiter, graphql_post
+
+# The webhook controller allows 100 requests per pipeline per 60s.
+PUSH_RATE_LIMIT = 100
+PUSH_RATE_WINDOW_SECONDS = 60
+
+TERMINAL_LOG_STATUSES = ("completed", "failed", "partial")
+LOG_MATCH_SKEW_SECONDS = 15
+
+PIPELINE_FIELDS = """
+    id name mode targetObjectNameSingular webhookSecret
+    sourceUrl sourceHttpMethod sourceAuthConfig sourceRequestConfig
+    responseRecordsPath dedupFieldNames paginationConfig isEnabled
+"""
+
+LOG_FIELDS = """
+    id status triggerType totalRecordsReceived recordsCreated
+    recordsUpdated recordsSkipped recordsFailed errors startedAt completedAt
+"""
+
+MAPPING_FIELDS = """
+    sourceFieldPath targetFieldName targetCompositeSubField transform
+    relationTargetObjectName relationMatchFieldName relationAutoCreate position
+"""
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+
+    normalized = value.replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(normalized)
+    except ValueError:
+        return None
+
+
+def strip_date_overrides(config):
+    """Copy of a sourceRequestConfig without start/end overrides; (config, removed)."""
+    cleaned = json.loads(json.dumps(config))
+    date_range_params = cleaned.get("dateRangeParams")
+
+    if not isinstance(date_range_params, dict):
+        return cleaned, False
+
+    removed = False
+    for key in ("startTimeOverride", "endTimeOverride"):
+        if key in date_range_params:
+            del date_range_params[key]
+            removed = True
+
+    if not date_range_params:
+        cleaned.pop("dateRangeParams", None)
+
+    return cleaned, removed
+
+
+def with_date_overrides(config, start_time, end_time):
+    """Copy of a sourceRequestConfig that pulls only start_time..end_time."""
+    new_config = json.loads(json.dumps(config))
+    if "dateRangeParams" not in new_config:
+        new_config["dateRangeParams"] = {}
+    new_config["dateRangeParams"]["startTimeOverride"] = start_time
+    new_config["dateRangeParams"]["endTimeOverride"] = end_time
+    return new_config
+
+
+def select_backfill_log(logs, known_log_ids, watch_started_at):
+    """The worker-owned pull log started after `watch_started_at`, if any yet."""
+    threshold = watch_started_at - timedelta(seconds=LOG_MATCH_SKEW_SECONDS)
+    new_logs = []
+
+    for log in logs:
+        if log.get("triggerType") != "pull":
+            continue
+
+        started_at = parse_timestamp(log.get("startedAt"))
+        is_new_id = log.get("id") not in known_log_ids
+        is_recent = started_at is not None and started_at >= threshold
+
+        if is_new_id or is_recent:
+            new_logs.append(log)
+
+    # The placeholder log created by the GraphQL mutation stays pending.
+    # Prefer the worker-owned log that actually transitions to running/completed.
+    actionable_logs = [
+        log for log in new_logs
+        if log.get("status") in ("running", "completed", "failed", "partial")
+    ]
+    if actionable_logs:
+        return actionable_logs[0]
+
+    return None
+
+
+def log_duration_seconds(log):
+    started_at = parse_timestamp(log.get("startedAt"))
+    completed_at = parse_timestamp(log.get("completedAt"))
+    if started_at is None or completed_at is None:
+        return None
+    return (completed_at - started_at).total_seconds()
+
+
+def push_endpoint():
+    """Endpoint for webhook POSTs: the CRM's retry policy at the push rate limit.
+
+    A 429 still gets through when other clients push to the same pipeline,
+    so backoff starts at a fraction of the limit window.
+    """
+    return Endpoint(
+        "ingestion-push", timeout=(5, 60), attempts=5,
+        base_delay=PUSH_RATE_WINDOW_SECONDS / 8, max_delay=PUSH_RATE_WINDOW_SECONDS,
+        limiter=RateLimiter(PUSH_RATE_LIMIT / PUSH_RATE_WINDOW_SECONDS, burst=1),
+    )
+
+
+def base_url_for(target_name):
+    return TARGETS[target_name].rsplit("/graphql", 1)[0]
+
+
+class IngestionClient:
+    def __init__(self, base_url, token, timeout=60, recorder=None, endpoint=CRM):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.recorder = recorder  # omnia_backfill.traffic.Recorder for --capture
+        self.endpoint = endpoint
+        self.push_endpoint = push_endpoint()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "User-Agent": "TwentyCRM-Script/1.0",
+        })
+
+    @classmethod
+    def for_target(cls, target_name, **kwargs):
+        return cls(base_url_for(target_name), read_token(target_name), **kwargs)
+
+    def meta_gql(self, query, variables=None):
+        """Metadata API request. Returns (data, errors) like CrmClient.gql."""
+        payload = {"query": query}
+        if variables:
+            payload["variables"] = variables
+        started = time.time()
+        data, errors = graphql_post(
+            self.session, f"{self.base_url}/metadata", payload,
+            timeout=self.timeout, endpoint=self.endpoint, persisted=None,
+        )
+        if self.recorder is not None:
+            self.recorder.record(
+                started, query, variables, {"errors": errors} if errors else {"data": data}
+            )
+        return data, errors
+
+    def _require(self, query, variables, context):
+        data, err = self.meta_gql(query, variables)
+        if data is None:
+            raise RuntimeError(f"Error {context}: {err}")
+        return data
+
+    def list_pipelines(self):
+        data = self._require(
+            f"{{ ingestionPipelines {{ {PIPELINE_FIELDS} }} }}",
+            None,
+            "listing ingestion pipelines",
+        )
+        return data.get("ingestionPipelines") or []
+
+    def find_pipeline(self, name, mode=None):
+        for pipeline in self.list_pipelines():
+            if pipeline["name"] == name and (mode is None or pipeline["mode"] == mode):
+                return pipeline
+        return None
+
+    def field_mappings(self, pipeline_id):
+        data = self._require(
+            f"""query($pipelineId: UUID!) {{
+                ingestionFieldMappings(pipelineId: $pipelineId) {{ {MAPPING_FIELDS} }}
+            }}""",
+            {"pipelineId": pipeline_id},
+            f"listing field mappings for pipeline {pipeline_id}",
+        )
+        return data.get("ingestionFieldMappings") or []
+
+    def pipeline_config(self, pipeline_id):
+        data = self._require(
+            """query($id: UUID!) {
+                ingestionPipeline(id: $id) { id sourceRequestConfig }
+            }""",
+            {"id": pipeline_id},
+            f"fetching pipeline {pipeline_id}",
+        )
+        pipeline = data.get("ingestionPipeline")
+        if pipeline is None:
+            raise RuntimeError(f"Pipeline {pipeline_id} was not returned by the metadata API")
+        return pipeline.get("sourceRequestConfig") or {}
+
+    def update_pipeline_config(self, pipeline_id, config):
+        """Replace the full sourceRequestConfig."""
+        data = self._require(
+            """mutation($input: UpdateIngestionPipelineInput!) {
+                updateIngestionPipeline(input: $input) { id sourceRequestConfig }
+            }""",
+            {"input": {"id": pipeline_id, "update": {"sourceRequestConfig": config}}},
+            f"updating pipeline {pipeline_id}",
+        )
+        return (data.get("updateIngestionPipeline") or {}).get("sourceRequestConfig") or {}
+
+    def trigger_pull(self, pipeline_id):
+        data = self._require(
+            """mutation($pipelineId: UUID!) {
+                triggerIngestionPull(pipelineId: $pipelineId) { id status }
+            }""",
+            {"pipelineId": pipeline_id},
+            f"triggering pull for pipeline {pipeline_id}",
+        )
+        log = data.get("triggerIngestionPull")
+        if log is None:
+            raise RuntimeError(f"Pipeline {pipeline_id} did not return an ingestion log when triggered")
+        return log
+
+    def create_push_copy(self, source, name):
+        """Create a push-mode pipeline with `source`'s config and field mappings.
+
+        The source URL and auth are kept because preprocessors such as the
+        old-CRM one call back into the source API for details.
+        """
+        data = self._require(
+            f"""mutation($input: CreateIngestionPipelineInput!) {{
+                createIngestionPipeline(input: $input) {{ {PIPELINE_FIELDS} }}
+            }}""",
+            {"input": {
+                "name": name,
+                "mode": "push",
+                "targetObjectNameSingular": source["targetObjectNameSingular"],
+                "sourceUrl": source.get("sourceUrl"),
+                "sourceHttpMethod": source.get("sourceHttpMethod"),
+                "sourceAuthConfig": source.get("sourceAuthConfig"),
+                "dedupFieldNames": source.get("dedupFieldNames"),
+                "isEnabled": True,
+            }},
+            f"creating pipeline {name}",
+        )
+        pipeline = data["createIngestionPipeline"]
+
+        mappings = self.field_mappings(source["id"])
+        if mappings:
+            inputs = []
+            for mapping in mappings:
+                inp = {k: v for k, v in mapping.items() if v is not None}
+                inp["pipelineId"] = pipeline["id"]
+                inputs.append(inp)
+            self._require(
+                """mutation($inputs: [CreateIngestionFieldMappingInput!]!) {
+                    createIngestionFieldMappings(inputs: $inputs) { id }
+                }""",
+                {"inputs": inputs},
+                f"copying field mappings to pipeline {pipeline['id']}",
+            )
+        return pipeline, len(mappings)
+
+    def ingestion_logs(self, pipeline_id, limit=50):
+        data = self._require(
+            f"""query($pipelineId: UUID!, $limit: Int) {{
+                ingestionLogs(pipelineId: $pipelineId, limit: $limit) {{ {LOG_FIELDS} }}
+            }}""",
+            {"pipelineId": pipeline_id, "limit": limit},
+            f"listing ingestion logs for pipeline {pipeline_id}",
+        )
+        return data.get("ingestionLogs") or []
+
+    def push(self, pipeline_id, records, secret=None):
+        """POST one batch of raw records. Returns the webhook response dict.
+
+        Goes through the push endpoint, spaced under the per-pipeline rate
+        limit. The POST is not idempotent, so only a 429/503 or a connection
+        that failed before sending is retried; other failures raise a
+        requests exception.
+        """
+        headers = {"x-webhook-secret": secret} if secret else {}
+        resp = self.push_endpoint.request(
+            self.session,
+            "POST",
+            f"{self.base_url}/ingestion/{pipeline_id}",
+            idempotent=False,
+            json=records,
+            headers=headers,
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def wait_for_logs(self, pipeline_id, log_ids, poll_seconds=5,
+                      timeout_seconds=1800, on_progress=None):
+        """Poll until every log in `log_ids` is terminal. Returns {logId: log}.
+
+        Logs still running when the timeout expires are left out of the result.
+        """
+        pending = set(log_ids)
+        done = {}
+        deadline = time.monotonic() + timeout_seconds
+        while pending and time.monotonic() < deadline:
+            # Newest logs come first; ask for enough to cover everything pending.
+            logs = self.ingestion_logs(pipeline_id, limit=len(pending) + 50)
+            for log in logs:
+                if log["id"] in pending and log["status"] in TERMINAL_LOG_STATUSES:
+                    pending.discard(log["id"])
+                    done[log["id"]] = log
+            if on_progress:
+                on_progress(len(done), len(pending))
+            if pending:
+                time.sleep(poll_seconds)
+        return done
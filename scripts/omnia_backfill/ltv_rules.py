@@ -0,0 +1,152 @@
+"""
+Product LTV classification driven by a rule table.
+
+Each rule matches a lowercase substring of the product name or the carrier
+name. Rules are checked in priority order (lower number wins), matching the
+old if/elif chain in seed-carrier-product-commissions.py. All keywords for
+one field are compiled into a single regex, and the best rule per distinct
+name is cached, so classifying a column of names costs one regex scan per
+distinct value.
+
+A rule table can also be loaded from CSV with the columns
+priority,field,keyword,product_type,amount_micros.
+"""
+
+import csv
+import re
+
+# (priority, field, keyword, product_type, amount_micros)
+DEFAULT_RULES = [
+    # Health Sharing (UHF / Universal Health Fellowship)
+    (0, "product", "health sharing", "health_sharing", 630_000_000),
+    (0, "product", "uhf", "health_sharing", 630_000_000),
+    (0, "carrier", "universal health fellowship", "health_sharing", 630_000_000),
+    # Major Medical / ACA
+    (1, "product", "major medical", "aca", 330_000_000),
+    (1, "product", "aca -", "aca", 330_000_000),
+    (1, "product", "aca-", "aca", 330_000_000),
+    # Auto insurance (by product name or carrier)
+    (2, "product", "auto", "auto", 330_000_000),
+    (2, "carrier", "geico", "auto", 330_000_000),
+    (2, "carrier", "the general", "auto", 330_000_000),
+    # Dental / Vision / Telemedicine
+    (3, "product", "dental", "ancillary", 117_000_000),
+    (4, "product", "vision", "ancillary", 117_000_000),
+    (5, "product", "telemedicine", "ancillary", 117_000_000),
+    (5, "product", "telehealth", "ancillary", 117_000_000),
+    # Fixed Indemnity / Hospital
+    (6, "product", "hospital", "core", 242_000_000),
+    (6, "product", "fixed indemnity", "core", 242_000_000),
+    # Short Term Medical / TriTerm
+    (7, "product", "short term", "core", 242_000_000),
+    (7, "product", "triterm", "core", 242_000_000),
+    (7, "product", "tri-term", "core", 242_000_000),
+    # Life
+    (8, "product", "life", "core", 242_000_000),
+    # Accident / Critical Illness -> ancillary
+    (9, "product", "accident", "ancillary", 117_000_000),
+    (9, "product", "critical", "ancillary", 117_000_000),
+]
+
+DEFAULT_CLASSIFICATION = ("ancillary", 117_000_000)
+
+FIELDS = ("product", "carrier")
+
+
+def load_rules(path):
+    """Load a rule table from CSV (header: priority,field,keyword,product_type,amount_micros)."""
+    rules = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            field = row["field"].strip().lower()
+            if field not in FIELDS:
+                raise ValueError(f"Unknown rule field {row['field']!r} in {path}")
+            rules.append((
+                int(row["priority"]),
+                field,
+                row["keyword"].strip().lower(),
+                row["product_type"].strip(),
+                int(row["amount_micros"]),
+            ))
+    return rules
+
+
+class _FieldMatcher:
+    """All keywords for one field in a single regex, best rule cached per name."""
+
+    def __init__(self, rules):
+        # Stable sort keeps table order within a priority, like the if/elif chain.
+        self.rules = sorted(rules, key=lambda r: r[0])
+        self.cache = {}
+        if self.rules:
+            # A lookahead at every position sees keywords that overlap each
+            # other; within one position the first (highest-priority)
+            # alternative wins, which is all we need.
+            alternatives = "|".join(f"({re.escape(r[2])})" for r in self.rules)
+            self.pattern = re.compile(f"(?=(?:{alternatives}))")
+        else:
+            self.pattern = None
+
+    def best_rule(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        best = None
+        if self.pattern is not None and name:
+            for match in self.pattern.finditer(name.lower()):
+                index = match.lastindex - 1
+                if best is None or index < best:
+                    best = index
+                    if best == 0:
+                        break
+        rule = self.rules[best] if best is not None else None
+        self.cache[name] = rule
+        return rule
+
+
+class LtvClassifier:
+    def __init__(self, rules=None, default=DEFAULT_CLASSIFICATION):
+        rules = DEFAULT_RULES if rules is None else rules
+        self.default = default
+        self.matchers = {
+            field: _FieldMatcher([r for r in rules if r[1] == field])
+            for field in FIELDS
+        }
+        self.pair_cache = {}
+
+    def classify(self, product_name, carrier_name=""):
+        """Return (product_type, amount_micros) for one product/carrier pair."""
+        key = (product_name or "", carrier_name or "")
+        if key in self.pair_cache:
+            return self.pair_cache[key]
+        candidates = [
+            rule
+            for rule in (
+                self.matchers["product"].best_rule(key[0]),
+                self.matchers["carrier"].best_rule(key[1]),
+            )
+            if rule is not None
+        ]
+        if candidates:
+            best = min(candidates, key=lambda r: r[0])
+            result = (best[3], best[4])
+        else:
+            result = self.default
+        self.pair_cache[key] = result
+        return result
+
+    def classify_many(self, product_names, carrier_names=None):
+        """Classify a whole column of names; each distinct pair is scanned once."""
+        if carrier_names is None:
+            carrier_names = [""] * len(product_names)
+        return [self.classify(p, c) for p, c in zip(product_names, carrier_names)]
+
+
+_default_classifier = None
+
+
+def classify_product(product_name, carrier_name=""):
+    """Classify product name into type and LTV amount (micros) with the default rules."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = LtvClassifier()
+    return _default_classifier.classify(product_name, carrier_name)
@@ -0,0 +1,93 @@
+"""
+Reader for the old CRM's lead-report-api.
+
+The API ignores `per_page` and always returns 10 rows per page, ordered
+newest first, so a full read is one request per page.
+
+MIRROR keeps every page fetch_page() reads once it is enabled, so jobs
+chained by omnia-backfill.py run-plan read each page once per process.
+It is off by default: a standalone script always reads live pages.
+"""
+
+import threading
+
+from omnia_backfill.resilience import OLD_CRM
+from omnia_backfill.shared import http_session
+
+OLD_CRM_BASE = "https://omnia.geogrowth.com/api/orgadmin"
+LEAD_REPORT_URL = f"{OLD_CRM_BASE}/lead-report-api"
+
+PER_PAGE = 10  # API ignores per_page param, always returns 10
+
+
+class PageMirror:
+    """Pages read so far, by page number, as (policies, total_pages, total).
+
+    New policies push rows down a page while a run-plan is in progress, so a
+    later job can see a row twice (callers key rows by policy_id) and does
+    not see policies added after the page was first read; those are picked
+    up by the next run.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.pages = {}
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def get(self, page):
+        with self.lock:
+            result = self.pages.get(page) if self.enabled else None
+            if result is not None:
+                self.hits += 1
+            return result
+
+    def put(self, page, result):
+        if self.enabled:
+            with self.lock:
+                self.pages[page] = result
+
+
+MIRROR = PageMirror()
+
+
+def fetch_response(page, session=None, timeout=None):
+    """GET one page and return the raw response (raises on non-OK).
+
+    Goes through the OLD_CRM resilience policy: transient failures are
+    retried with backoff before anything is raised.
+    """
+    kwargs = {"timeout": timeout} if timeout else {}
+    resp = OLD_CRM.request(
+        session or http_session(),
+        "GET",
+        LEAD_REPORT_URL,
+        params={"page": page, "per_page": PER_PAGE},
+        headers={"Accept": "application/json"},
+        **kwargs,
+    )
+    resp.raise_for_status()
+    return resp
+
+
+def parse_page(resp):
+    """lead-report-api response -> (policies, total_pages, total)."""
+    response = resp.json().get("response", {})
+    return (
+        response.get("data", []),
+        response.get("total_page", 1),
+        response.get("total", 0),
+    )
+
+
+def fetch_page(page, session=None, timeout=None):
+    """Fetch one page. Returns (policies, total_pages, total).
+
+    Raises requests.HTTPError on a non-OK response so callers can tell a
+    failed page apart from an empty one.
+    """
+    result = MIRROR.get(page)
+    if result is None:
+        result = parse_page(fetch_response(page, session=session, timeout=timeout))
+        MIRROR.put(page, result)
+    return result
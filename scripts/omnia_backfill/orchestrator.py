@@ -0,0 +1,350 @@
+"""
+Windowed backfills for several pull pipelines over one shared worker budget.
+
+A job is one pull pipeline plus a date range and a chunk policy:
+  day / 6h / 90m   fixed windows of that length
+  auto:N           windows sized so each pull receives about N records,
+                   starting at one day and at most doubling or halving
+                   per window (clamped to AUTO_MIN_HOURS..AUTO_MAX_HOURS)
+
+A window sets startTimeOverride/endTimeOverride on the pipeline's
+sourceRequestConfig, triggers a pull and polls its ingestion log, the same
+steps as backfill-calls.py. Because a window rewrites its pipeline's config,
+one pipeline never has two windows in flight; different pipelines run side
+by side up to the shared `budget`.
+
+When a slot frees, the scheduler hands it to the ready job with the highest
+priority; among equal priorities, to the one that has used the least worker
+time so far, so a slow source cannot starve a fast one. A failed or timed
+out window stops its own job only.
+
+Finished windows are recorded in one SQLite progress database shared by all
+jobs (and all runs): a rerun skips every span already covered by a completed
+or partial window, whatever chunk policy produced it.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from omnia_backfill.ingestion import (
+    TERMINAL_LOG_STATUSES,
+    select_backfill_log,
+    strip_date_overrides,
+    with_date_overrides,
+)
+
+DEFAULT_PROGRESS_DB = "ingestion-backfill-progress.sqlite"
+DEFAULT_BUDGET = 3
+POLL_INTERVAL_SECONDS = 5
+WINDOW_TIMEOUT_SECONDS = 600
+AUTO_INITIAL_HOURS = 24
+AUTO_MIN_HOURS = 1
+AUTO_MAX_HOURS = 24 * 7
+DONE_STATUSES = ("completed", "partial")
+
+_FIXED_CHUNK = re.compile(r"^(\d+)\s*(d|h|m)$")
+
+
+def parse_chunk(policy):
+    """'day' | '<n>d' | '<n>h' | '<n>m' -> timedelta, or 'auto:<records>' -> int."""
+    policy = policy.strip().lower()
+    if policy == "day":
+        return timedelta(days=1)
+    if policy.startswith("auto:"):
+        records = int(policy.split(":", 1)[1])
+        if records <= 0:
+            raise ValueError(f"chunk policy {policy!r}: record target must be positive")
+        return records
+    match = _FIXED_CHUNK.match(policy)
+    if not match:
+        raise ValueError(f"chunk policy {policy!r}: use day, <n>d, <n>h, <n>m or auto:<records>")
+    n, unit = int(match.group(1)), match.group(2)
+    length = {"d": timedelta(days=n), "h": timedelta(hours=n), "m": timedelta(minutes=n)}[unit]
+    if length <= timedelta(0):
+        raise ValueError(f"chunk policy {policy!r}: window must be longer than zero")
+    return length
+
+
+def override_times(start, end):
+    """Pipeline override strings for [start, end): source-local, end inclusive."""
+    return (
+        start.strftime("%Y-%m-%dT%H:%M:%S"),
+        (end - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%S"),
+    )
+
+
+class ProgressDb:
+    """Finished windows of every job. Only the scheduler thread touches it."""
+
+    def __init__(self, path=DEFAULT_PROGRESS_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS windows (
+                pipelineId TEXT NOT NULL,
+                windowStart TEXT NOT NULL,
+                windowEnd TEXT NOT NULL,
+                status TEXT NOT NULL,
+                logId TEXT,
+                received INTEGER,
+                created INTEGER,
+                updated INTEGER,
+                failed INTEGER,
+                seconds REAL,
+                finishedAt TEXT,
+                PRIMARY KEY (pipelineId, windowStart, windowEnd)
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def covered(self, pipeline_id):
+        """Sorted [(start, end)] spans already backfilled for a pipeline."""
+        rows = self.conn.execute(
+            f"""SELECT windowStart, windowEnd FROM windows
+                WHERE pipelineId = ? AND status IN ({",".join("?" * len(DONE_STATUSES))})
+                ORDER BY windowStart""",
+            (pipeline_id, *DONE_STATUSES),
+        ).fetchall()
+        return [
+            (datetime.fromisoformat(r["windowStart"]), datetime.fromisoformat(r["windowEnd"]))
+            for r in rows
+        ]
+
+    def record(self, pipeline_id, start, end, status, log, seconds):
+        log = log or {}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                pipeline_id, start.isoformat(), end.isoformat(), status, log.get("id"),
+                log.get("totalRecordsReceived") or 0, log.get("recordsCreated") or 0,
+                log.get("recordsUpdated") or 0, log.get("recordsFailed") or 0,
+                round(seconds, 1), datetime.now(timezone.utc).isoformat(),
+            ),
+        )
+        self.conn.commit()
+
+    def totals(self, pipeline_id):
+        return dict(self.conn.execute(
+            f"""SELECT COUNT(*) AS windows, COALESCE(SUM(received), 0) AS received,
+                       COALESCE(SUM(created), 0) AS created, COALESCE(SUM(updated), 0) AS updated,
+                       COALESCE(SUM(failed), 0) AS failed
+                FROM windows
+                WHERE pipelineId = ? AND status IN ({",".join("?" * len(DONE_STATUSES))})""",
+            (pipeline_id, *DONE_STATUSES),
+        ).fetchone())
+
+
+class BackfillJob:
+    def __init__(self, pipeline, start, end, chunk="day", priority=0):
+        self.pipeline = pipeline
+        self.pipeline_id = pipeline["id"]
+        self.name = pipeline["name"]
+        self.start = start
+        self.end = end
+        self.chunk = parse_chunk(chunk) if isinstance(chunk, str) else chunk
+        self.priority = priority
+        self.cursor = start
+        self.covered = []
+        self.auto_hours = AUTO_INITIAL_HOURS
+        self.busy_seconds = 0.0
+        self.in_flight = False
+        self.stopped = None  # reason, once a window failed
+        self.windows_done = 0
+        self.original_config = None
+        self.restore_config = None  # original config minus overrides, once prepared
+        self.restored = False
+
+    def _length(self):
+        if isinstance(self.chunk, timedelta):
+            return self.chunk
+        return timedelta(minutes=round(self.auto_hours * 60))
+
+    def next_window(self):
+        """The next uncovered [start, end) span, or None when the range is done."""
+        while self.cursor < self.end:
+            inside = next((c for c in self.covered if c[0] <= self.cursor < c[1]), None)
+            if inside is not None:
+                self.cursor = inside[1]
+                continue
+            window_end = min(self.cursor + self._length(), self.end)
+            following = [c[0] for c in self.covered if self.cursor < c[0] < window_end]
+            if following:
+                window_end = min(following)
+            return self.cursor, window_end
+        return None
+
+    def remaining_windows(self):
+        """Window count left, for plans. auto: policies assume the initial size."""
+        cursor, count = self.cursor, 0
+        length = self._length()
+        for covered_start, covered_end in self.covered + [(self.end, self.end)]:
+            gap = min(covered_start, self.end) - cursor
+            if gap > timedelta(0):
+                count += -(-gap // length)
+            cursor = max(cursor, covered_end)
+        return count
+
+    def ready(self):
+        return not self.in_flight and self.stopped is None and self.next_window() is not None
+
+    def finished(self, start, end, log):
+        self.cursor = end
+        self.covered.append((start, end))
+        self.covered.sort()
+        self.windows_done += 1
+        if isinstance(self.chunk, int):
+            received = (log or {}).get("totalRecordsReceived") or 0
+            hours = (end - start).total_seconds() / 3600
+            ideal = hours * self.chunk / max(received, 1)
+            ideal = max(hours / 2, min(ideal, hours * 2))
+            self.auto_hours = max(AUTO_MIN_HOURS, min(ideal, AUTO_MAX_HOURS))
+
+
+def run_window(client, job, start, end, timeout_seconds=WINDOW_TIMEOUT_SECONDS,
+               poll_seconds=POLL_INTERVAL_SECONDS, stop=None):
+    """Pull one window through the pipeline. Returns the terminal log or None on timeout."""
+    start_time, end_time = override_times(start, end)
+    client.update_pipeline_config(
+        job.pipeline_id, with_date_overrides(job.restore_config, start_time, end_time)
+    )
+    known_log_ids = {log.get("id") for log in client.ingestion_logs(job.pipeline_id)}
+    watch_started_at = datetime.now(timezone.utc)
+    client.trigger_pull(job.pipeline_id)
+
+    deadline = time.monotonic() + timeout_seconds
+    tracked_log_id = None
+    while time.monotonic() < deadline:
+        time.sleep(poll_seconds)
+        try:
+            logs = client.ingestion_logs(job.pipeline_id)
+        except Exception:
+            continue  # a failed poll is retried on the next tick
+        if tracked_log_id is not None:
+            log = next((entry for entry in logs if entry.get("id") == tracked_log_id), None)
+        else:
+            log = select_backfill_log(logs, known_log_ids, watch_started_at)
+            if log is not None:
+                tracked_log_id = log.get("id")
+        if log is not None and log["status"] in TERMINAL_LOG_STATUSES:
+            return log
+        if stop is not None and stop.is_set() and log is None:
+            return None  # interrupted before the worker picked the pull up
+    return None
+
+
+class Orchestrator:
+    def __init__(self, client, jobs, progress, budget=DEFAULT_BUDGET,
+                 timeout_seconds=WINDOW_TIMEOUT_SECONDS, poll_seconds=POLL_INTERVAL_SECONDS):
+        self.client = client
+        self.jobs = jobs
+        self.progress = progress
+        self.budget = max(1, budget)
+        self.timeout_seconds = timeout_seconds
+        self.poll_seconds = poll_seconds
+        self.stop = threading.Event()
+        for job in jobs:
+            job.covered = progress.covered(job.pipeline_id)
+
+    def pick(self):
+        """Highest priority ready job; ties go to the least worker time used."""
+        ready = [job for job in self.jobs if job.ready()]
+        if not ready:
+            return None
+        return min(ready, key=lambda job: (-job.priority, job.busy_seconds, job.name))
+
+    def _prepare(self, job):
+        job.original_config = self.client.pipeline_config(job.pipeline_id)
+        job.restore_config, had_overrides = strip_date_overrides(job.original_config)
+        if had_overrides:
+            print(f"  [{job.name}] existing start/end overrides will be cleared on restore")
+
+    def _restore(self, job):
+        job.restored = True
+        try:
+            self.client.update_pipeline_config(job.pipeline_id, job.restore_config)
+            print(f"  [{job.name}] pipeline config restored")
+        except Exception as e:
+            print(f"  [{job.name}] WARNING: failed to restore config: {e}")
+            print(f"  Manual restore may be needed. Original config: {job.original_config}")
+
+    def run(self):
+        running = {}  # future -> (job, start, end, started)
+        prepared = []
+        executor = ThreadPoolExecutor(max_workers=self.budget)
+        try:
+            while True:
+                while not self.stop.is_set() and len(running) < self.budget:
+                    job = self.pick()
+                    if job is None:
+                        break
+                    if job.restore_config is None:
+                        self._prepare(job)
+                        prepared.append(job)
+                    start, end = job.next_window()
+                    job.in_flight = True
+                    print(f"  [{job.name}] {start:%Y-%m-%d %H:%M} -> {end:%Y-%m-%d %H:%M} "
+                          f"({len(running) + 1}/{self.budget} slots)")
+                    future = executor.submit(
+                        run_window, self.client, job, start, end,
+                        self.timeout_seconds, self.poll_seconds, self.stop,
+                    )
+                    running[future] = (job, start, end, time.monotonic())
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, start, end, started = running.pop(future)
+                    self._finish(job, start, end, started, future)
+                for job in prepared:
+                    if not job.restored and not job.in_flight and not job.ready():
+                        self._restore(job)  # this job is done or stopped
+        finally:
+            self.stop.set()
+            for future, (job, start, end, started) in list(running.items()):
+                self._finish(job, start, end, started, future)
+            executor.shutdown(wait=True)
+            for job in prepared:
+                if not job.restored:
+                    self._restore(job)
+
+    def _finish(self, job, start, end, started, future):
+        seconds = time.monotonic() - started
+        job.in_flight = False
+        job.busy_seconds += seconds
+        try:
+            log = future.result()
+        except Exception as e:
+            log, error = None, f"{type(e).__name__}: {e}"
+        else:
+            error = None
+        label = f"  [{job.name}] {start:%Y-%m-%d %H:%M} -> {end:%Y-%m-%d %H:%M}"
+        if log is not None and log["status"] in DONE_STATUSES:
+            self.progress.record(job.pipeline_id, start, end, log["status"], log, seconds)
+            job.finished(start, end, log)
+            print(f"{label}: {log['status']} | received={log.get('totalRecordsReceived') or 0:,} "
+                  f"created={log.get('recordsCreated') or 0:,} "
+                  f"updated={log.get('recordsUpdated') or 0:,} "
+                  f"failed={log.get('recordsFailed') or 0:,} ({seconds:.0f}s)")
+            if log["status"] == "partial":
+                print(f"{label}: WARNING: completed with partial failures")
+            return
+        if log is not None:
+            status, reason = "failed", f"failed: {log.get('errors') or 'unknown error'}"
+        elif error is not None:
+            status, reason = "failed", error
+        elif self.stop.is_set():
+            print(f"{label}: interrupted")
+            return
+        else:
+            status, reason = "timeout", f"timed out after {self.timeout_seconds}s"
+        self.progress.record(job.pipeline_id, start, end, status, log, seconds)
+        job.stopped = reason
+        print(f"{label}: {reason}. Stopping this pipeline; rerun to resume.")
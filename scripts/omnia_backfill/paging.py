@@ -0,0 +1,73 @@
+"""
+Adaptive page size for cursor pagination.
+
+A fixed `first:` is wrong for most queries: id-only projections can take
+the server maximum per page, while wide objects with nested relations get
+slow and hit query-complexity limits. PageSizer watches each page's server
+latency and wire size and moves the next page size toward TARGET_SECONDS
+and TARGET_BYTES, at most doubling or halving per page. A query-complexity
+error halves the size and the same page is retried. A short page that still
+has a next page means the server capped `first`, and that becomes the new
+maximum.
+"""
+
+MAX_PAGE_SIZE = 500  # largest page the scripts use against production; lower caps are detected
+MIN_PAGE_SIZE = 10
+INITIAL_PAGE_SIZE = 100
+TARGET_SECONDS = 2.0
+TARGET_BYTES = 4 * 1024 * 1024
+SMOOTHING = 0.5  # weight of the newest page in the per-row estimates
+
+_COMPLEXITY_MARKERS = (
+    "complexity", "too complex", "query cost", "depth", "too many records",
+    "exceeds the maximum",
+)
+
+
+def is_complexity_error(errors):
+    """True when a GraphQL error list says the query asked for too much."""
+    for error in errors or []:
+        message = str(error.get("message", "") if isinstance(error, dict) else error).lower()
+        if any(marker in message for marker in _COMPLEXITY_MARKERS):
+            return True
+    return False
+
+
+class PageSizer:
+    def __init__(self, initial=INITIAL_PAGE_SIZE, minimum=MIN_PAGE_SIZE,
+                 maximum=MAX_PAGE_SIZE, target_seconds=TARGET_SECONDS,
+                 target_bytes=TARGET_BYTES):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = max(minimum, min(initial, maximum))
+        self.target_seconds = target_seconds
+        self.target_bytes = target_bytes
+        self.seconds_per_row = None
+        self.bytes_per_row = None
+
+    def _smooth(self, old, new):
+        return new if old is None else old + SMOOTHING * (new - old)
+
+    def observe(self, requested, rows, seconds, nbytes=None, has_next=True):
+        """Record one page and pick the size of the next one."""
+        if has_next and 0 < rows < requested:
+            self.maximum = max(self.minimum, rows)
+        if rows == 0 or (not has_next and rows < requested):
+            self.size = min(self.size, self.maximum)
+            return self.size  # last page: too small to say anything
+        self.seconds_per_row = self._smooth(self.seconds_per_row, seconds / rows)
+        ideal = self.target_seconds / max(self.seconds_per_row, 1e-6)
+        if nbytes:
+            self.bytes_per_row = self._smooth(self.bytes_per_row, nbytes / rows)
+            ideal = min(ideal, self.target_bytes / self.bytes_per_row)
+        ideal = max(requested / 2, min(ideal, requested * 2))
+        self.size = int(max(self.minimum, min(ideal, self.maximum)))
+        return self.size
+
+    def shrink(self):
+        """Halve after a complexity error. False when already at the minimum."""
+        if self.size <= self.minimum:
+            return False
+        self.size = max(self.minimum, self.size // 2)
+        self.maximum = self.size
+        return True
@@ -0,0 +1,175 @@
+"""
+Measured backfill planning: time a few real reads, then extrapolate.
+
+A plan is a list of steps, each a request count times a measured per-request
+latency (and payload size, where the step has one). Steps run at the
+concurrency the backfill will actually use, so the ETA is
+
+    sum(requests * mean latency / concurrency)
+
+over all steps. Means are used rather than medians because a long run pays
+for its slow requests too; p90 is printed alongside to show the spread.
+"""
+
+import random
+import statistics
+import time
+from datetime import datetime
+
+import requests
+
+from omnia_backfill.old_crm import fetch_response, parse_page
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+class Sample:
+    """Latencies (and optionally payload sizes) of one kind of request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.sizes = []
+
+    def time(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def add_size(self, nbytes):
+        self.sizes.append(nbytes)
+
+    @property
+    def mean(self):
+        return statistics.fmean(self.latencies) if self.latencies else 0.0
+
+    @property
+    def p90(self):
+        if len(self.latencies) < 2:
+            return self.mean
+        return statistics.quantiles(self.latencies, n=10)[-1]
+
+    @property
+    def mean_size(self):
+        return statistics.fmean(self.sizes) if self.sizes else None
+
+    def describe(self):
+        size = f", {format_bytes(self.mean_size)} avg" if self.sizes else ""
+        return (
+            f"{self.name}: n={len(self.latencies)} mean={self.mean * 1000:.0f}ms "
+            f"p90={self.p90 * 1000:.0f}ms{size}"
+        )
+
+
+class Plan:
+    def __init__(self, title):
+        self.title = title
+        self.samples = []
+        self.steps = []  # (label, requests, seconds, bytes or None, concurrency)
+        self.notes = []
+
+    def sample(self, name):
+        sample = Sample(name)
+        self.samples.append(sample)
+        return sample
+
+    def add(self, label, request_count, sample, concurrency=1):
+        """`request_count` requests like `sample`, spread over `concurrency` workers."""
+        n = int(round(request_count))
+        concurrency = max(1, concurrency)
+        size = n * sample.mean_size if sample.mean_size is not None else None
+        self.steps.append((label, n, n * sample.mean / concurrency, size, concurrency))
+
+    def add_duration(self, label, seconds, request_count=0):
+        """A step whose wall time was measured directly (e.g. server-side jobs)."""
+        self.steps.append((label, int(round(request_count)), seconds, None, 1))
+
+    def note(self, text):
+        self.notes.append(text)
+
+    def eta_seconds(self):
+        return sum(step[2] for step in self.steps)
+
+    def report(self, window_hours=None):
+        print("\n" + "=" * 60)
+        print(f"PLAN: {self.title}")
+        print("=" * 60)
+        print("Measured:")
+        for sample in self.samples:
+            print(f"  {sample.describe()}")
+        for note in self.notes:
+            print(f"  {note}")
+
+        print("Predicted:")
+        total_requests = 0
+        total_bytes = 0
+        for label, n, seconds, size, concurrency in self.steps:
+            total_requests += n
+            detail = f"{n:,} requests x{concurrency}" if n else "measured"
+            if size is not None:
+                total_bytes += size
+                detail += f", {format_bytes(size)}"
+            print(f"  {label}: {detail} -> {format_duration(seconds)}")
+
+        eta = self.eta_seconds()
+        print(f"  Total: {total_requests:,} requests, {format_bytes(total_bytes)} downloaded")
+        print(f"  ETA:   {format_duration(eta)}")
+        if window_hours:
+            verdict = "fits" if eta <= window_hours * 3600 else "does NOT fit"
+            print(f"  {verdict} in a {window_hours:g}h window")
+        print("=" * 60)
+
+
+def sample_old_crm(plan, pages=5, session=None):
+    """Time the first, last and a few random lead-report-api pages.
+
+    Returns (sample, total_pages, total, rows). `rows` are the sampled
+    policies, and a note with the source volume per day (from reg_date) is
+    added to the plan.
+    """
+    session = session or requests.Session()
+    sample = plan.sample("old CRM page")
+    resp = sample.time(fetch_response, 1, session=session)
+    sample.add_size(len(resp.content))
+    rows, total_pages, total = parse_page(resp)
+
+    # Always include the last (oldest) page so reg_date spans the full history.
+    others = set()
+    if total_pages > 1:
+        others.add(total_pages)
+        middle = range(2, total_pages)
+        others.update(random.sample(middle, min(pages - 2, len(middle))) if pages > 2 else [])
+    for page in sorted(others):
+        resp = sample.time(fetch_response, page, session=session)
+        sample.add_size(len(resp.content))
+        rows.extend(parse_page(resp)[0])
+
+    days = sorted(
+        r["reg_date"][:10] for r in rows
+        if r.get("reg_date") and r["reg_date"] != "0000-00-00"
+    )
+    if days:
+        first = datetime.strptime(days[0], "%Y-%m-%d")
+        last = datetime.strptime(days[-1], "%Y-%m-%d")
+        span = max((last - first).days, 1)
+        plan.note(
+            f"old CRM volume: {total:,} policies on {total_pages:,} pages, "
+            f"{days[0]} .. {days[-1]} in sample (~{total / span:,.0f}/day over "
+            f"the full history)"
+        )
+    return sample, total_pages, total, rows
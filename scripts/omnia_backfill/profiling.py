@@ -0,0 +1,270 @@
+"""
+Opt-in profiling for the scripts, switched on by the OMNIA_PROFILE env var.
+
+Importing omnia_backfill starts it, so every script that uses the package
+(all of them) can be profiled without changes:
+
+    OMNIA_PROFILE=1 python3 scripts/backfill-policies-today.py ...
+    OMNIA_PROFILE=pyinstrument python3 scripts/backfill-ingestion.py ...
+
+At exit it writes to OMNIA_PROFILE_DIR (default /tmp/omnia-profile), under
+<script>-<timestamp>-<pid>:
+  .collapsed   wall-clock stack samples of every thread, one
+               `thread;module:function;... count` line per stack, for
+               flamegraph.pl, inferno or speedscope
+  .pstats      cProfile of every thread (OMNIA_PROFILE=1 or cprofile), or
+  .speedscope.json  pyinstrument of the main thread (OMNIA_PROFILE=pyinstrument,
+               if pyinstrument is installed)
+  .txt         the summary below, also printed to stderr
+
+The summary splits wall time by what each sampled stack was doing: inside
+the HTTP client (requests, urllib3, urllib, http.client, socket, ssl), JSON
+parsing, time.sleep, waiting on a lock/event/future, or anything else
+(Python CPU). It covers the main thread and all threads summed, next to
+process CPU time and the tracemalloc peak with the allocation sites that
+were live near that peak.
+
+tracemalloc roughly doubles run time for allocation-heavy code; set
+OMNIA_PROFILE_MEMORY=0 to skip it. OMNIA_PROFILE_INTERVAL sets the sampling
+interval in seconds (default 0.005).
+"""
+
+import atexit
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+try:
+    import pyinstrument
+except ImportError:  # optional; OMNIA_PROFILE=pyinstrument falls back to cProfile
+    pyinstrument = None
+
+DEFAULT_DIR = "/tmp/omnia-profile"
+DEFAULT_INTERVAL = 0.005
+TOP_ALLOCATIONS = 10
+SNAPSHOT_GROWTH = 1.2  # re-snapshot allocations when the peak grows by 20%
+
+# A sample is classified by walking its stack from the leaf up to the first
+# script frame (__main__ or omnia_backfill): the first module that matches
+# wins, so a json frame under requests' Response.json() counts as json and a
+# socket read under http.client counts as http.
+CATEGORIES = (
+    ("sleep", ("omnia_backfill.profiling:_sleep",)),
+    ("json", ("json", "ijson")),
+    ("http", ("requests", "urllib3", "urllib", "http", "socket", "ssl")),
+    ("wait", ("threading", "queue", "concurrent.futures", "selectors")),
+)
+SCRIPT_MODULES = ("__main__", "omnia_backfill")
+OTHER = "cpu/other"
+
+_real_sleep = time.sleep
+_session = None
+
+
+def _sleep(seconds):
+    _real_sleep(seconds)
+
+
+def _frame_name(frame):
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def _in(module, packages):
+    return any(module == p or module.startswith(p + ".") for p in packages)
+
+
+def _category(stack):
+    for name in reversed(stack):
+        module = name.partition(":")[0]
+        for category, packages in CATEGORIES:
+            if name in packages or _in(module, packages):
+                return category
+        if _in(module, SCRIPT_MODULES):
+            break
+    return OTHER
+
+
+class Sampler:
+    """Samples the stacks of all threads every `interval` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()  # "thread;frame;frame" -> samples
+        self.categories = Counter()  # category -> samples, all threads
+        self.main_categories = Counter()  # category -> samples, main thread
+        self.ticks = 0
+        self.memory_peak = 0
+        self.memory_snapshot = None
+        self.memory_snapshot_at = 0
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="omnia-profile", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        main = threading.main_thread().ident
+        while not self.stop.wait(self.interval):
+            self.ticks += 1
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                category = _category(stack)
+                self.categories[category] += 1
+                if ident == main:
+                    self.main_categories[category] += 1
+                self.stacks[";".join([names.get(ident, str(ident)), *stack])] += 1
+            if tracemalloc.is_tracing():
+                self._watch_memory()
+
+    def _watch_memory(self):
+        _, peak = tracemalloc.get_traced_memory()
+        self.memory_peak = peak
+        if peak > self.memory_snapshot_at * SNAPSHOT_GROWTH:
+            self.memory_snapshot = tracemalloc.take_snapshot()
+            self.memory_snapshot_at = peak
+
+
+class Session:
+    def __init__(self, mode, directory, interval, memory):
+        script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        self.prefix = os.path.join(
+            directory, f"{script}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        )
+        self.directory = directory
+        self.mode = mode
+        self.memory = memory
+        self.sampler = Sampler(interval)
+        self.profiles = []  # cProfile.Profile per thread
+        self.lock = threading.Lock()
+        self.instrument = None
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+        time.sleep = _sleep
+        self.sampler.thread.start()
+        if self.mode == "pyinstrument":
+            self.instrument = pyinstrument.Profiler()
+            self.instrument.start()
+        else:
+            self._profile_threads()
+            profile = cProfile.Profile()
+            self.profiles.append(profile)
+            profile.enable()
+        atexit.register(self.finish)
+
+    def _profile_threads(self):
+        """Run every thread started from now on under its own cProfile."""
+        session = self
+        run = threading.Thread.run
+
+        def profiled_run(thread):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # 3.12+ allows one active profiler, which already sees all threads
+                return run(thread)
+            with session.lock:
+                session.profiles.append(profile)
+            try:
+                run(thread)
+            finally:
+                profile.disable()
+
+        threading.Thread.run = profiled_run
+
+    def finish(self):
+        wall = time.perf_counter() - self.started
+        cpu = time.process_time() - self.cpu_started
+        self.sampler.stop.set()
+        self.sampler.thread.join()
+        time.sleep = _real_sleep
+        os.makedirs(self.directory, exist_ok=True)
+
+        if self.instrument is not None:
+            self.instrument.stop()
+            from pyinstrument.renderers import SpeedscopeRenderer
+
+            with open(f"{self.prefix}.speedscope.json", "w") as f:
+                f.write(self.instrument.output(SpeedscopeRenderer()))
+        else:
+            self.profiles[0].disable()
+            with self.lock:
+                stats = pstats.Stats(*self.profiles)
+            stats.dump_stats(f"{self.prefix}.pstats")
+
+        with open(f"{self.prefix}.collapsed", "w") as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        lines = self._summary(wall, cpu)
+        with open(f"{self.prefix}.txt", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        print("\n".join(lines), file=sys.stderr)
+
+    def _summary(self, wall, cpu):
+        lines = [
+            "=" * 60,
+            f"PROFILE {os.path.basename(self.prefix)}",
+            f"  Wall {wall:.1f}s, process CPU {cpu:.1f}s",
+        ]
+        # Sampling falls behind the interval under load, so scale by ticks taken.
+        seconds_per_tick = wall / max(self.sampler.ticks, 1)
+        for label, counts in (("Main thread", self.sampler.main_categories),
+                              ("All threads (summed)", self.sampler.categories)):
+            total = sum(counts.values())
+            if not total:
+                continue
+            lines.append(f"  {label}, {total:,} samples:")
+            for category, count in counts.most_common():
+                lines.append(f"    {category:<10} {count / total:6.1%}  ~{count * seconds_per_tick:.1f}s")
+
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            lines.append(f"  tracemalloc peak: {max(peak, self.sampler.memory_peak) / 2**20:.1f} MiB")
+            if self.sampler.memory_snapshot is not None:
+                lines.append(f"  Largest live allocations near the peak "
+                             f"({self.sampler.memory_snapshot_at / 2**20:.1f} MiB):")
+                for stat in self.sampler.memory_snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                    frame = stat.traceback[0]
+                    lines.append(f"    {stat.size / 2**20:8.1f} MiB  {frame.filename}:{frame.lineno}")
+            tracemalloc.stop()
+
+        lines.append(f"  Flamegraph input: {self.prefix}.collapsed")
+        profile = ".speedscope.json" if self.instrument is not None else ".pstats"
+        lines.append(f"  Profile: {self.prefix}{profile}")
+        lines.append("=" * 60)
+        return lines
+
+
+def start():
+    """Start profiling if OMNIA_PROFILE is set. Safe to call more than once."""
+    global _session
+    mode = os.environ.get("OMNIA_PROFILE", "").strip().lower()
+    if _session is not None or mode in ("", "0", "false", "no"):
+        return
+    if mode == "pyinstrument" and pyinstrument is None:
+        print("OMNIA_PROFILE=pyinstrument but pyinstrument is not installed; using cProfile",
+              file=sys.stderr)
+        mode = "cprofile"
+    _session = Session(
+        mode,
+        os.environ.get("OMNIA_PROFILE_DIR") or DEFAULT_DIR,
+        float(os.environ.get("OMNIA_PROFILE_INTERVAL") or DEFAULT_INTERVAL),
+        os.environ.get("OMNIA_PROFILE_MEMORY", "1") != "0",
+    )
+    _session.start()
@@ -0,0 +1,159 @@
+"""
+Hash-based drift reconciliation between old-CRM policies and CRM policies.
+
+Both sides are reduced to the same normalized values per mapped field and
+hashed per record, keyed by old-CRM policy_id. Only records whose hashes
+differ are compared field by field.
+
+The result is a minimal update per drifted record: just the fields whose
+values differ, in the shape the CRM update mutation expects.
+
+A field whose old-CRM value is missing (unmapped status, empty date, no
+premium) is left out of both hashes, so reconciliation never clears a CRM
+value the old CRM does not have.
+"""
+
+import hashlib
+import json
+
+from omnia_backfill.transform import (
+    EMPTY_DATE,
+    eastern_to_utc_iso,
+    map_statuses,
+    premiums_to_micros,
+)
+
+
+def _date(value):
+    return value if value and value != EMPTY_DATE else None
+
+
+def _premium(value):
+    return premiums_to_micros([value])[0]
+
+
+def _status(value):
+    return map_statuses([value])[0]
+
+
+def _submitted(value):
+    return eastern_to_utc_iso(value)[:19] if _date(value) else None
+
+
+def _as_int(value):
+    return int(value) if value not in (None, "") else None
+
+
+# name -> (old-CRM key, old value -> normalized, snapshot column,
+#          CRM value -> normalized, normalized value -> update data)
+MAPPED_FIELDS = {
+    "policyNumber": (
+        "policy_number", lambda v: v or None,
+        "policyNumber", lambda v: v or None,
+        lambda v: {"policyNumber": v},
+    ),
+    "status": (
+        "status_name", _status,
+        "status", lambda v: v or None,
+        lambda v: {"status": v},
+    ),
+    "premium": (
+        "total_premium", _premium,
+        "premiumAmountMicros", _as_int,
+        lambda v: {"premium": {"amountMicros": v, "currencyCode": "USD"}},
+    ),
+    "effectiveDate": (
+        "effective_date", _date,
+        "effectiveDate", lambda v: v[:10] if v else None,
+        lambda v: {"effectiveDate": v},
+    ),
+    "expirationDate": (
+        "expires_date", _date,
+        "expirationDate", lambda v: v[:10] if v else None,
+        lambda v: {"expirationDate": v},
+    ),
+    "submittedDate": (
+        "reg_date", _submitted,
+        "submittedDate", lambda v: v[:19] if v else None,
+        lambda v: {"submittedDate": v + "Z"},
+    ),
+}
+
+
+def old_values(row, fields):
+    return {f: MAPPED_FIELDS[f][1](row.get(MAPPED_FIELDS[f][0])) for f in fields}
+
+
+def crm_values(row, fields):
+    return {f: MAPPED_FIELDS[f][3](row.get(MAPPED_FIELDS[f][2])) for f in fields}
+
+
+def record_hash(values, mask):
+    """Hash of the fields in `mask` (the fields the old CRM has a value for)."""
+    payload = json.dumps([[f, values[f]] for f in mask], default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def reconcile(old_rows, crm_rows, fields):
+    """Compare old-CRM rows with CRM snapshot rows on `fields`.
+
+    `old_rows` are lead-report-api dicts, `crm_rows` snapshot rows with an
+    `oldCrmPolicyId` column. Returns a dict with:
+      updates   - [(crm_id, data, changed_fields)] minimal per-record updates
+      missing   - old policy ids with no CRM policy
+      extra     - CRM oldCrmPolicyIds the old CRM no longer returns
+      field_counts, compared - for reporting
+    """
+    old_by_id = {
+        str(r["policy_id"]): r for r in old_rows
+        if str(r.get("policy_id", "")).isdigit()
+    }
+    crm_by_id = {}
+    for row in crm_rows:
+        key = row.get("oldCrmPolicyId")
+        if key and key.isdigit() and key in old_by_id:
+            crm_by_id.setdefault(key, row)
+    extra = sorted(
+        {r["oldCrmPolicyId"] for r in crm_rows
+         if r.get("oldCrmPolicyId") and r["oldCrmPolicyId"] not in old_by_id},
+        key=lambda k: (not k.isdigit(), k),
+    )
+
+    expected = {}
+    masks = {}
+    old_hashes = {}
+    crm_hashes = {}
+    for key, row in old_by_id.items():
+        values = old_values(row, fields)
+        mask = [f for f in fields if values[f] is not None]
+        expected[key], masks[key] = values, mask
+        old_hashes[key] = record_hash(values, mask)
+        if key in crm_by_id:
+            crm_hashes[key] = record_hash(crm_values(crm_by_id[key], fields), mask)
+
+    # Missing records are a creation problem (backfill-policies), not drift.
+    missing = sorted(set(old_by_id) - set(crm_by_id), key=int)
+
+    updates = []
+    field_counts = {}
+    for key in sorted(crm_hashes, key=int):
+        if crm_hashes[key] == old_hashes[key]:
+            continue
+        current = crm_values(crm_by_id[key], fields)
+        data = {}
+        changed = []
+        for field in masks[key]:
+            if current[field] != expected[key][field]:
+                data.update(MAPPED_FIELDS[field][4](expected[key][field]))
+                changed.append(field)
+                field_counts[field] = field_counts.get(field, 0) + 1
+        if data:
+            updates.append((crm_by_id[key]["id"], data, changed))
+
+    return {
+        "updates": updates,
+        "missing": missing,
+        "extra": extra,
+        "field_counts": field_counts,
+        "compared": len(crm_hashes),
+    }
@@ -0,0 +1,247 @@
+"""
+Timeouts, retries and circuit breaking for the old-CRM and CRM endpoints.
+
+Each endpoint has its own policy:
+  - a (connect, read) timeout on every request
+  - exponential backoff with full jitter between attempts
+  - a retry budget, so a hard outage turns into a few retries per minute
+    instead of every request retrying its maximum
+  - a circuit breaker that opens after consecutive failures; while it is
+    open callers wait out the cooldown (backfills have nothing better to do)
+    and then one probe request decides whether it closes again
+  - optionally a RateLimiter, so concurrent workers share one requests/second
+    budget per endpoint
+
+Only failures that can succeed on a second try are retried: connection
+errors, timeouts, 429 and 5xx. Writes that are not idempotent (mutations,
+webhook POSTs) are retried only when the server cannot have applied them:
+a 429 or 503, or a connection that failed before the request was sent
+(connect timeout, connection refused). A read timeout, a dropped connection
+or any other 5xx on such a write goes back to the caller, since a gateway
+error can follow a write the server already committed.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from omnia_backfill.apq import PERSISTED_QUERIES
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that mean the request was not processed, so a write may be resent
+UNPROCESSED_STATUSES = {429, 503}
+
+
+def _failed_before_send(error):
+    """True when the request never reached the server (connect timeout or refused)."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class RetryBudget:
+    """Allow `minimum` retries plus `ratio` x requests per sliding window."""
+
+    def __init__(self, ratio=0.2, minimum=10, window_seconds=60):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window_seconds
+        self.requests = deque()
+        self.retries = deque()
+        self.lock = threading.Lock()
+
+    def _trim(self, now):
+        for events in (self.requests, self.retries):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+    def record_request(self):
+        with self.lock:
+            now = time.monotonic()
+            self._trim(now)
+            self.requests.append(now)
+
+    def try_spend(self):
+        with self.lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self.retries) >= self.minimum + self.ratio * len(self.requests):
+                return False
+            self.retries.append(now)
+            return True
+
+
+class RateLimiter:
+    """Token bucket: `rate` requests per second on average, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def acquire(self, wait=True):
+        """Block (or raise) while open; let one probe through after the cooldown."""
+        while True:
+            with self.lock:
+                if self.opened_at is None:
+                    return
+                remaining = self.opened_at + self.reset_seconds - time.monotonic()
+                if remaining <= 0 and not self.probing:
+                    self.probing = True
+                    return
+            if not wait:
+                raise CircuitOpenError(f"circuit open, retry in {max(remaining, 0):.0f}s")
+            time.sleep(max(remaining, 1.0))
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failure(self):
+        """Returns True when this failure opened a closed circuit.
+
+        A failed probe re-opens the circuit for another cooldown quietly.
+        """
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                opened = self.opened_at is None
+                self.opened_at = time.monotonic()
+                self.probing = False
+                return opened
+            return False
+
+
+class Endpoint:
+    def __init__(self, name, timeout=(5, 30), attempts=4, base_delay=0.5,
+                 max_delay=30.0, budget=None, breaker=None, limiter=None):
+        self.name = name
+        self.timeout = timeout
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def request(self, http, method, url, idempotent=True, wait_if_open=True, **kwargs):
+        """`http.request(method, url, ...)` under this endpoint's policy.
+
+        Returns the last response (which may still be a 429/5xx once retries
+        run out) or raises the last requests exception. With idempotent=False
+        only failures the server cannot have acted on are retried.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            self.breaker.acquire(wait=wait_if_open)
+            if self.limiter is not None:
+                self.limiter.acquire()
+            self.budget.record_request()
+            error = None
+            resp = None
+            try:
+                resp = http.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+                retryable = idempotent or _failed_before_send(e)
+            else:
+                statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+                retryable = resp.status_code in statuses
+
+            if error is None and resp.status_code not in RETRY_STATUSES:
+                self.breaker.success()
+                return resp
+            if self.breaker.failure():
+                print(f"  [{self.name}] circuit open after repeated failures; "
+                      f"pausing {self.breaker.reset_seconds}s")
+
+            attempt += 1
+            if not retryable or attempt >= self.attempts or not self.budget.try_spend():
+                if error is not None:
+                    raise error
+                return resp
+
+            delay = self.backoff(attempt)
+            if resp is not None and resp.headers.get("Retry-After", "").isdigit():
+                delay = max(delay, int(resp.headers["Retry-After"]))
+            time.sleep(delay)
+
+
+OLD_CRM = Endpoint("old-crm", timeout=(5, 60), attempts=5, base_delay=1.0)
+CRM = Endpoint("crm", timeout=(5, 30), attempts=4, base_delay=0.5)
+
+
+def graphql_post(http, url, payload, headers=None, timeout=None, endpoint=CRM,
+                 persisted=PERSISTED_QUERIES):
+    """POST a GraphQL payload through `endpoint`. Returns (data, errors).
+
+    Transport failures that survive the retries come back as an errors list
+    (message plus a TIMEOUT/INTERNAL_SERVER_ERROR code) rather than raising,
+    matching how the scripts already handle GraphQL errors. Queries go out as
+    automatic persisted queries unless `persisted` is None.
+    """
+    is_mutation = payload["query"].lstrip().startswith("mutation")
+    kwargs = {"headers": headers}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    def send(body):
+        try:
+            resp = endpoint.request(http, "POST", url, idempotent=not is_mutation,
+                                    json=body, **kwargs)
+        except requests.exceptions.RequestException as e:
+            return {"errors": [{
+                "message": f"{type(e).__name__}: {e}",
+                "extensions": {"code": "TIMEOUT"},
+            }]}
+        try:
+            return resp.json()
+        except ValueError:
+            return {"errors": [{
+                "message": f"HTTP {resp.status_code}: {resp.text[:200]}",
+                "extensions": {"code": "INTERNAL_SERVER_ERROR" if resp.status_code >= 500 else None},
+            }]}
+
+    body = persisted.post(send, url, payload) if persisted else send(payload)
+    if "errors" in body:
+        return None, body["errors"]
+    return body.get("data"), None
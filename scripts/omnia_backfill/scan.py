@@ -0,0 +1,132 @@
+"""
+Parallel full scans of a CRM object over disjoint ranges.
+
+Cursor pagination is serial: each page needs the previous endCursor. A full
+scan is split into equal createdAt slices between the oldest and newest
+matching row, and each one is paged on its own thread. createdAt never
+changes, so every row is in exactly one slice. Each slice is paged in
+createdAt order through CrmClient.paginate, so page sizes are tuned per
+slice. Nodes from all slices are merged into a single generator; with
+disjoint slices and stable per-slice order every row is delivered exactly
+once, in no particular overall order.
+
+Time slices are unequal in row count, so the scan uses more slices than
+workers (PARTITIONS_PER_WORKER) and the pool balances them.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+DEFAULT_WORKERS = 4
+PARTITIONS_PER_WORKER = 4
+CHUNK = 100  # nodes handed to the consumer at a time
+
+_DONE = object()
+
+
+def _parse_ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _format_ts(dt):
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _edge_created_at(client, plural, type_name, filter, direction):
+    data, err = client.gql(f"""
+        query($filter: {type_name}FilterInput, $orderBy: [{type_name}OrderByInput]) {{
+            {plural}(filter: $filter, orderBy: $orderBy, first: 1) {{
+                edges {{ node {{ createdAt }} }}
+            }}
+        }}
+    """, {"filter": filter or {}, "orderBy": [{"createdAt": direction}]})
+    if not data:
+        raise RuntimeError(f"Error reading {plural} createdAt bounds: {err}")
+    edges = data[plural]["edges"]
+    return _parse_ts(edges[0]["node"]["createdAt"]) if edges else None
+
+
+def _combine(filter, extra):
+    parts = ([filter] if filter else []) + extra
+    return parts[0] if len(parts) == 1 else {"and": parts}
+
+
+def partition_filters(client, plural, type_name, filter=None, count=16):
+    """Filters for `count` disjoint createdAt slices that together cover `filter`."""
+    oldest = _edge_created_at(client, plural, type_name, filter, "AscNullsFirst")
+    newest = _edge_created_at(client, plural, type_name, filter, "DescNullsLast")
+    if oldest is None or newest is None or newest <= oldest or count < 2:
+        return [filter]
+    span = (newest - oldest) / count
+    cuts = [_format_ts(oldest + span * i) for i in range(1, count)]
+    filters = []
+    for i in range(count):
+        bounds = []
+        if i > 0:
+            bounds.append({"createdAt": {"gte": cuts[i - 1]}})
+        if i < count - 1:
+            bounds.append({"createdAt": {"lt": cuts[i]}})
+        filters.append(_combine(filter, bounds))
+    return filters
+
+
+def parallel_scan(client, plural, type_name, selection, filter=None,
+                  workers=DEFAULT_WORKERS, partitions=None):
+    """Yield every node of `plural` matching `filter` exactly once.
+
+    Raises the first error any slice hits. Closing the generator early stops
+    the remaining slices after their current page.
+    """
+    filters = partition_filters(
+        client, plural, type_name, filter, partitions or workers * PARTITIONS_PER_WORKER
+    )
+    if "createdAt" not in selection.split():
+        selection = f"{selection} createdAt"
+    results = queue.Queue(maxsize=workers * 4)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_slice(slice_filter):
+        if stop.is_set():
+            return
+        try:
+            chunk = []
+            for node in client.paginate(plural, type_name, selection, filter=slice_filter,
+                                        order_by=[{"createdAt": "AscNullsFirst"}]):
+                chunk.append(node)
+                if len(chunk) >= CHUNK:
+                    if not put(chunk):
+                        return
+                    chunk = []
+            if chunk:
+                put(chunk)
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for slice_filter in filters:
+            executor.submit(scan_slice, slice_filter)
+        remaining = len(filters)
+        try:
+            while remaining:
+                item = results.get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            stop.set()
@@ -0,0 +1,209 @@
+"""
+Shard a backfill across worker processes that share one journal file.
+
+A shard is written `i/N` (0-based, so `0/4` .. `3/4`). Shards split the
+old-CRM page range into N contiguous blocks, or, in hash mode, every shard
+reads every page and keeps the policy_ids whose CRC32 falls in its bucket
+(stable when new policies shift rows between pages mid-run).
+
+The journal is an append-only JSONL file guarded by an fcntl lock. Workers
+claim policy ids before creating them, so a row that shows up on two shards'
+pages is still created once, and they record finished pages so a restarted
+shard skips work it already did. A claim names the shard and page it was made
+on; if that shard died before finishing the page, its rerun may claim the id
+again, so a crash between claim and create does not lose the row. The
+launcher sums the final stats the workers wrote during its run.
+"""
+
+import fcntl
+import json
+import os
+import selectors
+import subprocess
+import sys
+import zlib
+from contextlib import contextmanager
+
+
+def parse_shard(value):
+    """'i/N' -> (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard must look like i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"--shard {value}: need 0 <= i < N")
+    return index, count
+
+
+def shard_pages(first, last, index, count):
+    """Contiguous block of pages [first, last] owned by shard `index` of `count`."""
+    total = last - first + 1
+    size, extra = divmod(total, count)
+    start = first + index * size + min(index, extra)
+    end = start + size + (1 if index < extra else 0) - 1
+    return range(start, end + 1)
+
+
+def in_shard(policy_id, index, count):
+    return zlib.crc32(str(policy_id).encode()) % count == index
+
+
+def default_journal_path(name):
+    return f"/tmp/{name}-shards.jsonl"
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.offset = 0
+        self.claimed = {}  # policy id -> (shard, page) that claimed it
+        self.pages = {}  # shard -> set of finished pages
+        self.finals = {}  # shard -> (journal offset, final stats)
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _catch_up(self):
+        """Apply journal lines written since the last read (caller holds the lock)."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                at = self.offset
+                self.offset += len(line.encode())
+                entry = json.loads(line)
+                kind = entry["type"]
+                if kind == "claim":
+                    owner = (entry["shard"], entry.get("page"))
+                    self.claimed.update(dict.fromkeys(entry["ids"], owner))
+                elif kind == "release":
+                    for policy_id in entry["ids"]:
+                        self.claimed.pop(policy_id, None)
+                elif kind == "page":
+                    self.pages.setdefault(entry["shard"], set()).add(entry["page"])
+                elif kind == "final":
+                    self.finals[entry["shard"]] = (at, entry["stats"])
+
+    def _append(self, entry):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def refresh(self):
+        with self._locked():
+            self._catch_up()
+
+    def _claimable(self, policy_id, shard):
+        if policy_id not in self.claimed:
+            return True
+        # Our own claim on a page we never finished: an earlier run of this
+        # shard died before creating it.
+        owner, page = self.claimed[policy_id]
+        return owner == shard and page not in self.pages.get(shard, set())
+
+    def claim(self, shard, ids, page=None):
+        """Claim `ids` for `shard` while it works on `page`.
+
+        Returns the ids nobody else holds: unclaimed ones, plus ones this
+        shard claimed on a page it never finished.
+        """
+        with self._locked():
+            self._catch_up()
+            fresh = [i for i in dict.fromkeys(ids) if self._claimable(i, shard)]
+            if fresh:
+                self._append({"type": "claim", "shard": shard, "page": page, "ids": fresh})
+                self.claimed.update(dict.fromkeys(fresh, (shard, page)))
+            return fresh
+
+    def release(self, shard, ids):
+        """Give back claims that were not created so a rerun can retry them."""
+        if not ids:
+            return
+        with self._locked():
+            self._catch_up()
+            self._append({"type": "release", "shard": shard, "ids": list(ids)})
+            for policy_id in ids:
+                self.claimed.pop(policy_id, None)
+
+    def page_done(self, shard, page):
+        with self._locked():
+            self._append({"type": "page", "shard": shard, "page": page})
+            self.pages.setdefault(shard, set()).add(page)
+
+    def finished_pages(self, shard):
+        self.refresh()
+        return self.pages.get(shard, set())
+
+    def size(self):
+        """Current journal length in bytes; pass to final_stats(since=...)."""
+        self.refresh()
+        return self.offset
+
+    def finish(self, shard, stats):
+        with self._locked():
+            self._catch_up()
+            self.finals[shard] = (self.offset, stats)
+            self._append({"type": "final", "shard": shard, "stats": stats})
+
+    def final_stats(self, since=0):
+        """Latest final stats per shard, written at or after byte offset `since`."""
+        self.refresh()
+        return {shard: stats for shard, (at, stats) in self.finals.items() if at >= since}
+
+
+def open_journal(path):
+    journal = Journal(path)
+    journal.refresh()
+    return journal
+
+
+def launch(script, count, args, journal_path):
+    """Run `script` as `count` shard workers and return their merged stats.
+
+    `args` are passed through to every worker along with --shard/--journal.
+    Worker output is prefixed with its shard number. Only stats written by
+    this launch are merged; a journal resumed from earlier runs keeps theirs.
+    """
+    since = open_journal(journal_path).size()
+    procs = []
+    for index in range(count):
+        cmd = [sys.executable, "-u", script, *args,
+               "--shard", f"{index}/{count}", "--journal", journal_path]
+        procs.append(subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        ))
+
+    _relay_output(procs)
+    failed = [i for i, proc in enumerate(procs) if proc.wait() != 0]
+
+    merged = {}
+    finals = open_journal(journal_path).final_stats(since)
+    for stats in finals.values():
+        for key, value in stats.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged, sorted(finals), failed
+
+
+def _relay_output(procs):
+    selector = selectors.DefaultSelector()
+    for index, proc in enumerate(procs):
+        selector.register(proc.stdout, selectors.EVENT_READ, index)
+    open_streams = len(procs)
+    while open_streams:
+        for key, _ in selector.select():
+            line = key.fileobj.readline()
+            if not line:
+                selector.unregister(key.fileobj)
+                open_streams -= 1
+                continue
+            print(f"[{key.data}] {line}", end="")
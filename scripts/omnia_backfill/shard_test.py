@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from omnia_backfill.shard import open_journal
+
+
+# Run from scripts/: python3 -m unittest omnia_backfill.shard_test
+class TestJournalClaims(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "shards.jsonl")
+
+    def test_other_shard_cannot_claim(self):
+        first = open_journal(self.path)
+        second = open_journal(self.path)
+        self.assertEqual(first.claim(0, ["a", "b"], 1), ["a", "b"])
+        self.assertEqual(second.claim(1, ["b", "c"], 7), ["c"])
+
+    def test_resume_after_crash_between_claim_and_create(self):
+        """A shard that died mid-page gets its own claims back on rerun."""
+        crashed = open_journal(self.path)
+        self.assertEqual(crashed.claim(0, ["a", "b"], 3), ["a", "b"])
+        # ...process dies here: no release, no page_done.
+
+        other = open_journal(self.path)
+        self.assertEqual(other.claim(1, ["a"], 9), [])
+
+        rerun = open_journal(self.path)
+        self.assertNotIn(3, rerun.finished_pages(0))
+        self.assertEqual(rerun.claim(0, ["a", "b"], 3), ["a", "b"])
+
+    def test_rows_shifted_to_a_later_page_are_reclaimed(self):
+        crashed = open_journal(self.path)
+        crashed.claim(0, ["a"], 3)
+
+        rerun = open_journal(self.path)
+        self.assertEqual(rerun.claim(0, ["a"], 4), ["a"])
+
+    def test_claims_on_finished_pages_stay_taken(self):
+        journal = open_journal(self.path)
+        journal.claim(0, ["a"], 3)
+        journal.page_done(0, 3)
+
+        rerun = open_journal(self.path)
+        self.assertEqual(rerun.claim(0, ["a"], 4), [])
+
+    def test_released_claims_are_free_for_any_shard(self):
+        journal = open_journal(self.path)
+        journal.claim(0, ["a", "b"], 3)
+        journal.release(0, ["b"])
+        journal.page_done(0, 3)
+
+        other = open_journal(self.path)
+        self.assertEqual(other.claim(1, ["a", "b"], 5), ["b"])
+
+    def test_final_stats_since_offset(self):
+        journal = open_journal(self.path)
+        journal.finish(0, {"created": 5})
+        journal.finish(1, {"created": 2})
+
+        since = open_journal(self.path).size()
+        rerun = open_journal(self.path)
+        rerun.finish(1, {"created": 1})
+
+        self.assertEqual(open_journal(self.path).final_stats(since), {1: {"created": 1}})
+        self.assertEqual(open_journal(self.path).final_stats(), {0: {"created": 5}, 1: {"created": 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()
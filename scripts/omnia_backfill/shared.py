@@ -0,0 +1,72 @@
+"""
+Process-wide state that jobs share when omnia-backfill.py runs them in one process.
+
+  - http_adapter() / http_session(): one urllib3 connection pool behind
+    every CrmClient session and script-level gql() helper, so connections
+    (and their TLS sessions) are reused across requests, clients and jobs.
+    Sessions keep their own headers; only the pool is shared.
+  - cached(key, load): reference data such as the agent index or the
+    carrier/product lists, loaded once per process and key. Callers key by
+    CRM url, so staging and production never share entries.
+
+Standalone scripts use the same helpers; they simply start cold. The
+old-CRM page mirror lives next to the reader, in omnia_backfill/old_crm.py.
+"""
+
+import threading
+from collections import Counter, defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 32  # connections kept per host; covers the scripts' worker counts
+
+_adapter = None
+_session = None
+_lock = threading.Lock()
+_cache = {}
+_key_locks = defaultdict(threading.Lock)
+stats = Counter()  # "<key name> loaded" / "<key name> reused" -> count
+
+
+def http_adapter():
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+        return _adapter
+
+
+def mount(session):
+    """Route a session's http(s) traffic through the shared pool."""
+    adapter = http_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def http_session():
+    """Shared session for callers that pass full headers on every request."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+    return mount(_session)
+
+
+def cached(key, load):
+    """Return load() for `key`, calling it once per process.
+
+    `key` is a tuple whose last item names the data, e.g. (url, "agents").
+    Concurrent callers for the same key wait for the first load.
+    """
+    with _lock:
+        key_lock = _key_locks[key]
+    with key_lock:
+        if key in _cache:
+            stats[f"{key[-1]} reused"] += 1
+            return _cache[key]
+        value = load()
+        _cache[key] = value
+        stats[f"{key[-1]} loaded"] += 1
+        return value
@@ -0,0 +1,206 @@
+"""
+Local SQLite snapshot of CRM objects, refreshed by `updatedAt` watermark.
+
+Each object gets one table with one column per selected field. Composite and
+relation sub-fields are flattened the same way Twenty names its columns
+(`commission { amountMicros }` -> `commissionAmountMicros`,
+`carrier { name }` -> `carrierName`).
+
+The first refresh pages the whole object. Later refreshes only fetch rows with
+`updatedAt >= watermark` and drop rows soft-deleted since the watermark, so a
+script can read the full object set from disk after a few small requests.
+"""
+
+import json
+import sqlite3
+import time
+
+# plural -> (GraphQL type name, selection). `id` and `updatedAt` are required.
+SNAPSHOT_OBJECTS = {
+    "policies": (
+        "Policy",
+        "id updatedAt oldCrmPolicyId policyNumber applicationId status "
+        "submittedDate effectiveDate expirationDate "
+        "leadId carrierId productId agentId premium { amountMicros currencyCode }",
+    ),
+    "carrierProducts": (
+        "CarrierProduct",
+        "id updatedAt carrierId productId carrier { name } product { name } "
+        "commission { amountMicros currencyCode }",
+    ),
+    "carriers": ("Carrier", "id updatedAt name"),
+    "products": ("Product", "id updatedAt name"),
+    "agentProfiles": ("AgentProfile", "id updatedAt name"),
+    "leadSources": ("LeadSource", "id updatedAt name"),
+    "people": (
+        "Person",
+        "id updatedAt name { firstName lastName } phones { primaryPhoneNumber } "
+        "emails { primaryEmail }",
+    ),
+}
+
+
+def default_path(target_name):
+    return f"/tmp/crm-snapshot-{target_name}.sqlite"
+
+
+def selection_columns(selection):
+    """Flatten a GraphQL selection string into snapshot column names."""
+    tokens = selection.replace("{", " { ").replace("}", " } ").split()
+    columns = []
+    prefixes = []
+    last = None
+    for token in tokens:
+        if token == "{":
+            columns.pop()
+            prefixes.append(last)
+        elif token == "}":
+            prefixes.pop()
+        else:
+            last = _join(prefixes[-1] if prefixes else "", token)
+            columns.append(last)
+    return columns
+
+
+def _join(prefix, name):
+    return prefix + name[0].upper() + name[1:] if prefix else name
+
+
+def flatten_node(node, prefix=""):
+    row = {}
+    for key, value in node.items():
+        column = _join(prefix, key)
+        if isinstance(value, dict):
+            row.update(flatten_node(value, column))
+        elif isinstance(value, (list, bool)):
+            row[column] = json.dumps(value)
+        else:
+            row[column] = value
+    return row
+
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.fresh = set()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS _snapshot_meta (
+                object TEXT PRIMARY KEY,
+                selection TEXT NOT NULL,
+                watermark TEXT,
+                refreshedAt REAL
+            )
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def _meta(self, plural):
+        return self.conn.execute(
+            "SELECT selection, watermark FROM _snapshot_meta WHERE object = ?",
+            (plural,),
+        ).fetchone()
+
+    def watermark(self, plural):
+        meta = self._meta(plural)
+        return meta["watermark"] if meta else None
+
+    def _reset_table(self, plural, selection):
+        columns = selection_columns(selection)
+        defs = ", ".join(
+            f'"{c}" TEXT PRIMARY KEY' if c == "id" else f'"{c}"' for c in columns
+        )
+        self.conn.execute(f'DROP TABLE IF EXISTS "{plural}"')
+        self.conn.execute(f'CREATE TABLE "{plural}" ({defs})')
+        self.conn.execute(
+            f'CREATE INDEX "{plural}_updatedAt" ON "{plural}" ("updatedAt")'
+        )
+
+    def refresh(self, client, plural, full=False):
+        """Bring one object table up to date. Returns (upserted, deleted)."""
+        type_name, selection = SNAPSHOT_OBJECTS[plural]
+        meta = self._meta(plural)
+        watermark = None
+        if full or meta is None or meta["selection"] != selection:
+            self._reset_table(plural, selection)
+        else:
+            watermark = meta["watermark"]
+
+        columns = selection_columns(selection)
+        placeholders = ", ".join("?" for _ in columns)
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        upsert = f'INSERT OR REPLACE INTO "{plural}" ({quoted}) VALUES ({placeholders})'
+
+        upserted = 0
+        new_watermark = watermark
+        nodes = client.paginate(
+            plural,
+            type_name,
+            selection,
+            filter={"updatedAt": {"gte": watermark}} if watermark else None,
+            order_by=[{"updatedAt": "AscNullsFirst"}],
+        )
+        for node in nodes:
+            row = flatten_node(node)
+            self.conn.execute(upsert, [row.get(c) for c in columns])
+            upserted += 1
+            if node.get("updatedAt") and (
+                new_watermark is None or node["updatedAt"] > new_watermark
+            ):
+                new_watermark = node["updatedAt"]
+
+        deleted = 0
+        if watermark:
+            # Soft-deleted rows only come back when the filter names deletedAt.
+            gone = client.paginate(
+                plural,
+                type_name,
+                "id",
+                filter={"deletedAt": {"gte": watermark}},
+            )
+            for node in gone:
+                cur = self.conn.execute(
+                    f'DELETE FROM "{plural}" WHERE id = ?', (node["id"],)
+                )
+                deleted += cur.rowcount
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO _snapshot_meta VALUES (?, ?, ?, ?)",
+            (plural, selection, new_watermark, time.time()),
+        )
+        self.conn.commit()
+        self.fresh.add(plural)
+        return upserted, deleted
+
+    def refresh_and_report(self, client, plural, full=False):
+        started = time.time()
+        upserted, deleted = self.refresh(client, plural, full=full)
+        print(
+            f"  Snapshot {plural}: {upserted} changed, {deleted} deleted "
+            f"({time.time() - started:.1f}s)"
+        )
+
+    def ensure_fresh(self, client, plural):
+        """Delta-refresh `plural` once per process; later calls are free."""
+        if plural not in self.fresh:
+            self.refresh_and_report(client, plural)
+
+    def rows(self, plural, where=None, params=()):
+        """Return rows of one object as dicts, optionally filtered by SQL."""
+        sql = f'SELECT * FROM "{plural}"'
+        if where:
+            sql += f" WHERE {where}"
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def query(self, sql, params=()):
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+
+def open_snapshot(path, client, objects, full=False):
+    """Open the snapshot at `path` and delta-refresh `objects` before use."""
+    snapshot = Snapshot(path)
+    for plural in objects:
+        snapshot.refresh_and_report(client, plural, full=full)
+    return snapshot
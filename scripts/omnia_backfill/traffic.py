@@ -0,0 +1,271 @@
+"""
+Capture of metadata API traffic, and the pull model replay is built from.
+
+Capture: a Recorder appends every metadata request to a JSONL file,
+one line per exchange:
+
+    {"at": <epoch seconds>, "elapsed": <seconds>, "query": ..., "variables": ...,
+     "response": ...}
+
+IngestionClient and backfill-calls.py take --capture FILE; backfill-calls.sh
+takes --capture FILE too (whole-second timing, no elapsed).
+
+Replay model: a capture is reduced to what a scheduler change can affect.
+  - per pipeline, every backfill pull: its window, record counts, status,
+    queue delay (trigger -> worker startedAt) and run time (startedAt ->
+    completedAt, as measured by the server)
+  - per operation (ingestionLogs, triggerIngestionPull, ...), the median
+    request latency
+Pulls are matched to triggers per pipeline in order: the n-th worker log
+started after the first trigger belongs to the n-th trigger. A trigger's
+window is its startTime/endTime arguments (backfill-calls.sh) or else the
+date overrides last written to the pipeline config (backfill-calls.py,
+backfill-ingestion.py).
+
+PullModel.estimate() answers "how would this window behave": a window that
+was captured replays exactly; any other window gets the records of the
+captured windows it overlaps, pro-rated by overlap, and a run time from
+`overhead + seconds_per_record * records` fitted over that pipeline's pulls.
+That is what lets chunk sizes differ from the captured run.
+"""
+
+import json
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from omnia_backfill.ingestion import parse_timestamp
+
+OPERATIONS = (
+    "ingestionPipelines", "ingestionPipeline", "ingestionLogs",
+    "triggerIngestionPull", "updateIngestionPipeline",
+)
+TERMINAL_STATUSES = ("completed", "failed", "partial")
+MATCH_SKEW_SECONDS = 15
+COUNT_FIELDS = ("totalRecordsReceived", "recordsCreated", "recordsUpdated", "recordsFailed")
+
+_OPERATION = re.compile(r"\b(" + "|".join(sorted(OPERATIONS, key=len, reverse=True)) + r")\b")
+
+
+class Recorder:
+    """Thread-safe JSONL writer for metadata exchanges."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a")
+
+    def record(self, started, query, variables, response):
+        line = json.dumps({
+            "at": round(started, 3),
+            "elapsed": round(time.time() - started, 4),
+            "query": query,
+            "variables": variables,
+            "response": response,
+        })
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def operation(query):
+    """First metadata operation named in a query, e.g. 'ingestionLogs'."""
+    match = _OPERATION.search(query or "")
+    return match.group(1) if match else None
+
+
+def argument(exchange, name):
+    """Argument `name` from the variables, or inlined as `name: "..."` / `name: 5`."""
+    variables = exchange.get("variables") or {}
+    if name in variables:
+        return variables[name]
+    if name == "id" and isinstance(variables.get("input"), dict):
+        return variables["input"].get("id")
+    match = re.search(rf'\b{name}:\s*(?:"([^"]*)"|(\d+))', exchange.get("query") or "")
+    if not match:
+        return None
+    return match.group(1) if match.group(1) is not None else int(match.group(2))
+
+
+def parse_local(value):
+    """Override timestamps are source-local and naive: 2026-02-18T00:00:00."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def window_of(config):
+    params = (config or {}).get("dateRangeParams") or {}
+    start = parse_local(params.get("startTimeOverride"))
+    end = parse_local(params.get("endTimeOverride"))
+    if start is None or end is None:
+        return None
+    return start, end + timedelta(seconds=1)  # overrides are end-inclusive
+
+
+def trigger_window(exchange, config):
+    """[start, end) a trigger pulls: its startTime/endTime, else the config overrides."""
+    start, end = argument(exchange, "startTime"), argument(exchange, "endTime")
+    if start and end:
+        return parse_local(start), parse_local(end) + timedelta(seconds=1)
+    return window_of(config)
+
+
+def load_capture(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class PullModel:
+    def __init__(self, pipelines, configs, pulls, latencies):
+        self.pipelines = pipelines  # list of pipeline dicts as last listed
+        self.configs = configs  # pipeline id -> sourceRequestConfig as first captured
+        self.pulls = pulls  # pipeline id -> [pull dict], by window start
+        self.latencies = latencies  # operation -> median seconds
+        self.fits = {pid: self._fit(samples) for pid, samples in pulls.items()}
+
+    @classmethod
+    def from_capture(cls, exchanges):
+        pipelines = {}
+        configs = {}  # as first read, before the capture run changed them
+        current = {}  # as last written, for the date overrides of the next trigger
+        triggers = defaultdict(list)  # pipeline id -> [(at, window)]
+        placeholders = set()
+        worker_logs = defaultdict(dict)  # pipeline id -> log id -> last seen log
+        latencies = defaultdict(list)
+
+        for exchange in sorted(exchanges, key=lambda e: e["at"]):
+            op = operation(exchange.get("query"))
+            if op is None:
+                continue
+            if exchange.get("elapsed") is not None:
+                latencies[op].append(exchange["elapsed"])
+            data = (exchange.get("response") or {}).get("data") or {}
+            if op == "ingestionPipelines":
+                for pipeline in data.get("ingestionPipelines") or []:
+                    pipelines[pipeline["id"]] = pipeline
+            elif op == "ingestionPipeline" and data.get("ingestionPipeline"):
+                pipeline = data["ingestionPipeline"]
+                configs.setdefault(pipeline["id"], pipeline.get("sourceRequestConfig") or {})
+            elif op == "updateIngestionPipeline":
+                pipeline_id = argument(exchange, "id")
+                update = ((exchange.get("variables") or {}).get("input") or {}).get("update") or {}
+                if pipeline_id and "sourceRequestConfig" in update:
+                    current[pipeline_id] = update["sourceRequestConfig"]
+            elif op == "triggerIngestionPull":
+                pipeline_id = argument(exchange, "pipelineId")
+                window = trigger_window(exchange, current.get(pipeline_id))
+                triggers[pipeline_id].append((exchange["at"], window))
+                placeholder = data.get("triggerIngestionPull") or {}
+                if placeholder.get("id"):
+                    placeholders.add(placeholder["id"])
+            elif op == "ingestionLogs":
+                pipeline_id = argument(exchange, "pipelineId")
+                for log in data.get("ingestionLogs") or []:
+                    if log.get("triggerType") == "pull":
+                        worker_logs[pipeline_id][log["id"]] = log
+
+        pulls = {}
+        for pipeline_id, pipeline_triggers in triggers.items():
+            first_at = pipeline_triggers[0][0] - MATCH_SKEW_SECONDS
+            started = sorted(
+                (
+                    log for log_id, log in worker_logs[pipeline_id].items()
+                    if log_id not in placeholders
+                    and log.get("status") in TERMINAL_STATUSES
+                    and parse_timestamp(log.get("startedAt"))
+                    and parse_timestamp(log["startedAt"]).timestamp() >= first_at
+                ),
+                key=lambda log: log["startedAt"],
+            )
+            samples = []
+            for (at, window), log in zip(pipeline_triggers, started):
+                began = parse_timestamp(log["startedAt"]).timestamp()
+                completed = parse_timestamp(log.get("completedAt"))
+                if window is None or completed is None:
+                    continue
+                samples.append({
+                    "window": window,
+                    "status": log["status"],
+                    "queued": max(0.0, began - at),
+                    "duration": max(0.0, completed.timestamp() - began),
+                    "errors": log.get("errors"),
+                    **{field: log.get(field) or 0 for field in COUNT_FIELDS},
+                })
+            pulls[pipeline_id] = sorted(samples, key=lambda s: s["window"][0])
+
+        for pipeline_id in pulls:
+            pipelines.setdefault(pipeline_id, {
+                "id": pipeline_id, "name": pipeline_id, "mode": "pull",
+                "targetObjectNameSingular": "?", "isEnabled": True,
+            })
+        return cls(
+            list(pipelines.values()),
+            configs,
+            pulls,
+            {op: statistics.median(values) for op, values in latencies.items()},
+        )
+
+    @staticmethod
+    def _fit(samples):
+        """(overhead seconds, seconds per record) over a pipeline's pulls."""
+        if not samples:
+            return 60.0, 0.0
+        received = [s["totalRecordsReceived"] for s in samples]
+        durations = [s["duration"] for s in samples]
+        if len(set(received)) > 1:
+            per_record, overhead = statistics.linear_regression(received, durations)
+            return max(overhead, 0.0), max(per_record, 0.0)
+        return statistics.fmean(durations), 0.0
+
+    def min_queued(self, pipeline_id):
+        return min((s["queued"] for s in self.pulls.get(pipeline_id, [])), default=1.0)
+
+    def estimate(self, pipeline_id, window):
+        """Pull outcome for a window: counts, status, errors and run seconds."""
+        samples = self.pulls.get(pipeline_id, [])
+        for sample in samples:
+            if sample["window"] == window:
+                return sample
+
+        start, end = window
+        counts = dict.fromkeys(COUNT_FIELDS, 0.0)
+        for sample in samples:
+            s_start, s_end = sample["window"]
+            overlap = (min(end, s_end) - max(start, s_start)).total_seconds()
+            if overlap > 0:
+                fraction = overlap / (s_end - s_start).total_seconds()
+                for field in COUNT_FIELDS:
+                    counts[field] += sample[field] * fraction
+        if samples and not any(counts.values()):
+            # Outside every captured window: the pipeline's average rate.
+            hours = sum((s["window"][1] - s["window"][0]).total_seconds() for s in samples) / 3600
+            scale = (end - start).total_seconds() / 3600 / hours
+            for field in COUNT_FIELDS:
+                counts[field] = sum(s[field] for s in samples) * scale
+        counts = {field: int(round(value)) for field, value in counts.items()}
+        overhead, per_record = self.fits.get(pipeline_id, (60.0, 0.0))
+        return {
+            "window": window,
+            "status": "partial" if counts["recordsFailed"] else "completed",
+            "errors": None,
+            "duration": overhead + per_record * counts["totalRecordsReceived"],
+            **counts,
+        }
+
+    def describe(self):
+        lines = []
+        for pipeline_id, samples in self.pulls.items():
+            overhead, per_record = self.fits[pipeline_id]
+            name = next((p["name"] for p in self.pipelines if p["id"] == pipeline_id), pipeline_id)
+            lines.append(
+                f"{name}: {len(samples)} pulls, run time ~ {overhead:.0f}s + "
+                f"{per_record * 1000:.1f}ms/record, min queue {self.min_queued(pipeline_id):.1f}s"
+            )
+        for op, seconds in sorted(self.latencies.items()):
+            lines.append(f"{op}: median {seconds * 1000:.0f}ms")
+        return lines
@@ -0,0 +1,188 @@
+"""
+Column-wise transform of old-CRM lead-report-api rows into CRM inputs.
+
+The per-row helpers that used to be copied into each policy script
+(`normalize_phone`, `build_policy_input`, `eastern_to_utc_iso`) work on a
+whole page here. Each column is converted in one pass, relation names are
+resolved once per distinct value, and Eastern->UTC offsets are cached per
+calendar day.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+EASTERN = ZoneInfo("America/New_York")
+
+EMPTY_DATE = "0000-00-00"
+
+POLICY_STATUS_NAME_MAP = {
+    "submitted": "SUBMITTED",
+    "pending": "PENDING",
+    "declined": "DECLINED",
+    "canceled": "CANCELED",
+    "incomplete": "INCOMPLETE",
+    "active / approved": "ACTIVE_APPROVED",
+    "active/approved": "ACTIVE_APPROVED",
+    "active / placed": "ACTIVE_PLACED",
+    "active/placed": "ACTIVE_PLACED",
+    "active - approved": "ACTIVE_APPROVED",
+    "active - placed": "ACTIVE_PLACED",
+    "active": "ACTIVE",
+    "payment error - canceled": "PAYMENT_ERROR_CANCELED",
+    "payment error - active/approved": "PAYMENT_ERROR_ACTIVE_APPROVED",
+    "payment error - active/placed": "PAYMENT_ERROR_ACTIVE_PLACED",
+    "payment error - active approved": "PAYMENT_ERROR_ACTIVE_APPROVED",
+    "payment error - active placed": "PAYMENT_ERROR_ACTIVE_PLACED",
+}
+
+_NON_DIGITS = re.compile(r"\D+")
+
+# date string -> UTC offset, or None when the day has a DST transition
+_day_offsets = {}
+
+
+def normalize_phone(phone_str):
+    if not phone_str:
+        return None
+    digits = _NON_DIGITS.sub("", str(phone_str))
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits if digits else None
+
+
+def normalize_phones(values):
+    """normalize_phone over a column, converting each distinct value once."""
+    cache = {}
+    out = []
+    for value in values:
+        if value not in cache:
+            cache[value] = normalize_phone(value)
+        out.append(cache[value])
+    return out
+
+
+def premiums_to_micros(values):
+    """total_premium strings -> amountMicros (None when missing, invalid or <= 0)."""
+    out = []
+    for value in values:
+        micros = None
+        if value:
+            try:
+                premium = float(value)
+                if premium > 0:
+                    micros = round(premium * 1_000_000)
+            except ValueError:
+                pass
+        out.append(micros)
+    return out
+
+
+def map_statuses(values):
+    return [
+        POLICY_STATUS_NAME_MAP.get(value.lower()) if value else None
+        for value in values
+    ]
+
+
+def _eastern_offset(day):
+    """UTC offset for an Eastern calendar day, or None if DST changes that day."""
+    if day not in _day_offsets:
+        start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=EASTERN)
+        end = start + timedelta(hours=23, minutes=59)
+        offset = start.utcoffset()
+        _day_offsets[day] = offset if end.utcoffset() == offset else None
+    return _day_offsets[day]
+
+
+def eastern_to_utc_iso(reg_date_str):
+    """Convert 'YYYY-MM-DD HH:MM:SS' Eastern -> UTC ISO string."""
+    trimmed = reg_date_str.strip()
+    if len(trimmed) <= 10:
+        trimmed += " 00:00:00"
+    naive = datetime.strptime(trimmed[:19], "%Y-%m-%d %H:%M:%S")
+    offset = _eastern_offset(trimmed[:10])
+    if offset is None:
+        utc = naive.replace(tzinfo=EASTERN).astimezone(timezone.utc)
+    else:
+        utc = naive - offset
+    return utc.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def eastern_to_utc_isos(values):
+    return [eastern_to_utc_iso(v) if v else None for v in values]
+
+
+def _column(rows, key):
+    return [row.get(key) for row in rows]
+
+
+def _resolve_column(names, resolve):
+    """Map a column of names through `resolve`, calling it once per distinct name."""
+    if resolve is None:
+        return [None] * len(names)
+    ids = {name: resolve(name) for name in set(names) if name}
+    return [ids.get(name) if name else None for name in names]
+
+
+def _display_name(carrier_name, product_name):
+    # "Carrier - Product" (best effort from old CRM data)
+    if carrier_name and product_name:
+        return f"{carrier_name} - {product_name}"
+    if carrier_name:
+        return f"{carrier_name} - Unknown"
+    if product_name:
+        return f"Unknown - {product_name}"
+    return "Policy"
+
+
+def build_policy_inputs(policies, person_ids, resolve_carrier=None,
+                        resolve_product=None, resolve_agent=None):
+    """Build PolicyCreateInput dicts for a page of old-CRM policy rows.
+
+    `person_ids` lines up with `policies`. The resolvers map a carrier,
+    product or agent name to a CRM id (or None) and are called once per
+    distinct name in the page.
+    """
+    carrier_names = [name or "" for name in _column(policies, "carrier_name")]
+    product_names = [name or "" for name in _column(policies, "product_name")]
+    premiums = premiums_to_micros(_column(policies, "total_premium"))
+    statuses = map_statuses(_column(policies, "status_name"))
+    carrier_ids = _resolve_column(carrier_names, resolve_carrier)
+    product_ids = _resolve_column(product_names, resolve_product)
+    agent_ids = _resolve_column(_column(policies, "member_name"), resolve_agent)
+
+    inputs = []
+    for i, policy in enumerate(policies):
+        inp = {
+            "name": _display_name(carrier_names[i], product_names[i]),
+            "policyNumber": policy.get("policy_number") or "",
+            "leadId": person_ids[i],
+            "oldCrmPolicyId": str(policy["policy_id"]),
+        }
+        if premiums[i] is not None:
+            inp["premium"] = {"amountMicros": premiums[i], "currencyCode": "USD"}
+        if statuses[i]:
+            inp["status"] = statuses[i]
+
+        eff = policy.get("effective_date")
+        if eff and eff != EMPTY_DATE:
+            inp["effectiveDate"] = eff
+        exp = policy.get("expires_date")
+        if exp and exp != EMPTY_DATE:
+            inp["expirationDate"] = exp
+
+        if carrier_ids[i]:
+            inp["carrierId"] = carrier_ids[i]
+        if product_ids[i]:
+            inp["productId"] = product_ids[i]
+        if agent_ids[i]:
+            inp["agentId"] = agent_ids[i]
+
+        # Pass reg_date as-is (EST) — no timezone conversion
+        reg_date = policy.get("reg_date")
+        if reg_date and reg_date != EMPTY_DATE:
+            inp["submittedDate"] = reg_date
+
+        inputs.append(inp)
+    return inputs
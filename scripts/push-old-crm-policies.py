@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Push-mode policy backfill: post raw lead-report-api rows to an ingestion pipeline.
+
+Instead of resolving people, carriers, products and agents one GraphQL call at
+a time, this script forwards raw old-CRM rows in large batches to a push-mode
+copy of the 'Old CRM Policy Sync' pipeline. The server runs the old-CRM
+preprocessor, field mappings, relation matching/creation and dedup on
+oldCrmPolicyId, and each batch's ingestion log reports the outcome.
+
+The push pipeline's name must contain "Old CRM" so the server picks the
+old-CRM preprocessor. Create it once with --create-pipeline, which copies the
+pull pipeline's source config and field mappings.
+
+Page reads and pushes are retried under the shared resilience policy (pushes
+only when the server cannot have accepted them). A page or batch that still
+fails stops the run: batches already pushed are waited for, and the summary
+prints the --page to resume from (re-pushed rows dedup on oldCrmPolicyId).
+
+Usage:
+  python3 scripts/push-old-crm-policies.py --target staging --create-pipeline
+  python3 scripts/push-old-crm-policies.py --target production
+  python3 scripts/push-old-crm-policies.py --target production --page 300 --end-page 400
+  python3 scripts/push-old-crm-policies.py --target production --batch-size 1000 --no-wait
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from omnia_backfill.crm import TARGETS
+from omnia_backfill.ingestion import IngestionClient
+from omnia_backfill.old_crm import PER_PAGE, fetch_page
+from omnia_backfill.shared import http_session
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+PULL_PIPELINE_NAME = "Old CRM Policy Sync"
+PUSH_PIPELINE_NAME = "Old CRM Policy Push"
+
+DEFAULT_BATCH_SIZE = 500  # records per POST
+FETCH_WORKERS = 5
+
+
+def resolve_pipeline(client, name, create):
+    pipeline = client.find_pipeline(name, mode="push")
+    if pipeline:
+        return pipeline
+    if not create:
+        print(f"No push pipeline named '{name}'. Run with --create-pipeline first.")
+        sys.exit(1)
+
+    source = client.find_pipeline(PULL_PIPELINE_NAME)
+    if not source:
+        print(f"Pull pipeline '{PULL_PIPELINE_NAME}' not found; nothing to copy.")
+        sys.exit(1)
+    pipeline, mapping_count = client.create_push_copy(source, name)
+    print(f"  Created push pipeline {pipeline['name']} (id={pipeline['id']}) "
+          f"with {mapping_count} field mappings")
+    return pipeline
+
+
+def fetch_page_or_error(page, session):
+    """(fetch_page result, None), or (None, error) once the OLD_CRM retries run out."""
+    try:
+        return fetch_page(page, session=session), None
+    except (requests.RequestException, ValueError) as e:
+        return None, e
+
+
+def fetch_pages(session, pages):
+    """Fetch a run of pages concurrently. Returns [(page, policies, error)] in page order."""
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        results = pool.map(lambda p: fetch_page_or_error(p, session), pages)
+        return [(page, result and result[0], error) for page, (result, error) in zip(pages, results)]
+
+
+def summarize(logs):
+    totals = {"completed": 0, "partial": 0, "failed": 0,
+              "created": 0, "updated": 0, "skipped": 0, "record_failures": 0}
+    for log in logs.values():
+        totals[log["status"]] += 1
+        totals["created"] += log.get("recordsCreated") or 0
+        totals["updated"] += log.get("recordsUpdated") or 0
+        totals["skipped"] += log.get("recordsSkipped") or 0
+        totals["record_failures"] += log.get("recordsFailed") or 0
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push old CRM policies to a push-mode ingestion pipeline")
+    parser.add_argument("--target", default="production", choices=sorted(TARGETS))
+    parser.add_argument("--pipeline-name", default=PUSH_PIPELINE_NAME)
+    parser.add_argument("--create-pipeline", action="store_true",
+                        help=f"Create the push pipeline from '{PULL_PIPELINE_NAME}' if missing")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--page", type=int, default=1, help="First old-CRM page")
+    parser.add_argument("--end-page", type=int, help="Last old-CRM page (default: all)")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="Do not wait for the ingestion logs to finish")
+    args = parser.parse_args()
+
+    client = IngestionClient.for_target(args.target)
+
+    print("=" * 60)
+    print(f"PUSH BACKFILL: lead-report-api -> {args.pipeline_name} ({args.target})")
+    print("=" * 60)
+
+    pipeline = resolve_pipeline(client, args.pipeline_name, args.create_pipeline)
+    if not pipeline["isEnabled"]:
+        print(f"Pipeline {pipeline['id']} is disabled.")
+        sys.exit(1)
+
+    session = http_session()
+    first, error = fetch_page_or_error(args.page, session)
+    if error is not None:
+        print(f"Old CRM page {args.page} failed after retries: {error}")
+        sys.exit(1)
+    policies, total_pages, total = first
+    end_page = min(args.end_page or total_pages, total_pages)
+    print(f"  Pages {args.page}-{end_page} of {total_pages} ({total} policies in old CRM)")
+
+    pages_per_batch = max(1, args.batch_size // PER_PAGE)
+    log_ids = []
+    pushed = 0
+    buffer = [(args.page, policy) for policy in policies]  # (source page, row)
+    next_page = args.page + 1
+    resume_page = None  # set when a page or push fails; nothing after it is sent
+    started = time.time()
+
+    while resume_page is None and (buffer or next_page <= end_page):
+        if next_page <= end_page:
+            last = min(next_page + pages_per_batch - 1, end_page)
+            for page, page_policies, error in fetch_pages(session, range(next_page, last + 1)):
+                if error is not None:
+                    print(f"  Old CRM page {page} failed after retries: {error}")
+                    resume_page = page
+                    break
+                buffer.extend((page, policy) for policy in page_policies)
+            next_page = last + 1 if resume_page is None else resume_page
+
+        # Flush everything once no more pages will be read
+        flush = next_page > end_page or resume_page is not None
+        while buffer and (len(buffer) >= args.batch_size or flush):
+            batch = buffer[:args.batch_size]
+            try:
+                result = client.push(pipeline["id"], [policy for _, policy in batch],
+                                     secret=pipeline.get("webhookSecret"))
+            except requests.RequestException as e:
+                print(f"  Push of {len(batch)} records failed after retries: {e}")
+                resume_page = batch[0][0]
+                break
+            buffer = buffer[args.batch_size:]
+            log_ids.append(result["logId"])
+            pushed += result["recordCount"]
+
+        print(f"  Through page {next_page - 1}/{end_page} | pushed={pushed} "
+              f"batches={len(log_ids)} ({time.time() - started:.0f}s)")
+
+    if args.no_wait:
+        print(f"\nQueued {len(log_ids)} batches; check ingestion logs for results.")
+        if resume_page is not None:
+            print(f"Stopped early; re-run with --page {resume_page} to resume.")
+            sys.exit(1)
+        return
+
+    print(f"\nWaiting for {len(log_ids)} ingestion logs...")
+
+    def progress(done, pending):
+        print(f"    {done} finished, {pending} pending")
+
+    logs = client.wait_for_logs(pipeline["id"], log_ids, on_progress=progress)
+    totals = summarize(logs)
+
+    print("\n" + "=" * 60)
+    print("PUSH BACKFILL COMPLETE")
+    print("=" * 60)
+    print(f"  Records pushed: {pushed} in {len(log_ids)} batches")
+    print(f"  Batches:  completed={totals['completed']} partial={totals['partial']} "
+          f"failed={totals['failed']} unfinished={len(log_ids) - len(logs)}")
+    print(f"  Created:  {totals['created']}")
+    print(f"  Updated:  {totals['updated']}")
+    print(f"  Skipped:  {totals['skipped']}")
+    print(f"  Failed:   {totals['record_failures']}")
+    for log_id, log in logs.items():
+        if log["status"] != "completed" and log.get("errors"):
+            print(f"  {log['status'].upper()} {log_id}: {str(log['errors'])[:200]}")
+    if resume_page is not None:
+        print(f"  Stopped early at old-CRM page {resume_page}; "
+              f"re-run with --page {resume_page} to resume.")
+    print("=" * 60)
+    if resume_page is not None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
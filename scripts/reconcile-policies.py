@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Find and fix drift between old-CRM policies and CRM policies.
+
+Reads every lead-report-api page, delta-refreshes the local CRM snapshot
+(a few requests after the first run), and hashes the mapped fields of each
+policy on both sides to find the records that differ. Only the fields that
+actually differ are written, in aliased bulk update batches; failures go to
+a dead-letter file for replay-dead-letters.py.
+
+The old CRM has no change feed or server-side hashing, so its side is always
+a full crawl; the snapshot is what makes the CRM side cheap.
+
+Usage:
+  python3 scripts/reconcile-policies.py                          # Report drift only
+  python3 scripts/reconcile-policies.py --fields status premium  # Limit to some fields
+  python3 scripts/reconcile-policies.py --apply                  # Write the updates
+  python3 scripts/reconcile-policies.py --target staging --apply --workers 8
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from omnia_backfill import bulk
+from omnia_backfill.crm import TARGETS, CrmClient
+from omnia_backfill.deadletter import DeadLetter, default_path as default_dead_letter_path
+from omnia_backfill.old_crm import fetch_page
+from omnia_backfill.reconcile import MAPPED_FIELDS, reconcile
+from omnia_backfill.snapshot import Snapshot, default_path
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+FETCH_WORKERS = 5
+
+
+def fetch_page_or_none(page):
+    try:
+        return fetch_page(page)[0]
+    except requests.RequestException as e:
+        print(f"    Page {page} failed after retries: {e}")
+        return None
+
+
+def crawl_old_crm():
+    started = time.time()
+    rows, total_pages, total = fetch_page(1)
+    print(f"  Old CRM: {total} policies on {total_pages} pages")
+    failed = []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        pages = range(2, total_pages + 1)
+        for done, (page, policies) in enumerate(
+            zip(pages, executor.map(fetch_page_or_none, pages)), 1
+        ):
+            if policies is None:
+                failed.append(page)
+            else:
+                rows.extend(policies)
+            if done % 500 == 0:
+                print(f"    {done}/{len(pages)} pages fetched...")
+    print(f"  Fetched {len(rows)} rows in {time.time() - started:.0f}s")
+    if failed:
+        print(f"  WARNING: {len(failed)} pages could not be read; their policies "
+              f"show up as 'no longer in old CRM' and are not updated: {failed[:20]}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile CRM policies against the old CRM")
+    parser.add_argument("--target", default="production", choices=sorted(TARGETS))
+    parser.add_argument("--snapshot", help="Snapshot path (default: /tmp/crm-snapshot-<target>.sqlite)")
+    parser.add_argument("--fields", nargs="+", default=list(MAPPED_FIELDS), choices=list(MAPPED_FIELDS))
+    parser.add_argument("--apply", action="store_true", help="Write the updates (default: report only)")
+    parser.add_argument("--batch-size", type=int, default=bulk.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=bulk.DEFAULT_WORKERS)
+    parser.add_argument("--dead-letter", default=default_dead_letter_path("reconcile-policies"))
+    args = parser.parse_args()
+
+    client = CrmClient.for_target(args.target)
+
+    print("=" * 60)
+    print(f"POLICY RECONCILIATION ({args.target}): {', '.join(args.fields)}")
+    if not args.apply:
+        print("  *** REPORT ONLY — pass --apply to write updates ***")
+    print("=" * 60)
+
+    snapshot = Snapshot(args.snapshot or default_path(args.target))
+    snapshot.ensure_fresh(client, "policies")
+    crm_rows = snapshot.rows("policies", "oldCrmPolicyId IS NOT NULL AND oldCrmPolicyId != ''")
+    snapshot.close()
+    print(f"  CRM: {len(crm_rows)} policies with oldCrmPolicyId")
+
+    old_rows = crawl_old_crm()
+    result = reconcile(old_rows, crm_rows, args.fields)
+    updates = result["updates"]
+
+    print(f"\n  Compared {result['compared']} policies")
+    print(f"  Drifted records: {len(updates)}")
+    for field, count in sorted(result["field_counts"].items()):
+        print(f"    {field}: {count}")
+    print(f"  In old CRM but not in CRM: {len(result['missing'])} (run backfill-policies.py)")
+    print(f"  In CRM but no longer in old CRM: {len(result['extra'])}")
+
+    if not args.apply:
+        for crm_id, data, _ in updates[:20]:
+            print(f"  [DRY RUN] {crm_id}: {data}")
+        if len(updates) > 20:
+            print(f"  ... and {len(updates) - 20} more")
+        return
+
+    dead_letters = DeadLetter(args.dead_letter)
+
+    def progress(done, count):
+        if done % 20 == 0 or done == count:
+            print(f"    {done}/{count} batches written")
+
+    updated, failures = bulk.update_many(
+        client, "Policy", [(crm_id, data) for crm_id, data, _ in updates],
+        batch_size=args.batch_size, workers=args.workers, on_batch=progress,
+    )
+    for crm_id, data, err in failures:
+        dead_letters.add("updatePolicy", {"id": crm_id, "data": data}, err)
+
+    print("\n" + "=" * 60)
+    print("RECONCILIATION COMPLETE")
+    print("=" * 60)
+    print(f"  Updated: {updated}")
+    print(f"  Failed:  {len(failures)}")
+    print(f"  {dead_letters.summary()}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
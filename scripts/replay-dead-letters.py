@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Replay a backfill dead-letter file through the bulk write path.
+
+Reads the JSONL written by backfill-policies.py / backfill-submitted-datetime.py
+and resends only those inputs:
+  createPolicy  -> batched createPolicies, skipping oldCrmPolicyIds that
+                   already exist (the original write may have landed); a
+                   batch the server rejects is retried record by record
+  updatePolicy  -> batches of aliased updatePolicy mutations in one request
+
+Batches run concurrently. Failures are reclassified from the new error;
+transient ones are retried with backoff, and whatever still fails is written
+to a fresh dead-letter file so it can be replayed again later.
+
+Usage:
+  python3 scripts/replay-dead-letters.py /tmp/backfill-policies-dead-letters.jsonl
+  python3 scripts/replay-dead-letters.py FILE --classes transient unknown invalid
+  python3 scripts/replay-dead-letters.py FILE --target staging --workers 8 --batch-size 50
+  python3 scripts/replay-dead-letters.py FILE --dry-run
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from omnia_backfill import bulk
+from omnia_backfill.crm import TARGETS, CrmClient
+from omnia_backfill.deadletter import DeadLetter, classify_error, read_entries
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+DEFAULT_CLASSES = ["transient", "unknown"]
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_RETRIES = 3
+# createPolicies errors that mean an input was rejected, so the batch is
+# retried one record at a time to find it
+SPLIT_CLASSES = {"invalid", "duplicate"}
+
+client = None
+
+
+def existing_old_ids(old_ids):
+    data, err = client.gql("""
+        query($filter: PolicyFilterInput, $first: Int) {
+            policies(filter: $filter, first: $first) {
+                edges { node { oldCrmPolicyId } }
+            }
+        }
+    """, {"filter": {"oldCrmPolicyId": {"in": old_ids}}, "first": len(old_ids)})
+    if not data:
+        raise RuntimeError(f"Error checking existing policies: {err}")
+    return {e["node"]["oldCrmPolicyId"] for e in data["policies"]["edges"]}
+
+
+def create_batch(entries):
+    """Returns (ok, already_present, [(entry, errors)])."""
+    inputs = [e["payload"] for e in entries]
+    present = existing_old_ids([inp["oldCrmPolicyId"] for inp in inputs])
+    todo = [e for e in entries if e["payload"]["oldCrmPolicyId"] not in present]
+    if not todo:
+        return 0, len(entries), []
+
+    data, err = client.gql("""
+        mutation($data: [PolicyCreateInput!]!) {
+            createPolicies(data: $data) { id }
+        }
+    """, {"data": [e["payload"] for e in todo]})
+    if data:
+        return len(todo), len(entries) - len(todo), []
+    if classify_error(err) not in SPLIT_CLASSES:
+        # A timeout or 5xx may have hidden a batch that landed; run_batch
+        # retries it, and the retry checks for existing rows first.
+        return 0, len(entries) - len(todo), [(entry, err) for entry in todo]
+
+    # One bad input fails the whole batch; find out which, one by one.
+    present = existing_old_ids([e["payload"]["oldCrmPolicyId"] for e in todo])
+    todo = [e for e in todo if e["payload"]["oldCrmPolicyId"] not in present]
+    ok = 0
+    failures = []
+    for entry in todo:
+        data, err = client.gql("""
+            mutation($input: PolicyCreateInput!) {
+                createPolicy(data: $input) { id }
+            }
+        """, {"input": entry["payload"]})
+        if data:
+            ok += 1
+        else:
+            failures.append((entry, err))
+    return ok, len(entries) - len(todo), failures
+
+
+def update_batch(entries):
+    """Aliased updatePolicy mutations via the bulk writer, one alias per entry."""
+    failures = dict(bulk.update_batch(
+        client, "Policy", [(e["payload"]["id"], e["payload"]["data"]) for e in entries]
+    ))
+    failed = [(e, failures[e["payload"]["id"]]) for e in entries if e["payload"]["id"] in failures]
+    return len(entries) - len(failed), 0, failed
+
+
+WRITERS = {"createPolicy": create_batch, "updatePolicy": update_batch}
+
+
+def run_batch(kind, entries, retries):
+    """Write one batch, retrying entries whose new error is transient."""
+    ok = present = 0
+    settled = []
+    pending = entries
+    for attempt in range(retries + 1):
+        try:
+            batch_ok, batch_present, failures = WRITERS[kind](pending)
+        except Exception as e:  # network errors, bad JSON, ...
+            batch_ok, batch_present, failures = 0, 0, [(entry, e) for entry in pending]
+        ok += batch_ok
+        present += batch_present
+        transient = [f for f in failures if classify_error(f[1]) == "transient"]
+        settled += [f for f in failures if classify_error(f[1]) != "transient"]
+        if not transient or attempt == retries:
+            return ok, present, settled + transient
+        pending = [entry for entry, _ in transient]
+        time.sleep(2 ** attempt)
+
+
+def main():
+    global client
+
+    parser = argparse.ArgumentParser(description="Replay backfill dead letters")
+    parser.add_argument("file", help="Dead-letter JSONL file")
+    parser.add_argument("--target", default="production", choices=sorted(TARGETS))
+    parser.add_argument("--classes", nargs="+", default=DEFAULT_CLASSES,
+                        help=f"Error classes to replay (default: {' '.join(DEFAULT_CLASSES)})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Extra attempts for entries that fail with a transient error")
+    parser.add_argument("--out", help="Where still-failing entries go (default: FILE.replay-<time>.jsonl)")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would be replayed")
+    args = parser.parse_args()
+
+    entries = read_entries(args.file)
+    selected = [e for e in entries if e["errorClass"] in args.classes]
+    unsupported = [e for e in selected if e["kind"] not in WRITERS]
+    selected = [e for e in selected if e["kind"] in WRITERS]
+
+    print("=" * 60)
+    print(f"REPLAY DEAD LETTERS: {args.file} ({args.target})")
+    print("=" * 60)
+    print(f"  {len(entries)} entries, by class: "
+          f"{dict(Counter(e['errorClass'] for e in entries))}")
+    print(f"  Replaying {len(selected)} ({', '.join(args.classes)}): "
+          f"{dict(Counter(e['kind'] for e in selected))}")
+    if unsupported:
+        print(f"  Skipping {len(unsupported)} entries of unknown kind")
+    if args.dry_run or not selected:
+        return
+
+    client = CrmClient.for_target(args.target)
+    out = DeadLetter(args.out or f"{args.file}.replay-{int(time.time())}.jsonl")
+
+    batches = []
+    for kind in WRITERS:
+        of_kind = [e for e in selected if e["kind"] == kind]
+        for i in range(0, len(of_kind), args.batch_size):
+            batches.append((kind, of_kind[i:i + args.batch_size]))
+
+    ok = present = done = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(run_batch, kind, batch, args.retries) for kind, batch in batches]
+        for future in as_completed(futures):
+            batch_ok, batch_present, failures = future.result()
+            ok += batch_ok
+            present += batch_present
+            for entry, err in failures:
+                context = {k: v for k, v in entry.items()
+                           if k not in ("kind", "payload", "errorClass", "error", "attempts", "failedAt")}
+                out.add(entry["kind"], entry["payload"], err,
+                        attempts=entry.get("attempts", 1) + 1, **context)
+            done += 1
+            if done % 10 == 0 or done == len(batches):
+                print(f"  {done}/{len(batches)} batches | written={ok} "
+                      f"already present={present} still failing={out.count}")
+
+    print("\n" + "=" * 60)
+    print("REPLAY COMPLETE")
+    print("=" * 60)
+    print(f"  Written:         {ok}")
+    print(f"  Already present: {present}")
+    print(f"  Still failing:   {out.summary()}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Stand-in metadata API that replays captured ingestion traffic, time-compressed.
+
+Record a real run first (--capture on backfill-calls.py, backfill-ingestion.py
+or backfill-calls.sh), then point the same script at this server with
+changed scheduler settings. Pulls behave as captured (see
+omnia_backfill/traffic.py): the same windows return the same counts and
+status, other windows are pro-rated, and run times, queue delays and request
+latencies are divided by --speed. A pool of --workers simulated ingestion
+workers runs the pulls, so parallelism beyond what the server can run shows
+up as queueing, as it would live.
+
+Nothing about the client needs changing except the URL (any token works) and
+its poll interval, which should be divided by --speed as well.
+
+On Ctrl-C the server prints a run summary (requests by operation, pulls,
+simulated wall time, worker utilization) and appends it to --results with
+--label, so runs can be compared side by side. GET /stats returns the same
+summary as JSON mid-run.
+
+Usage:
+  python3 scripts/backfill-calls.py --url https://crm.omniaagent.com --token <t> \
+    --start 2026-02-01 --end 2026-02-08 --capture /tmp/calls-capture.jsonl
+
+  python3 scripts/replay-ingestion-server.py /tmp/calls-capture.jsonl --speed 60 \
+    --workers 4 --label "ingestion budget 3, 6h" --results /tmp/replay-results.jsonl
+  python3 scripts/backfill-ingestion.py --url http://127.0.0.1:8765 --token x \
+    --job "pipeline=Convoso Call Ingestion,start=2026-02-01,end=2026-02-08,chunk=6h" \
+    --budget 3 --poll-interval 0.1 --progress-db /tmp/replay-progress.sqlite
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from omnia_backfill.planner import format_duration
+from omnia_backfill.traffic import (
+    COUNT_FIELDS,
+    PullModel,
+    argument,
+    load_capture,
+    operation,
+    trigger_window,
+)
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+DEFAULT_PORT = 8765
+DEFAULT_SPEED = 60.0
+DEFAULT_WORKERS = 4
+
+
+def iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class ReplayState:
+    """Pipelines, configs and simulated pulls. All access under `lock`."""
+
+    def __init__(self, model, speed, workers):
+        self.model = model
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.configs = {
+            p["id"]: json.loads(json.dumps(model.configs.get(p["id"]) or {}))
+            for p in model.pipelines
+        }
+        self.logs = {p["id"]: [] for p in model.pipelines}  # newest last
+        self.worker_free_at = [0.0] * workers
+        self.requests = Counter()
+        self.first_request = None
+        self.last_request = None
+        self.busy_seconds = 0.0
+        self.pulls = Counter()  # status -> count
+
+    def touch(self, op):
+        now = time.time()
+        self.requests[op or "other"] += 1
+        self.first_request = self.first_request or now
+        self.last_request = now
+
+    def trigger(self, pipeline_id, window):
+        """Queue one pull on the simulated workers. Returns the placeholder log."""
+        now = time.time()
+        placeholder = {"id": str(uuid.uuid4()), "status": "pending", "triggerType": "pull",
+                       "startedAt": iso(now), "completedAt": None,
+                       **dict.fromkeys(COUNT_FIELDS, 0), "recordsSkipped": 0, "errors": None}
+        self.logs.setdefault(pipeline_id, []).append(placeholder)
+        if window is None:
+            return placeholder  # no overrides: nothing to replay, the placeholder stays pending
+
+        outcome = self.model.estimate(pipeline_id, window)
+        worker = min(range(len(self.worker_free_at)), key=self.worker_free_at.__getitem__)
+        began = max(now + self.model.min_queued(pipeline_id) / self.speed,
+                    self.worker_free_at[worker])
+        run_seconds = outcome["duration"] / self.speed
+        self.worker_free_at[worker] = began + run_seconds
+        self.busy_seconds += run_seconds
+        self.pulls[outcome["status"]] += 1
+        self.logs[pipeline_id].append({
+            "id": str(uuid.uuid4()),
+            "triggerType": "pull",
+            "began": began,
+            "ends": began + run_seconds,
+            "finalStatus": outcome["status"],
+            "errors": outcome.get("errors"),
+            "recordsSkipped": 0,
+            **{field: outcome[field] for field in COUNT_FIELDS},
+        })
+        return placeholder
+
+    def visible_logs(self, pipeline_id, limit):
+        """Logs as the real API would show them now, newest first."""
+        now = time.time()
+        visible = []
+        for log in reversed(self.logs.get(pipeline_id, [])):
+            if "began" not in log:
+                visible.append(log)
+                continue
+            if log["began"] > now:
+                continue  # still queued: the worker has not created its log yet
+            done = log["ends"] <= now
+            visible.append({
+                "id": log["id"],
+                "triggerType": "pull",
+                "status": log["finalStatus"] if done else "running",
+                "startedAt": iso(log["began"]),
+                "completedAt": iso(log["ends"]) if done else None,
+                "errors": log["errors"] if done else None,
+                "recordsSkipped": 0,
+                **{field: log[field] if done else 0 for field in COUNT_FIELDS},
+            })
+            if len(visible) >= limit:
+                break
+        return visible[:limit]
+
+    def summary(self):
+        span = (self.last_request - self.first_request) if self.first_request else 0.0
+        workers = len(self.worker_free_at)
+        return {
+            "requests": dict(self.requests),
+            "pulls": dict(self.pulls),
+            "replaySeconds": round(span, 2),
+            "simulatedSeconds": round(span * self.speed, 1),
+            "workerUtilization": round(self.busy_seconds / (span * workers), 3) if span else 0.0,
+        }
+
+
+def handle(state, body):
+    query = body.get("query") or ""
+    op = operation(query)
+    exchange = {"query": query, "variables": body.get("variables")}
+    latency = state.model.latencies.get(op, 0.0) / state.speed
+    if latency:
+        time.sleep(latency)
+
+    with state.lock:
+        state.touch(op)
+        if op == "ingestionPipelines":
+            return {"data": {"ingestionPipelines": state.model.pipelines}}
+        if op == "ingestionPipeline":
+            pipeline_id = argument(exchange, "id")
+            if pipeline_id not in state.configs:
+                return {"data": {"ingestionPipeline": None}}
+            return {"data": {"ingestionPipeline": {
+                "id": pipeline_id, "sourceRequestConfig": state.configs[pipeline_id],
+            }}}
+        if op == "updateIngestionPipeline":
+            pipeline_id = argument(exchange, "id")
+            update = (body.get("variables") or {}).get("input", {}).get("update", {})
+            if "sourceRequestConfig" in update:
+                state.configs[pipeline_id] = update["sourceRequestConfig"]
+            return {"data": {"updateIngestionPipeline": {
+                "id": pipeline_id, "sourceRequestConfig": state.configs.get(pipeline_id),
+            }}}
+        if op == "triggerIngestionPull":
+            pipeline_id = argument(exchange, "pipelineId")
+            log = state.trigger(pipeline_id, trigger_window(exchange, state.configs.get(pipeline_id)))
+            return {"data": {"triggerIngestionPull": {"id": log["id"], "status": log["status"]}}}
+        if op == "ingestionLogs":
+            pipeline_id = argument(exchange, "pipelineId")
+            limit = argument(exchange, "limit") or 50
+            return {"data": {"ingestionLogs": state.visible_logs(pipeline_id, limit)}}
+    return {"data": None, "errors": [{"message": f"replay server does not handle: {query[:80]}"}]}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with state.lock:
+                    self._reply(200, state.summary())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/metadata":
+                self._reply(404, {"errors": [{"message": f"replay serves /metadata only, not {self.path}"}]})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            self._reply(200, handle(state, body))
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured ingestion metadata traffic")
+    parser.add_argument("capture", help="JSONL capture from --capture")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--speed", type=float, default=DEFAULT_SPEED,
+                        help=f"Time compression factor (default: {DEFAULT_SPEED:g})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Simulated ingestion workers (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--label", default="", help="Name of this run in the summary")
+    parser.add_argument("--results", help="Append the run summary as JSON to this file")
+    args = parser.parse_args()
+
+    model = PullModel.from_capture(load_capture(args.capture))
+    state = ReplayState(model, args.speed, max(1, args.workers))
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+
+    print("=" * 60)
+    print(f"REPLAY SERVER http://127.0.0.1:{args.port} ({args.speed:g}x, {args.workers} workers)")
+    print("=" * 60)
+    for line in model.describe():
+        print(f"  {line}")
+    print("  Ctrl-C prints the run summary")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+    with state.lock:
+        summary = {"label": args.label, "speed": args.speed, "workers": args.workers,
+                   **state.summary()}
+    print(f"\n{'=' * 60}")
+    print(f"REPLAY SUMMARY {args.label}".rstrip())
+    print(f"  Requests: {sum(summary['requests'].values()):,} "
+          f"({', '.join(f'{op} {n}' for op, n in sorted(summary['requests'].items()))})")
+    print(f"  Pulls: {sum(summary['pulls'].values())} "
+          f"({', '.join(f'{s} {n}' for s, n in sorted(summary['pulls'].items()))})")
+    print(f"  Simulated wall time: {format_duration(summary['simulatedSeconds'])} "
+          f"({summary['replaySeconds']:.0f}s replayed)")
+    print(f"  Worker utilization: {summary['workerUtilization']:.0%}")
+    print(f"{'=' * 60}")
+    if args.results:
+        with open(args.results, "a") as f:
+            f.write(json.dumps(summary) + "\n")
+        print(f"  Appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,243 +8,275 @@ LTV rules (from old CRM system):
   - Core (fixed indemnity, hospital, short term medical): $242
   - Health Sharing (UHF): $630
 
+The keyword rules live in omnia_backfill/ltv_rules.py; --rules <csv> swaps in
+another table (priority,field,keyword,product_type,amount_micros).
+
 For each carrier+product pair that exists in the CRM, this script:
-  1. Finds or creates the CarrierProduct record
+  1. Finds or creates the CarrierProduct record (creation with --create-missing)
   2. Sets commission to the appropriate LTV based on product name
 
+Updates are grouped by target commission and sent through the plural
+updateCarrierProducts mutation, 100 ids per batch, a few batches at a time.
+
+Several targets can run in one process (--target staging,production). Each
+target gets its own token file, endpoint policy and --rate budget, and the
+targets fetch and write concurrently. Product classification runs once over
+the names from every target, so promoting a reseed from staging to
+production is one run with one classification.
+
 Usage:
   python3 scripts/seed-carrier-product-commissions.py --target staging --dry-run
   python3 scripts/seed-carrier-product-commissions.py --target staging
   python3 scripts/seed-carrier-product-commissions.py --target production --dry-run
+  python3 scripts/seed-carrier-product-commissions.py --target staging --create-missing
+  python3 scripts/seed-carrier-product-commissions.py --target staging --rules ltv-rules.csv --dry-run
+  python3 scripts/seed-carrier-product-commissions.py --target production --snapshot /tmp/crm-snapshot-production.sqlite
+  python3 scripts/seed-carrier-product-commissions.py --target staging,production --dry-run
+  python3 scripts/seed-carrier-product-commissions.py --target staging,production \
+      --rate production=5 --token-file production=/tmp/prod-token.txt \
+      --snapshot /tmp/crm-snapshot-{target}.sqlite
 """
 
+import json
 import sys
-import time
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 
-sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+from omnia_backfill.crm import TARGETS, TOKEN_FILES, CrmClient
+from omnia_backfill.ltv_rules import LtvClassifier, load_rules
+from omnia_backfill.resilience import Endpoint, RateLimiter, graphql_post
+from omnia_backfill.shared import cached, http_session
+from omnia_backfill.snapshot import Snapshot
 
-TARGETS = {
-    "staging": "https://staging-crm.omniaagent.com/graphql",
-    "production": "https://crm.omniaagent.com/graphql",
-}
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
 
-TOKEN_FILES = {
-    "staging": "/tmp/twenty-token-staging.txt",
-    "production": "/tmp/twenty-token.txt",
-}
-NEW_CRM_TOKEN = None  # set in main()
-DELAY = 0.05
+DEFAULT_RATE = 20.0  # requests/second per target (was a fixed 0.05s sleep per call)
+GROUP_LIMIT = 200  # server caps groupBy results at QUERY_MAX_RECORDS
+PAIR_FILTER = "carrierId[is]:NOT_NULL,productId[is]:NOT_NULL"
+UPDATE_BATCH_SIZE = 100  # server-side MUTATION_MAXIMUM_AFFECTED_RECORDS default
+UPDATE_WORKERS = 4
 
 dry_run = False
-target_url = None
-
-stats = {"created": 0, "updated": 0, "skipped": 0, "failed": 0}
-
-
-def gql(query, variables=None):
+multi_target = False  # prefix output with the target name
+print_lock = threading.Lock()  # keeps concurrent targets' lines whole
+classifier = LtvClassifier()  # rebuilt from --rules <csv> when given
+
+
+class Target:
+    """One CRM being seeded: its URL, token, request budget, snapshot and stats."""
+
+    def __init__(self, name, token_file, rate, snapshot_path=None):
+        self.name = name
+        self.url = TARGETS[name]
+        with open(token_file) as f:
+            self.token = f.read().strip()
+        self.endpoint = Endpoint(f"crm-{name}", timeout=(5, 30), attempts=4, base_delay=0.5,
+                                 limiter=RateLimiter(rate))
+        self.snapshot_path = snapshot_path
+        self.snapshot = None  # opened on the target's own thread (sqlite connections are per thread)
+        self.stats = {"created": 0, "updated": 0, "skipped": 0, "failed": 0}
+        self.existing_cps = []
+        self.pairs = []  # policy carrier+product pairs, for --create-missing
+
+    def log(self, message):
+        if multi_target:
+            message = "\n".join(
+                f"[{self.name}] {line}" if line.strip() else line for line in message.split("\n")
+            )
+        with print_lock:
+            print(message)
+
+    def client(self):
+        return CrmClient(self.url, self.token, endpoint=self.endpoint)
+
+
+def gql(target, query, variables=None):
     payload = {"query": query}
     if variables:
         payload["variables"] = variables
     headers = {
-        "Authorization": f"Bearer {NEW_CRM_TOKEN}",
+        "Authorization": f"Bearer {target.token}",
         "Content-Type": "application/json",
     }
-    resp = requests.post(target_url, headers=headers, json=payload, timeout=30)
-    time.sleep(DELAY)
-    data = resp.json()
-    if "errors" in data:
-        return None, data["errors"]
-    return data.get("data"), None
+    return graphql_post(http_session(), target.url, payload, headers=headers, endpoint=target.endpoint)
+
+
+def rest_group_by(target, plural, group_by, filter_str):
+    """Run a REST groupBy query; returns (list of dimension-value tuples, err)."""
+    rest_url = target.url.rsplit("/graphql", 1)[0] + f"/rest/{plural}/groupBy"
+    try:
+        resp = target.endpoint.request(
+            http_session(),
+            "GET",
+            rest_url,
+            headers={"Authorization": f"Bearer {target.token}"},
+            params={
+                "group_by": json.dumps(group_by),
+                "filter": filter_str,
+                "limit": GROUP_LIMIT,
+            },
+        )
+    except requests.RequestException as e:
+        return None, f"{type(e).__name__}: {e}"
+    if not resp.ok:
+        return None, f"HTTP {resp.status_code}: {resp.text[:300]}"
+    try:
+        return [tuple(g["groupByDimensionValues"]) for g in resp.json()], None
+    except ValueError:
+        return None, f"HTTP {resp.status_code}, not JSON: {resp.text[:300]}"
 
 
 def classify_product(product_name, carrier_name=""):
     """Classify product name into type and LTV amount (micros)."""
-    name = product_name.lower()
-    carrier = carrier_name.lower()
+    return classifier.classify(product_name, carrier_name)
 
-    # Health Sharing (UHF / Universal Health Fellowship)
-    if "health sharing" in name or "uhf" in name or "universal health fellowship" in carrier:
-        return "health_sharing", 630_000_000
 
-    # Major Medical / ACA
-    if any(k in name for k in ["major medical", "aca -", "aca-"]):
-        return "aca", 330_000_000
-
-    # Auto insurance (by product name or carrier)
-    if "auto" in name or "geico" in carrier or "the general" in carrier:
-        return "auto", 330_000_000
-
-    # Dental
-    if "dental" in name:
-        return "ancillary", 117_000_000
-
-    # Vision
-    if "vision" in name:
-        return "ancillary", 117_000_000
-
-    # Telemedicine
-    if "telemedicine" in name or "telehealth" in name:
-        return "ancillary", 117_000_000
-
-    # Fixed Indemnity / Hospital
-    if "hospital" in name or "fixed indemnity" in name:
-        return "core", 242_000_000
+def fetch_policy_carrier_product_pairs(target):
+    """Fetch distinct carrier+product pairs that actually exist on policies."""
+    if target.snapshot is not None:
+        for plural in ("policies", "carriers", "products"):
+            target.snapshot.ensure_fresh(target.client(), plural)
+        return [
+            {**row, "carrierName": row["carrierName"] or "?", "productName": row["productName"] or "?"}
+            for row in target.snapshot.query("""
+                SELECT DISTINCT p.carrierId, p.productId,
+                       c.name AS carrierName, pr.name AS productName
+                FROM policies p
+                LEFT JOIN carriers c ON c.id = p.carrierId
+                LEFT JOIN products pr ON pr.id = p.productId
+                WHERE p.carrierId IS NOT NULL AND p.productId IS NOT NULL
+            """)
+        ]
+
+    # Group server-side on the join columns so only one row per distinct pair
+    # crosses the wire, instead of paging every policy.
+    groups, err = rest_group_by(
+        target, "policies", [{"carrierId": True}, {"productId": True}], PAIR_FILTER
+    )
+    if groups is not None and len(groups) >= GROUP_LIMIT:
+        # Hit the server's per-query group cap; split by carrier so no pair is dropped.
+        groups, err = group_pairs_by_carrier(target)
+        if groups is None and err is None:
+            target.log(f"  A groupBy hit the {GROUP_LIMIT}-group cap; paging policies instead")
+            groups = page_policy_pairs(target)
+    if groups is None or err:
+        target.log(f"Error grouping policies by carrier/product: {err}")
+        return []
+
+    carrier_names = {c["id"]: c["name"] for c in fetch_all_carriers(target)}
+    product_names = {p["id"]: p["name"] for p in fetch_all_products(target)}
+    return [
+        {
+            "carrierId": carrier_id,
+            "productId": product_id,
+            "carrierName": carrier_names.get(carrier_id) or "?",
+            "productName": product_names.get(product_id) or "?",
+        }
+        for carrier_id, product_id in groups
+    ]
+
+
+def group_pairs_by_carrier(target):
+    """Distinct (carrierId, productId) pairs from one groupBy per carrier.
+
+    Returns (pairs, err). pairs is None without an error when a query came
+    back with GROUP_LIMIT groups, since the server silently truncates there.
+    """
+    carrier_groups, err = rest_group_by(target, "policies", [{"carrierId": True}], PAIR_FILTER)
+    if carrier_groups is None or len(carrier_groups) >= GROUP_LIMIT:
+        return None, err
+    groups = []
+    for (carrier_id,) in carrier_groups:
+        product_groups, err = rest_group_by(
+            target, "policies",
+            [{"productId": True}],
+            f'{PAIR_FILTER},carrierId[eq]:"{carrier_id}"',
+        )
+        if product_groups is None or len(product_groups) >= GROUP_LIMIT:
+            return None, err
+        groups.extend((carrier_id, product_id) for (product_id,) in product_groups)
+    return groups, None
+
+
+def page_policy_pairs(target):
+    """Distinct (carrierId, productId) pairs by paging every policy."""
+    pairs = set()
+    for node in target.client().paginate(
+        "policies", "Policy", "carrierId productId",
+        filter={"and": [{"carrierId": {"is": "NOT_NULL"}}, {"productId": {"is": "NOT_NULL"}}]},
+    ):
+        pairs.add((node["carrierId"], node["productId"]))
+    return sorted(pairs)
+
+
+def fetch_all_carriers(target):
+    """Fetch all carriers from CRM."""
+    if target.snapshot is not None:
+        target.snapshot.ensure_fresh(target.client(), "carriers")
+        return target.snapshot.query("SELECT id, name FROM carriers")
 
-    # Short Term Medical / TriTerm
-    if "short term" in name or "triterm" in name or "tri-term" in name:
-        return "core", 242_000_000
+    return cached((target.url, "carriers"),
+                  lambda: list(target.client().paginate("carriers", "Carrier", "id name")))
 
-    # Life
-    if "life" in name:
-        return "core", 242_000_000
 
-    # Accident / Critical Illness → ancillary
-    if "accident" in name or "critical" in name:
-        return "ancillary", 117_000_000
+def fetch_all_products(target):
+    """Fetch all products from CRM."""
+    if target.snapshot is not None:
+        target.snapshot.ensure_fresh(target.client(), "products")
+        return target.snapshot.query("SELECT id, name FROM products")
 
-    # Default: ancillary
-    return "ancillary", 117_000_000
+    return cached((target.url, "products"),
+                  lambda: list(target.client().paginate("products", "Product", "id name")))
 
 
-def fetch_policy_carrier_product_pairs():
-    """Fetch distinct carrier+product pairs that actually exist on policies."""
-    seen = set()
-    pairs = []
-    cursor = None
-    while True:
-        after = f', after: "{cursor}"' if cursor else ""
-        data, err = gql(f"""
-            query {{
-                policies(first: 100{after}, filter: {{
-                    and: [
-                        {{carrierId: {{is: NOT_NULL}}}},
-                        {{productId: {{is: NOT_NULL}}}}
-                    ]
-                }}) {{
-                    pageInfo {{ hasNextPage endCursor }}
-                    edges {{ node {{ carrierId productId carrier {{ name }} product {{ name }} }} }}
-                }}
-            }}
-        """)
-        if not data:
-            print(f"Error fetching policies: {err}")
-            break
-        result = data["policies"]
-        for edge in result["edges"]:
-            node = edge["node"]
-            key = (node["carrierId"], node["productId"])
-            if key not in seen:
-                seen.add(key)
-                pairs.append({
-                    "carrierId": node["carrierId"],
-                    "productId": node["productId"],
-                    "carrierName": (node.get("carrier") or {}).get("name", "?"),
-                    "productName": (node.get("product") or {}).get("name", "?"),
-                })
-        if not result["pageInfo"]["hasNextPage"]:
-            break
-        cursor = result["pageInfo"]["endCursor"]
-    return pairs
-
-
-def fetch_all_carriers():
-    """Fetch all carriers from CRM."""
-    carriers = []
-    cursor = None
-    while True:
-        after = f', after: "{cursor}"' if cursor else ""
-        data, err = gql(f"""
-            query {{
-                carriers(first: 100{after}) {{
-                    pageInfo {{ hasNextPage endCursor }}
-                    edges {{ node {{ id name }} }}
-                }}
-            }}
-        """)
-        if not data:
-            print(f"Error fetching carriers: {err}")
-            break
-        result = data["carriers"]
-        for edge in result["edges"]:
-            carriers.append(edge["node"])
-        if not result["pageInfo"]["hasNextPage"]:
-            break
-        cursor = result["pageInfo"]["endCursor"]
-    return carriers
-
-
-def fetch_all_products():
-    """Fetch all products from CRM."""
-    products = []
-    cursor = None
-    while True:
-        after = f', after: "{cursor}"' if cursor else ""
-        data, err = gql(f"""
-            query {{
-                products(first: 100{after}) {{
-                    pageInfo {{ hasNextPage endCursor }}
-                    edges {{ node {{ id name }} }}
-                }}
-            }}
-        """)
-        if not data:
-            print(f"Error fetching products: {err}")
-            break
-        result = data["products"]
-        for edge in result["edges"]:
-            products.append(edge["node"])
-        if not result["pageInfo"]["hasNextPage"]:
-            break
-        cursor = result["pageInfo"]["endCursor"]
-    return products
-
-
-def fetch_existing_carrier_products():
+def fetch_existing_carrier_products(target):
     """Fetch all existing CarrierProduct records with carrier/product names."""
+    if target.snapshot is not None:
+        target.snapshot.ensure_fresh(target.client(), "carrierProducts")
+        return [
+            {
+                "id": row["id"],
+                "carrierId": row["carrierId"],
+                "productId": row["productId"],
+                "carrierName": row["carrierName"] or "?",
+                "productName": row["productName"] or "?",
+                "commission": {
+                    "amountMicros": row["commissionAmountMicros"],
+                    "currencyCode": row["commissionCurrencyCode"],
+                },
+            }
+            for row in target.snapshot.rows("carrierProducts")
+        ]
+
     cps = []
-    cursor = None
-    while True:
-        after = f', after: "{cursor}"' if cursor else ""
-        data, err = gql(f"""
-            query {{
-                carrierProducts(first: 100{after}) {{
-                    pageInfo {{ hasNextPage endCursor }}
-                    edges {{ node {{
-                        id carrierId productId
-                        carrier {{ name }}
-                        product {{ name }}
-                        commission {{ amountMicros currencyCode }}
-                    }} }}
-                }}
-            }}
-        """)
-        if not data:
-            print(f"Error fetching carrierProducts: {err}")
-            break
-        result = data["carrierProducts"]
-        for edge in result["edges"]:
-            node = edge["node"]
-            node["carrierName"] = (node.get("carrier") or {}).get("name", "?")
-            node["productName"] = (node.get("product") or {}).get("name", "?")
-            cps.append(node)
-        if not result["pageInfo"]["hasNextPage"]:
-            break
-        cursor = result["pageInfo"]["endCursor"]
+    for node in target.client().paginate(
+        "carrierProducts",
+        "CarrierProduct",
+        "id carrierId productId carrier { name } product { name } "
+        "commission { amountMicros currencyCode }",
+    ):
+        node["carrierName"] = (node.get("carrier") or {}).get("name", "?")
+        node["productName"] = (node.get("product") or {}).get("name", "?")
+        cps.append(node)
     return cps
 
 
-def find_carrier_product(carrier_id, product_id, existing_cps):
+def index_carrier_products(existing_cps):
+    """Index CarrierProducts by (carrierId, productId) for O(1) pair matching."""
+    return {(cp["carrierId"], cp["productId"]): cp for cp in existing_cps}
+
+
+def find_carrier_product(carrier_id, product_id, cp_index):
     """Find existing CarrierProduct by carrier+product IDs."""
-    for cp in existing_cps:
-        if cp["carrierId"] == carrier_id and cp["productId"] == product_id:
-            return cp
-    return None
+    return cp_index.get((carrier_id, product_id))
 
 
-def create_carrier_product(carrier_id, product_id, amount_micros):
+def create_carrier_product(target, carrier_id, product_id, amount_micros):
     """Create a new CarrierProduct with commission."""
-    data, err = gql("""
+    data, err = gql(target, """
         mutation($input: CarrierProductCreateInput!) {
             createCarrierProduct(data: $input) { id }
         }
@@ -256,9 +288,9 @@ def create_carrier_product(carrier_id, product_id, amount_micros):
     return data is not None, err
 
 
-def update_carrier_product(cp_id, amount_micros):
+def update_carrier_product(target, cp_id, amount_micros):
     """Update commission on existing CarrierProduct."""
-    data, err = gql("""
+    data, err = gql(target, """
         mutation($id: UUID!, $input: CarrierProductUpdateInput!) {
             updateCarrierProduct(id: $id, data: $input) { id }
         }
@@ -268,75 +300,244 @@ def update_carrier_product(cp_id, amount_micros):
     return data is not None, err
 
 
-def main():
-    global dry_run, target_url
-
-    args = sys.argv[1:]
-    if "--dry-run" in args:
-        dry_run = True
-        args.remove("--dry-run")
-
-    target_name = "staging"
-    if "--target" in args:
-        idx = args.index("--target")
-        target_name = args[idx + 1]
-        args = args[:idx] + args[idx + 2:]
-
-    if target_name not in TARGETS:
-        print(f"Unknown target '{target_name}'. Use: staging, production")
-        sys.exit(1)
+def update_carrier_products(target, cp_ids, amount_micros):
+    """Set the same commission on many CarrierProducts in one mutation."""
+    data, err = gql(target, """
+        mutation($filter: CarrierProductFilterInput!, $input: CarrierProductUpdateInput!) {
+            updateCarrierProducts(filter: $filter, data: $input) { id }
+        }
+    """, {"filter": {"id": {"in": cp_ids}}, "input": {
+        "commission": {"amountMicros": amount_micros, "currencyCode": "USD"},
+    }})
+    return data is not None, err
 
-    target_url = TARGETS[target_name]
-    global NEW_CRM_TOKEN
-    NEW_CRM_TOKEN = open(TOKEN_FILES[target_name]).read().strip()
 
-    print("=" * 60)
-    print(f"SEED CARRIER PRODUCT COMMISSIONS ({target_name})")
-    if dry_run:
-        print("*** DRY RUN — no writes ***")
-    print("=" * 60)
+def run_update_batch(target, batch, amount_micros):
+    """Update one batch; on failure retry record-by-record to isolate bad rows.
+
+    Returns (updated_count, [(cp, err), ...]).
+    """
+    ok, err = update_carrier_products(target, [cp["id"] for cp in batch], amount_micros)
+    if ok:
+        return len(batch), []
+    updated = 0
+    failures = []
+    for cp in batch:
+        ok, err = update_carrier_product(target, cp["id"], amount_micros)
+        if ok:
+            updated += 1
+        else:
+            failures.append((cp, err))
+    return updated, failures
+
+
+def apply_updates(target, pending):
+    """Send planned updates grouped by target commission, in bounded parallel batches."""
+    batches = [
+        (cps[i:i + UPDATE_BATCH_SIZE], amount_micros)
+        for amount_micros, cps in pending.items()
+        for i in range(0, len(cps), UPDATE_BATCH_SIZE)
+    ]
+    target.log(f"\nApplying updates in {len(batches)} batches ({UPDATE_WORKERS} in flight)...")
+    with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as executor:
+        futures = [executor.submit(run_update_batch, target, b, amt) for b, amt in batches]
+        for future in as_completed(futures):
+            updated, failures = future.result()
+            target.stats["updated"] += updated
+            for cp, err in failures:
+                target.stats["failed"] += 1
+                target.log(f"  FAIL updating {cp['carrierName']} + {cp['productName']}: {err}")
+
+
+def create_missing_carrier_products(target, cp_index):
+    """Create CarrierProducts for policy carrier+product pairs that have none."""
+    target.log("\nMatching policy carrier+product pairs against carrierProducts...")
+    pairs = target.pairs
+    missing = [
+        p for p in pairs
+        if find_carrier_product(p["carrierId"], p["productId"], cp_index) is None
+    ]
+    target.log(f"  {len(pairs)} pairs on policies, {len(missing)} without a carrierProduct")
+
+    for pair in missing:
+        display = f"{pair['carrierName']} + {pair['productName']}"
+        product_type, ltv_micros = classify_product(pair["productName"], pair["carrierName"])
+        if dry_run:
+            target.log(f"  WOULD CREATE {display}: ${ltv_micros / 1_000_000:.0f} ({product_type})")
+            target.stats["created"] += 1
+            continue
+        ok, err = create_carrier_product(target, pair["carrierId"], pair["productId"], ltv_micros)
+        if ok:
+            target.stats["created"] += 1
+        else:
+            target.stats["failed"] += 1
+            target.log(f"  FAIL creating {display}: {err}")
+
+
+def fetch_target(target, create_missing):
+    if target.snapshot_path:
+        target.snapshot = Snapshot(target.snapshot_path)
+    target.log("\nFetching all carrierProduct records...")
+    target.existing_cps = fetch_existing_carrier_products(target)
+    target.log(f"  Found {len(target.existing_cps)} carrierProduct records")
+    if create_missing:
+        target.pairs = fetch_policy_carrier_product_pairs(target)
+
+
+def classify_all(targets):
+    """Classify every distinct carrier/product name pair across all targets once."""
+    names = {
+        (row["productName"], row["carrierName"])
+        for target in targets
+        for row in target.existing_cps + target.pairs
+    }
+    classifier.classify_many([p for p, _ in names], [c for _, c in names])
+    print(f"\nClassified {len(names)} distinct carrier/product names "
+          f"across {len(targets)} target(s)")
 
-    # Fetch all existing carrierProduct records
-    print("\nFetching all carrierProduct records...")
-    existing_cps = fetch_existing_carrier_products()
-    print(f"  Found {len(existing_cps)} carrierProduct records")
 
-    print(f"\nProcessing {len(existing_cps)} carrierProduct records...")
+def seed_target(target, create_missing):
+    target.log(f"\nProcessing {len(target.existing_cps)} carrierProduct records...")
 
-    for cp in existing_cps:
+    pending = defaultdict(list)  # target amountMicros -> carrierProducts to update
+    for cp in target.existing_cps:
         carrier_name = cp["carrierName"]
         product_name = cp["productName"]
         display = f"{carrier_name} + {product_name}"
-
         product_type, ltv_micros = classify_product(product_name, carrier_name)
 
         existing_amount = (cp.get("commission") or {}).get("amountMicros")
         if existing_amount == ltv_micros:
-            stats["skipped"] += 1
+            target.stats["skipped"] += 1
             continue
 
         if dry_run:
             old_val = f"${existing_amount / 1_000_000:.0f}" if existing_amount else "none"
-            print(f"  WOULD UPDATE {display}: {old_val} -> ${ltv_micros / 1_000_000:.0f} ({product_type})")
-            stats["updated"] += 1
+            target.log(f"  WOULD UPDATE {display}: {old_val} -> ${ltv_micros / 1_000_000:.0f} ({product_type})")
+            target.stats["updated"] += 1
         else:
-            ok, err = update_carrier_product(cp["id"], ltv_micros)
-            if ok:
-                stats["updated"] += 1
-            else:
-                stats["failed"] += 1
-                print(f"  FAIL updating {display}: {err}")
-
-    print()
-    print("=" * 60)
-    print(f"SEED COMPLETE ({target_name})")
+            pending[ltv_micros].append(cp)
+
+    if pending:
+        apply_updates(target, pending)
+
+    if create_missing:
+        create_missing_carrier_products(target, index_carrier_products(target.existing_cps))
+
+
+def run_target(target, create_missing, fetched):
+    """Fetch, wait for the shared classification, then write; on this thread."""
+    try:
+        fetch_target(target, create_missing)
+        fetched.wait()  # the barrier action classifies once every target has fetched
+        seed_target(target, create_missing)
+    except BaseException:
+        fetched.abort()  # release the other targets instead of leaving them waiting
+        raise
+    finally:
+        if target.snapshot is not None:
+            target.snapshot.close()
+
+
+def take_option(args, flag):
+    """Remove every `flag value` pair from args; returns the values."""
+    values = []
+    while flag in args:
+        idx = args.index(flag)
+        values.append(args[idx + 1])
+        args[idx:idx + 2] = []
+    return values
+
+
+def per_target(values, target_names, flag, default):
+    """Parse `name=value` (one target) or bare `value` (all targets) options."""
+    result = dict.fromkeys(target_names, default)
+    for value in values:
+        name, sep, rest = value.partition("=")
+        if not sep:
+            result = dict.fromkeys(target_names, value)
+        elif name in result:
+            result[name] = rest
+        else:
+            print(f"{flag} {value}: '{name}' is not one of the targets ({', '.join(target_names)})")
+            sys.exit(1)
+    return result
+
+
+def main():
+    global dry_run, multi_target, classifier
+
+    args = sys.argv[1:]
+    if "--dry-run" in args:
+        dry_run = True
+        args.remove("--dry-run")
+
+    create_missing = False
+    if "--create-missing" in args:
+        create_missing = True
+        args.remove("--create-missing")
+
+    for path in take_option(args, "--rules"):
+        classifier = LtvClassifier(load_rules(path))
+
+    snapshot_path = (take_option(args, "--snapshot") or [None])[-1]
+    target_names = (take_option(args, "--target") or ["staging"])[-1].split(",")
+    for target_name in target_names:
+        if target_name not in TARGETS:
+            print(f"Unknown target '{target_name}'. Use: staging, production")
+            sys.exit(1)
+    multi_target = len(target_names) > 1
+    if multi_target and snapshot_path and "{target}" not in snapshot_path:
+        print("--snapshot with several targets needs a {target} placeholder in the path")
+        sys.exit(1)
+
+    token_files = per_target(take_option(args, "--token-file"), target_names, "--token-file", None)
+    rates = per_target(take_option(args, "--rate"), target_names, "--rate", DEFAULT_RATE)
+    targets = [
+        Target(
+            name,
+            token_files[name] or TOKEN_FILES[name],
+            float(rates[name]),
+            snapshot_path.replace("{target}", name) if snapshot_path else None,
+        )
+        for name in target_names
+    ]
+
     print("=" * 60)
-    print(f"  Created:  {stats['created']}")
-    print(f"  Updated:  {stats['updated']}")
-    print(f"  Skipped:  {stats['skipped']} (already correct)")
-    print(f"  Failed:   {stats['failed']}")
+    print(f"SEED CARRIER PRODUCT COMMISSIONS ({', '.join(target_names)})")
+    if dry_run:
+        print("*** DRY RUN — no writes ***")
+    if multi_target:
+        print("  " + ", ".join(f"{t.name}: {float(rates[t.name]):g} req/s" for t in targets))
     print("=" * 60)
 
+    fetched = threading.Barrier(len(targets), action=lambda: classify_all(targets))
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = {executor.submit(run_target, t, create_missing, fetched): t for t in targets}
+        errors = []
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except threading.BrokenBarrierError:
+                pass  # another target failed first; its error is reported
+            except Exception as e:
+                errors.append((futures[future], e))
+
+    for target in targets:
+        print()
+        print("=" * 60)
+        print(f"SEED COMPLETE ({target.name})")
+        print("=" * 60)
+        print(f"  Created:  {target.stats['created']}")
+        print(f"  Updated:  {target.stats['updated']}")
+        print(f"  Skipped:  {target.stats['skipped']} (already correct)")
+        print(f"  Failed:   {target.stats['failed']}")
+        print("=" * 60)
+    for target, e in errors:
+        print(f"ERROR: {target.name} stopped: {type(e).__name__}: {e}")
+    if errors:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
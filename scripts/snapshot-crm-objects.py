@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Export CRM objects to a local SQLite snapshot, refreshed by updatedAt watermark.
+
+The first run pages every selected object. Later runs only fetch rows changed
+(or soft-deleted) since the last run. Backfill and seed scripts accept
+`--snapshot <path>` to read from the snapshot instead of paging the API.
+
+Usage:
+  python3 scripts/snapshot-crm-objects.py --target production
+  python3 scripts/snapshot-crm-objects.py --target staging --objects policies carrierProducts
+  python3 scripts/snapshot-crm-objects.py --target production --full   # Rebuild from scratch
+"""
+
+import argparse
+import sys
+
+from omnia_backfill.crm import TARGETS, CrmClient
+from omnia_backfill.snapshot import SNAPSHOT_OBJECTS, default_path, open_snapshot
+
+sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot CRM objects to SQLite")
+    parser.add_argument("--target", default="production", choices=sorted(TARGETS))
+    parser.add_argument("--db", help="Snapshot path (default: /tmp/crm-snapshot-<target>.sqlite)")
+    parser.add_argument(
+        "--objects",
+        nargs="+",
+        default=list(SNAPSHOT_OBJECTS),
+        choices=list(SNAPSHOT_OBJECTS),
+        help="Objects to refresh (default: all)",
+    )
+    parser.add_argument("--full", action="store_true", help="Ignore watermarks and reload everything")
+    args = parser.parse_args()
+
+    path = args.db or default_path(args.target)
+    client = CrmClient.for_target(args.target)
+
+    print("=" * 60)
+    print(f"CRM SNAPSHOT ({args.target}) -> {path}")
+    print("=" * 60)
+
+    snapshot = open_snapshot(path, client, args.objects, full=args.full)
+    for plural in args.objects:
+        count = snapshot.query(f'SELECT COUNT(*) AS n FROM "{plural}"')[0]["n"]
+        print(f"  {plural}: {count} rows (watermark {snapshot.watermark(plural)})")
+    snapshot.close()
+
+
+if __name__ == "__main__":
+    main()